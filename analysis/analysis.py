@@ -1,10 +1,48 @@
 import os
 import pandas
-from typing import Dict, Set
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Set, Tuple, Union
+from analysis import profiling
+from analysis.cache import ResultCache, cache_key
+from analysis.incremental import INCREMENTAL_OPTIONS, analyze_incremental
+from analysis.mmapcsv import analyze_csv_mmap
+from analysis.parallel import analyze_csv_parallel
+from analysis.readers import (
+    COMPRESSIONS,
+    excel_sheet_names,
+    read_csv_chunks,
+    read_excel_chunks,
+    read_zip_member_chunks,
+    split_compression,
+    zip_csv_members,
+)
+from analysis.sampling import sample_csv
+from analysis.shards import in_shard
+from analysis.stats import FillStats
 
+# Extensions of the files analyze_directory picks up
+SUPPORTED_EXTENSIONS = (
+    ".csv",
+    ".xlsx",
+    ".xls",
+    ".zip",
+    *(f".csv{extension}" for extension in COMPRESSIONS),
+)
 
+
+@profiling.profiled("analyze")
 def analyze_file(
-    file_path: str, valid_values: Dict[str, Set] = None
+    file_path: str,
+    valid_values: Dict[str, Set] = None,
+    chunksize: int = None,
+    parallel: int = None,
+    usecols: List[str] = None,
+    raw: bool = False,
+    engine: str = "pandas",
+    sheet_name: Union[int, str, List[str], None] = 0,
+    sample: float = None,
+    profile_columns: bool = False,
+    compact: bool = False,
 ) -> pandas.DataFrame:
     """
     Parses an Excel or CSV file and calculates the fill percentage of each column.
@@ -12,69 +50,196 @@ def analyze_file(
     Args:
        file_path: Path to the file to analyze
        valid_values: Dictionary with column names as keys and valid value sets as values
-          For example: {'STATUS': {'Y', 'N'}}}
+          For example: {'STATUS': {'Y', 'N'}}}. Values can also be compiled
+          analysis.rules.ColumnRule objects, for large allow-lists and patterns.
+       chunksize: Number of rows read at a time. When given, the file is
+          streamed and only one chunk is kept in memory, so the peak memory
+          does not depend on the file size. XLSX sheets are always streamed.
+       parallel: Number of processes used to analyze a single CSV file. The
+          file is split into byte ranges that are counted separately and then
+          merged. To find record boundaries the processes first count the
+          quotes of their range, so the file is read twice, both times in
+          parallel. Ignored for Excel files and compressed CSV files.
+       usecols: Names of the columns to analyze. The other columns are skipped
+          by the parser instead of being loaded and discarded.
+       raw: Read every column as text without type inference. Fill counts
+          are the same. Columns with valid values are always read as text
+          from CSV files, numbers in valid values match their text.
+       engine: Parser used for CSV files: ``pandas``, ``pyarrow`` (multithreaded,
+          requires the pyarrow package), ``auto`` to use pyarrow when it is
+          installed or ``mmap`` to count the fields of plain CSV files
+          without building DataFrames (see analysis.mmapcsv). mmap reads
+          only the columns with valid values with pandas, does not use
+          parallel, and reads everything with pandas when profile_columns
+          is set. Ignored for Excel files.
+       sheet_name: Sheet of an Excel workbook to analyze, by position or name,
+          as in ``pandas.read_excel``. A list of names or ``None`` (all the
+          sheets) analyzes each sheet separately and adds a leading Sheet
+          column to the result.
+       sample: Share of a CSV file to read, between 0 and 1, to estimate the
+          statistics instead of counting them. The result gets the 95%
+          confidence bounds of the percentages (see analysis.sampling).
+          Other files are analyzed in full.
+       profile_columns: Add the approximate number of distinct values
+          (HyperLogLog), the most frequent values (Misra-Gries) and the
+          minimum and maximum text length of every column, computed in the
+          same pass (see analysis.sketches). CSV files are then read as
+          with raw, so values are profiled as written whatever type a chunk
+          or byte range infers. Not computed when sampling.
+       compact: Keep the text of CSV columns without valid values as Arrow
+          strings (or categories without pyarrow) instead of Python strings,
+          which takes much less memory on wide text dumps. Those columns
+          are read without type inference, which does not change their
+          fill counts.
+
+    CSV files compressed with gzip, bz2, xz or zstd (``.csv.gz``,
+    ``.csv.bz2``, ``.csv.xz``, ``.csv.zst``) and the CSV members of ``.zip``
+    archives are decompressed while they are parsed. Archives with several
+    CSV members get a leading Member column in the result.
 
     Returns:
        DataFrame with fill statistics for each column
     """
     #  Determine the file type
-    file_extension = os.path.splitext(file_path)[1].lower()
+    file_extension, compression = split_compression(file_path)
+    if compression is not None and file_extension != ".csv":
+        raise ValueError(f"File type not supported: {file_extension}.{compression}")
+
+    csv_options = {
+        "chunksize": chunksize,
+        "engine": engine,
+        "usecols": usecols,
+        # Profiles keep values as written in every chunk and byte range
+        "raw": raw or profile_columns,
+        # Columns with valid values are read as text, so every chunk and
+        # byte range matches them alike
+        "rule_columns": list(valid_values or {}),
+    }
+    if compact:
+        csv_options["compact"] = True
 
     # Load the file according to its extension
-    if file_extension == ".csv":
-        df = pandas.read_csv(file_path, low_memory=False)
+    if sample is not None and file_extension == ".csv" and compression is None:
+        return sample_csv(file_path, sample, valid_values, **csv_options)
+    elif (
+        file_extension == ".csv"
+        and compression is None
+        and engine == "mmap"
+        and not profile_columns
+    ):
+        return analyze_csv_mmap(file_path, valid_values, **csv_options).to_frame()
+    elif (
+        file_extension == ".csv"
+        and compression is None
+        and parallel is not None
+        and parallel > 1
+    ):
+        stats = analyze_csv_parallel(
+            file_path,
+            parallel,
+            valid_values,
+            profile_columns,
+            **csv_options,
+        )
+        return stats.to_frame()
+    elif file_extension == ".csv":
+        # Without chunksize, the file is read before the first chunk is asked
+        with profiling.stage("read", path=file_path):
+            chunks = read_csv_chunks(file_path, **csv_options)
+    elif file_extension == ".zip":
+        return _analyze_zip(file_path, valid_values, profile_columns, csv_options)
     elif file_extension in [".xlsx", ".xls"]:
-        df = pandas.read_excel(file_path)
+        if sheet_name is None or isinstance(sheet_name, list):
+            return _analyze_sheets(
+                file_path,
+                valid_values,
+                sheet_name,
+                chunksize,
+                usecols,
+                raw,
+                profile_columns,
+            )
+        with profiling.stage("read", path=file_path):
+            chunks = read_excel_chunks(file_path, sheet_name, chunksize, usecols, raw)
     else:
         raise ValueError(f"File type not supported: {file_extension}")
 
-    # Initialize the dictionary to store results
-    results = {
-        "Column": [],
-        "Total_Rows": [],
-        "Full_Values": [],
-        "Empty_Values": [],
-        "Percentage_Filled": [],
-    }
-
-    # If a dictionary of valid values was not provided, create an empty one
-    if valid_values is None:
-        valid_values = {}
-
-    total_rows = len(df)
-
-    # Analyze every column
-    for column in df.columns:
-        # If the columns had valid specific values
-        if column in valid_values:
-            # Count values that are in the set of valid values.
-            valid_count = df[column].isin(valid_values[column]).sum()
-            empty_count = total_rows - valid_count
-        else:
-            # Count non-null and non-empty values
-            valid_count = df[column].notna().sum()
-            # For strings, check also if empty
-            if df[column].dtype == "object":
-                valid_count = (df[column].notna() & (df[column] != "")).sum()
-            empty_count = total_rows - valid_count
-
-        # Calculate filling percentage
-        fill_percentage = (valid_count / total_rows * 100) if total_rows > 0 else 0
-
-        # Save results
-        results["Column"].append(column)
-        results["Total_Rows"].append(total_rows)
-        results["Full_Values"].append(valid_count)
-        results["Empty_Values"].append(empty_count)
-        results["Percentage_Filled"].append(round(fill_percentage, 2))
+    # Accumulate the fill counts of every chunk
+    stats = FillStats(valid_values, profile_columns)
+    for chunk in profiling.timed_chunks("read", chunks):
+        with profiling.stage("count", rows=len(chunk)):
+            stats.update(chunk)
 
     # Create DataFrame with the results
-    results_df = pandas.DataFrame(results)
-    return results_df
+    return stats.to_frame()
+
+
+def _analyze_sheets(
+    file_path: str,
+    valid_values: Dict[str, Set],
+    sheet_names: List[str],
+    chunksize: int,
+    usecols: List[str],
+    raw: bool,
+    profile_columns: bool,
+) -> pandas.DataFrame:
+    """Analyzes several sheets of a workbook, one block of rows per sheet."""
+    if sheet_names is None:
+        sheet_names = excel_sheet_names(file_path)
+
+    sheet_results = []
+    for sheet_name in sheet_names:
+        stats = FillStats(valid_values, profile_columns)
+        with profiling.stage("read"):
+            chunks = read_excel_chunks(file_path, sheet_name, chunksize, usecols, raw)
+        for chunk in profiling.timed_chunks("read", chunks):
+            with profiling.stage("count", rows=len(chunk)):
+                stats.update(chunk)
+        result = stats.to_frame()
+        result.insert(0, "Sheet", sheet_name)
+        sheet_results.append(result)
 
+    # Blank sheets have no columns; leaving them out keeps the count dtypes
+    filled = [result for result in sheet_results if len(result)]
+    return pandas.concat(filled or sheet_results, ignore_index=True)
 
+
+def _analyze_zip(
+    file_path: str,
+    valid_values: Dict[str, Set],
+    profile_columns: bool,
+    csv_options: Dict,
+) -> pandas.DataFrame:
+    """Analyzes the CSV members of a ZIP archive, one block of rows per member."""
+    members = zip_csv_members(file_path)
+    if not members:
+        raise ValueError(f"No CSV file found in archive: {file_path}")
+
+    member_results = []
+    for member in members:
+        stats = FillStats(valid_values, profile_columns)
+        with profiling.stage("read"):
+            chunks = read_zip_member_chunks(file_path, member, **csv_options)
+        for chunk in profiling.timed_chunks("read", chunks):
+            with profiling.stage("count", rows=len(chunk)):
+                stats.update(chunk)
+        result = stats.to_frame()
+        if len(members) > 1:
+            result.insert(0, "Member", member)
+        member_results.append(result)
+
+    return pandas.concat(member_results, ignore_index=True)
+
+
+@profiling.profiled("directory")
 def analyze_directory(
-    directory_path: str, valid_values: Dict[str, Set] = None
+    directory_path: str,
+    valid_values: Dict[str, Set] = None,
+    workers: int = None,
+    cache: str = None,
+    incremental: bool = False,
+    shard: Tuple[int, int] = None,
+    **options,
 ) -> Dict[str, pandas.DataFrame]:
     """
     Analyzes all Excel and CSV files in a directory.
@@ -82,22 +247,149 @@ def analyze_directory(
     Args:
        directory_path: Path to the directory containing the files
        valid_values: Dictionary with valid values per column
+       workers: Number of processes used to analyze files in parallel. ``None``
+          or ``1`` analyzes the files one after the other in this process.
+       cache: Path to a ResultCache database. Files whose content and
+          settings did not change since they were cached are not analyzed again.
+       incremental: Treat CSV files as append-only and only parse the records
+          added since the last run (see analyze_incremental). Requires cache.
+       shard: Shard number and number of shards, to analyze only the files
+          of this shard (see analysis.shards.shard_of)
+       options: Keyword arguments forwarded to analyze_file, such as chunksize
 
     Returns:
-       Dictionary with file names as keys and result DataFrames as values.
+       Dictionary with file names as keys and result DataFrames as values,
+       ordered by file name.
     """
+    filenames = [
+        filename
+        for filename in sorted(os.listdir(directory_path))
+        if os.path.isfile(os.path.join(directory_path, filename))
+        and filename.lower().endswith(SUPPORTED_EXTENSIONS)
+        and in_shard(filename, shard)
+    ]
+
+    if cache is None:
+        return _analyze_files(directory_path, filenames, valid_values, workers, options)
+
+    settings = cache_key(valid_values, **options)
+    with ResultCache(cache) as result_cache:
+        results = {}
+        for filename in filenames:
+            cached = result_cache.get(os.path.join(directory_path, filename), settings)
+            if cached is not None:
+                results[filename] = cached
+                print(f"Analysis loaded from cache for: {filename}")
+
+        pending = [filename for filename in filenames if filename not in results]
+        if incremental:
+            appended = [name for name in pending if name.lower().endswith(".csv")]
+            pending = [name for name in pending if name not in appended]
+            results.update(
+                _analyze_incremental_files(
+                    directory_path, appended, result_cache, valid_values, options
+                )
+            )
+        analyzed = _analyze_files(
+            directory_path, pending, valid_values, workers, options
+        )
+        for filename, file_results in analyzed.items():
+            result_cache.put(
+                os.path.join(directory_path, filename), settings, file_results
+            )
+        results.update(analyzed)
+
+    return {
+        filename: results[filename] for filename in filenames if filename in results
+    }
+
+
+def _analyze_incremental_files(
+    directory_path: str,
+    filenames: List[str],
+    result_cache: ResultCache,
+    valid_values: Dict[str, Set],
+    options: Dict,
+) -> Dict[str, pandas.DataFrame]:
+    """Analyzes CSV files of a directory, parsing only their new records."""
+    read_options = {
+        name: value for name, value in options.items() if name in INCREMENTAL_OPTIONS
+    }
     results = {}
+    for filename in filenames:
+        file_path = os.path.join(directory_path, filename)
+        try:
+            results[filename] = analyze_incremental(
+                file_path, result_cache, valid_values, **read_options
+            )
+            print(f"Analysis updated for: {filename}")
+        except Exception as e:
+            print(f"Error analyzing {filename}: {str(e)}")
+    return results
+
+
+# Valid values of the files analyzed by a worker process, set once per process
+_worker_valid_values = None
+
+
+def _init_worker(valid_values: Dict[str, Set], profile: bool = False) -> None:
+    """Keeps the valid values in a worker process, so compiled rules are sent
+    and built once per process instead of once per file."""
+    global _worker_valid_values
+    _worker_valid_values = valid_values
+    if profile:
+        profiling.enable()
+
+
+def _analyze_in_worker(
+    file_path: str, **options
+) -> Tuple[pandas.DataFrame, List[Dict]]:
+    """Runs analyze_file in a worker process set up by _init_worker, and
+    returns the profiling events recorded meanwhile with the result."""
+    result = analyze_file(file_path, _worker_valid_values, **options)
+    return result, profiling.drain()
+
+
+def _analyze_files(
+    directory_path: str,
+    filenames: List[str],
+    valid_values: Dict[str, Set],
+    workers: int,
+    options: Dict,
+) -> Dict[str, pandas.DataFrame]:
+    """Analyzes the given files of a directory, reporting and skipping errors."""
+    results = {}
+
+    if workers is not None and workers > 1 and len(filenames) > 1:
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_worker,
+            initargs=(valid_values, profiling.enabled()),
+        ) as executor:
+            futures = {
+                filename: executor.submit(
+                    _analyze_in_worker,
+                    os.path.join(directory_path, filename),
+                    **options,
+                )
+                for filename in filenames
+            }
+            for filename, future in futures.items():
+                try:
+                    results[filename], events = future.result()
+                    profiling.extend(events)
+                    print(f"Analysis completed for: {filename}")
+                except Exception as e:
+                    print(f"Error analyzing {filename}: {str(e)}")
+        return results
 
-    for filename in os.listdir(directory_path):
+    for filename in filenames:
         file_path = os.path.join(directory_path, filename)
-        if os.path.isfile(file_path) and filename.lower().endswith(
-            (".csv", ".xlsx", ".xls")
-        ):
-            try:
-                file_results = analyze_file(file_path, valid_values)
-                results[filename] = file_results
-                print(f"Analysis completed for: {filename}")
-            except Exception as e:
-                print(f"Error analyzing {filename}: {str(e)}")
+        try:
+            file_results = analyze_file(file_path, valid_values, **options)
+            results[filename] = file_results
+            print(f"Analysis completed for: {filename}")
+        except Exception as e:
+            print(f"Error analyzing {filename}: {str(e)}")
 
     return results
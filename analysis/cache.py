@@ -0,0 +1,307 @@
+import hashlib
+import json
+import os
+import sqlite3
+import time
+import pandas
+from typing import Dict, Set, Tuple
+from analysis.rules import ColumnRule
+
+# Entries kept by default and seconds after which unused entries are dropped
+DEFAULT_MAX_ENTRIES = 10000
+DEFAULT_MAX_AGE = 30 * 24 * 60 * 60
+
+# Bytes hashed at the start and at the end of a file for its fingerprint
+SAMPLE_SIZE = 1 << 20
+
+# Bytes hashed at the start of a file and before the last analyzed offset
+PREFIX_SAMPLE_SIZE = 1 << 16
+
+
+def fingerprint(file_path: str) -> Tuple[int, int, str]:
+    """
+    Identifies the content of a file without reading all of it.
+
+    Args:
+       file_path: Path to the file
+
+    Returns:
+       Tuple with the size, the modification time in nanoseconds and a hash
+       of the first and last SAMPLE_SIZE bytes of the file
+    """
+    stat = os.stat(file_path)
+    digest = hashlib.blake2b(str(stat.st_size).encode())
+    with open(file_path, "rb") as f:
+        digest.update(f.read(SAMPLE_SIZE))
+        if stat.st_size > SAMPLE_SIZE:
+            f.seek(max(stat.st_size - SAMPLE_SIZE, SAMPLE_SIZE))
+            digest.update(f.read())
+    return stat.st_size, stat.st_mtime_ns, digest.hexdigest()
+
+
+def prefix_digest(file_path: str, offset: int) -> str:
+    """
+    Hashes the part of a file before an offset, to detect rewrites of a file
+    that should only grow.
+
+    Args:
+       file_path: Path to the file
+       offset: End of the part already analyzed
+
+    Returns:
+       Hash of the first and the last PREFIX_SAMPLE_SIZE bytes before offset
+    """
+    digest = hashlib.blake2b(str(offset).encode())
+    with open(file_path, "rb") as f:
+        digest.update(f.read(min(offset, PREFIX_SAMPLE_SIZE)))
+        if offset > PREFIX_SAMPLE_SIZE:
+            start = max(offset - PREFIX_SAMPLE_SIZE, PREFIX_SAMPLE_SIZE)
+            f.seek(start)
+            digest.update(f.read(offset - start))
+    return digest.hexdigest()
+
+
+def cache_key(valid_values: Dict[str, Set] = None, **options) -> str:
+    """
+    Builds the part of the cache key that depends on the analysis settings.
+
+    Args:
+       valid_values: Dictionary with valid values per column
+       options: Keyword arguments given to analyze_file
+
+    Returns:
+       String that is equal for settings that give the same results
+    """
+    rules = {
+        str(column): (
+            values.key
+            if isinstance(values, ColumnRule)
+            else sorted(repr(value) for value in values)
+        )
+        for column, values in (valid_values or {}).items()
+    }
+    # Engines, chunks and byte ranges may infer other types for the same
+    # values, so every option is part of the key
+    settings = {name: value for name, value in options.items() if value is not None}
+    return json.dumps({"rules": rules, "options": settings}, sort_keys=True)
+
+
+class ResultCache:
+    """
+    SQLite store of analysis results keyed by file fingerprint and settings.
+
+    A cached result is returned only while the size, the modification time
+    and the sampled content hash of the file are unchanged. Entries unused
+    for more than ``max_age`` seconds are evicted, and only the
+    ``max_entries`` most recently used ones are kept. With
+    ``check_same_thread=False`` the cache can be used from other threads, one
+    at a time.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        max_age: float = DEFAULT_MAX_AGE,
+        check_same_thread: bool = True,
+    ):
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+
+        self.path = path
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self.connection = sqlite3.connect(path, check_same_thread=check_same_thread)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            " path TEXT NOT NULL,"
+            " settings TEXT NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " mtime_ns INTEGER NOT NULL,"
+            " digest TEXT NOT NULL,"
+            " result TEXT NOT NULL,"
+            " accessed REAL NOT NULL,"
+            " PRIMARY KEY (path, settings))"
+        )
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS partials ("
+            " path TEXT NOT NULL,"
+            " settings TEXT NOT NULL,"
+            " offset INTEGER NOT NULL,"
+            " digest TEXT NOT NULL,"
+            " counts TEXT NOT NULL,"
+            " accessed REAL NOT NULL,"
+            " PRIMARY KEY (path, settings))"
+        )
+
+    def get(
+        self,
+        file_path: str,
+        settings: str,
+        file_fingerprint: Tuple[int, int, str] = None,
+    ) -> pandas.DataFrame:
+        """
+        Looks up the result of a file.
+
+        Args:
+           file_path: Path to the analyzed file
+           settings: Key built by cache_key
+           file_fingerprint: Fingerprint of the file, when it was already
+              computed. The file is not read then, so the cache is not held
+              while the file is read.
+
+        Returns:
+           Cached result DataFrame, or None if there is no valid entry
+        """
+        key = (os.path.abspath(file_path), settings)
+        row = self.connection.execute(
+            "SELECT size, mtime_ns, digest, result FROM results"
+            " WHERE path = ? AND settings = ?",
+            key,
+        ).fetchone()
+        if row is None:
+            return None
+
+        size, mtime_ns, digest, result = row
+        if file_fingerprint is not None:
+            changed = tuple(file_fingerprint) != (size, mtime_ns, digest)
+        else:
+            stat = os.stat(file_path)
+            changed = (stat.st_size, stat.st_mtime_ns) != (size, mtime_ns) or (
+                fingerprint(file_path)[2] != digest
+            )
+        if changed:
+            # The file changed since it was cached. Partial counts are kept,
+            # they are checked against the prefix of the file when used.
+            with self.connection:
+                self.connection.execute("DELETE FROM results WHERE path = ?", key[:1])
+            return None
+
+        with self.connection:
+            self.connection.execute(
+                "UPDATE results SET accessed = ? WHERE path = ? AND settings = ?",
+                (time.time(), *key),
+            )
+        return pandas.DataFrame(json.loads(result))
+
+    def put(
+        self,
+        file_path: str,
+        settings: str,
+        result: pandas.DataFrame,
+        file_fingerprint: Tuple[int, int, str] = None,
+    ) -> None:
+        """
+        Stores the result of a file.
+
+        Args:
+           file_path: Path to the analyzed file
+           settings: Key built by cache_key
+           result: Result DataFrame returned by analyze_file
+           file_fingerprint: Fingerprint of the file taken before it was
+              analyzed, computed here when not given
+        """
+        size, mtime_ns, digest = file_fingerprint or fingerprint(file_path)
+        with self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    os.path.abspath(file_path),
+                    settings,
+                    size,
+                    mtime_ns,
+                    digest,
+                    json.dumps(result.to_dict(orient="list"), default=str),
+                    time.time(),
+                ),
+            )
+
+    def get_partial(self, file_path: str, settings: str) -> Tuple[int, str, dict]:
+        """
+        Looks up the partial counts stored for an append-only file.
+
+        Args:
+           file_path: Path to the analyzed file
+           settings: Key built by cache_key
+
+        Returns:
+           Tuple with the offset analyzed up to, the prefix_digest at that
+           offset and the counts (FillStats.to_dict), or None
+        """
+        key = (os.path.abspath(file_path), settings)
+        row = self.connection.execute(
+            "SELECT offset, digest, counts FROM partials"
+            " WHERE path = ? AND settings = ?",
+            key,
+        ).fetchone()
+        if row is None:
+            return None
+
+        with self.connection:
+            self.connection.execute(
+                "UPDATE partials SET accessed = ? WHERE path = ? AND settings = ?",
+                (time.time(), *key),
+            )
+        offset, digest, counts = row
+        return offset, digest, json.loads(counts)
+
+    def put_partial(
+        self, file_path: str, settings: str, offset: int, digest: str, counts: dict
+    ) -> None:
+        """
+        Stores the partial counts of an append-only file.
+
+        Args:
+           file_path: Path to the analyzed file
+           settings: Key built by cache_key
+           offset: Byte offset the counts were computed up to
+           digest: prefix_digest of the file at offset
+           counts: Counts returned by FillStats.to_dict
+        """
+        with self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO partials VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    os.path.abspath(file_path),
+                    settings,
+                    offset,
+                    digest,
+                    json.dumps(counts, default=str),
+                    time.time(),
+                ),
+            )
+
+    def invalidate(self, file_path: str) -> None:
+        """Drops every cached result and partial count of a file."""
+        with self.connection:
+            for table in ("results", "partials"):
+                self.connection.execute(
+                    f"DELETE FROM {table} WHERE path = ?",
+                    (os.path.abspath(file_path),),
+                )
+
+    def evict(self) -> None:
+        """Drops the entries that are too old or exceed max_entries."""
+        with self.connection:
+            for table in ("results", "partials"):
+                self.connection.execute(
+                    f"DELETE FROM {table} WHERE accessed < ?",
+                    (time.time() - self.max_age,),
+                )
+                self.connection.execute(
+                    f"DELETE FROM {table} WHERE rowid NOT IN ("
+                    f" SELECT rowid FROM {table} ORDER BY accessed DESC LIMIT ?)",
+                    (self.max_entries,),
+                )
+
+    def close(self) -> None:
+        """Evicts stale entries and closes the database."""
+        self.evict()
+        self.connection.close()
+
+    def __enter__(self) -> "ResultCache":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
@@ -1,10 +1,38 @@
 import os
+import sys
 import argparse
-from analysis.analysis import analyze_file, analyze_directory
-from analysis.utils import export_results
+from typing import List, Tuple, Union
+from analysis import profiling
+from analysis.defaults import (
+    CACHE_FILENAME,
+    CSV_ENGINES,
+    DEFAULT_HOST,
+    DEFAULT_MAX_INFLIGHT,
+    DEFAULT_MAX_QUEUE,
+    DEFAULT_PORT,
+    OUTPUT_FORMATS,
+)
+
+
+def sample_fraction(value: str) -> float:
+    """Parses --sample with analysis.sampling.parse_sample."""
+    from analysis.sampling import parse_sample
+
+    return parse_sample(value)
+
+
+def shard_number(value: str) -> Tuple[int, int]:
+    """Parses --shard with analysis.shards.parse_shard."""
+    from analysis.shards import parse_shard
+
+    return parse_shard(value)
 
 
 def main():
+    if sys.argv[1:2] == ["merge"]:
+        merge_main(sys.argv[2:])
+        return
+
     parser = argparse.ArgumentParser(
         description="Analyze the percentage of columns filled in Excel or CSV files.",
         add_help=True,
@@ -15,14 +43,212 @@ def main():
         type=str,
         help="Path to the directory containing the files to be analyzed.",
     )
+    parser.add_argument(
+        "--watch",
+        type=str,
+        help="Directory to watch, analyzing files as they are added or modified.",
+    )
+    parser.add_argument(
+        "--recursive",
+        action="store_true",
+        help="Also analyze the files in the subdirectories of --directory.",
+    )
+    parser.add_argument(
+        "--max-inflight",
+        type=int,
+        default=DEFAULT_MAX_INFLIGHT,
+        help="Files processed at the same time with --recursive.",
+    )
     parser.add_argument(
         "--output",
         type=str,
         default="results",
         help="Directory where the results will be stored",
     )
+    parser.add_argument(
+        "--format",
+        choices=list(OUTPUT_FORMATS),
+        default="xlsx",
+        help="Format of the result files (csv and parquet are the fastest).",
+    )
+    parser.add_argument(
+        "--combined-only",
+        action="store_true",
+        help="Only write the combined report, not one file per analyzed file.",
+    )
+    parser.add_argument(
+        "--chunksize",
+        type=int,
+        default=None,
+        help="Read CSV files in chunks of this many rows to bound memory usage.",
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=None,
+        help="Number of processes used to analyze the files of a directory "
+        "(one by default), or the workers of --serve (one per CPU by default).",
+    )
+    parser.add_argument(
+        "--parallel",
+        type=int,
+        default=None,
+        help="Split every CSV file into byte ranges analyzed by this many processes.",
+    )
+    parser.add_argument(
+        "--columns",
+        type=str,
+        default=None,
+        help="Comma separated names of the only columns to analyze.",
+    )
+    parser.add_argument(
+        "--engine",
+        choices=CSV_ENGINES,
+        default="pandas",
+        help="Parser used for CSV files (auto uses pyarrow when installed, "
+        "mmap counts plain CSV fields without building DataFrames).",
+    )
+    parser.add_argument(
+        "--sheets",
+        type=str,
+        default=None,
+        help="Comma separated Excel sheets to analyze separately, or 'all'.",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Analyze every file again instead of reusing cached results.",
+    )
+    parser.add_argument(
+        "--raw",
+        action="store_true",
+        help="Read every column as text, skipping type inference.",
+    )
+    parser.add_argument(
+        "--rules",
+        type=str,
+        default=None,
+        help="YAML or JSON file with the valid values or patterns of columns.",
+    )
+    parser.add_argument(
+        "--sample",
+        type=sample_fraction,
+        default=None,
+        help="Estimate the statistics of CSV files from a sample, e.g. 1%%.",
+    )
+    parser.add_argument(
+        "--profile-columns",
+        action="store_true",
+        help="Add distinct counts, most frequent values and lengths of columns.",
+    )
+    parser.add_argument(
+        "--compact",
+        action="store_true",
+        help="Keep CSV text as Arrow strings to reduce memory on wide text dumps.",
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Treat CSV files as append-only and only analyze their new rows.",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Print the time, rows and bytes of every stage and the peak memory.",
+    )
+    parser.add_argument(
+        "--profile-trace",
+        type=str,
+        help="Write the timed stages as a JSON trace (chrome://tracing, Perfetto).",
+    )
+    parser.add_argument(
+        "--profile-dump",
+        type=str,
+        help="Run under cProfile and write its statistics to this file.",
+    )
+    parser.add_argument(
+        "--serve",
+        action="store_true",
+        help="Run an analysis server for --server clients, with --jobs workers.",
+    )
+    parser.add_argument(
+        "--host",
+        type=str,
+        default=DEFAULT_HOST,
+        help="Loopback address the server listens on.",
+    )
+    parser.add_argument(
+        "--root",
+        type=str,
+        default=None,
+        help="Directory the requests of --serve clients may read and write "
+        "under (the current directory by default).",
+    )
+    parser.add_argument(
+        "--port", type=int, default=DEFAULT_PORT, help="Port of the server."
+    )
+    parser.add_argument(
+        "--max-queue",
+        type=int,
+        default=DEFAULT_MAX_QUEUE,
+        help="Requests waiting for a worker before the server refuses new ones.",
+    )
+    parser.add_argument(
+        "--server",
+        type=str,
+        help="Send the --file or --directory analysis to this analyze --serve "
+        "server, e.g. http://127.0.0.1:8765.",
+    )
+    parser.add_argument(
+        "--shard",
+        type=shard_number,
+        default=None,
+        help="Analyze only the files of shard i of N of --directory (e.g. 2/4) and "
+        "save their results in --output for analyze merge.",
+    )
 
     args = parser.parse_args()
+    if args.incremental and args.no_cache:
+        parser.error("--incremental stores its counts in the cache, drop --no-cache")
+    if args.incremental and args.recursive:
+        parser.error("--incremental cannot be combined with --recursive")
+    if args.incremental and args.sample:
+        parser.error("--incremental cannot be combined with --sample")
+    if args.incremental and args.file and not args.file.lower().endswith(".csv"):
+        parser.error("--incremental only reads plain (uncompressed) CSV files")
+    if args.serve and (args.file or args.directory or args.watch):
+        parser.error("--serve cannot be combined with --file, --directory or --watch")
+    if args.serve:
+        from analysis.server import is_loopback
+
+        if not is_loopback(args.host):
+            parser.error("--host must be a loopback address, the server has no login")
+    if args.server and not (args.file or args.directory):
+        parser.error("--server needs --file or --directory")
+    if args.server and (args.recursive or args.incremental):
+        parser.error("--server cannot be combined with --recursive or --incremental")
+    if args.shard and not args.directory:
+        parser.error("--shard needs --directory")
+    if args.shard and args.server:
+        parser.error("--shard cannot be combined with --server")
+
+    if args.server:
+        request_server(args, parser)
+        return
+    if not (args.profile or args.profile_trace or args.profile_dump):
+        run(args, parser)
+        return
+    with profiling.session(args.profile, args.profile_trace, args.profile_dump):
+        run(args, parser)
+
+
+def run(args: argparse.Namespace, parser: argparse.ArgumentParser) -> None:
+    """Runs the analysis selected by the command line arguments."""
+    # Imported here, so --help and argument errors answer without pandas
+    from analysis.analysis import analyze_directory, analyze_file
+    from analysis.utils import export_results
+
+    usecols, sheet_name = read_selection(args)
 
     # Define valid values for specific columns (customize according to your needs)
     # Example: for the column 'COMPRABLE', 'Y', ' ' and '' are considered as valid values
@@ -31,29 +257,284 @@ def main():
         "VENDIBLE": {"S", "N", " ", ""},
         # Add more columns as needed
     }
+    if args.rules:
+        # Rules read from a file replace the ones above, compiled once for all files
+        from analysis.rules import load_rules
 
-    if args.file:
+        valid_values = load_rules(args.rules)
+
+    if args.serve:
+        # Keep the workers warm and analyze the requests of --server clients
+        from analysis.server import serve
+
+        serve(
+            args.host,
+            args.port,
+            valid_values,
+            args.jobs,
+            args.max_queue,
+            args.root,
+        )
+
+    elif args.file and args.incremental:
+        # Analyze only the rows appended since the last run
+        from analysis.cache import ResultCache
+        from analysis.incremental import analyze_incremental
+
+        with ResultCache(os.path.join(args.output, CACHE_FILENAME)) as cache:
+            result = analyze_incremental(
+                args.file,
+                cache,
+                valid_values,
+                chunksize=args.chunksize,
+                usecols=usecols,
+                raw=args.raw,
+                engine=args.engine,
+                profile_columns=args.profile_columns,
+            )
+        print("\nResults:")
+        print(result)
+
+        export_results(
+            {os.path.basename(args.file): result},
+            args.output,
+            output_format=args.format,
+            combined=False,
+        )
+
+    elif args.file:
         # Analyze a single file
-        result = analyze_file(args.file, valid_values)
+        result = analyze_file(
+            args.file,
+            valid_values,
+            chunksize=args.chunksize,
+            parallel=args.parallel,
+            usecols=usecols,
+            raw=args.raw,
+            engine=args.engine,
+            sheet_name=sheet_name,
+            sample=args.sample,
+            profile_columns=args.profile_columns,
+            compact=args.compact,
+        )
         print("\nResults:")
         print(result)
 
         # Export results
-        if not os.path.exists(args.output):
-            os.makedirs(args.output)
-        base_name = os.path.splitext(os.path.basename(args.file))[0]
-        output_path = os.path.join(args.output, f"{base_name}_analysis.xlsx")
-        result.to_excel(output_path, index=False)
-        print(f"\nResults will be saved at: {output_path}")
+        export_results(
+            {os.path.basename(args.file): result},
+            args.output,
+            output_format=args.format,
+            combined=False,
+        )
+
+    elif args.directory and args.recursive:
+        # Scan the whole tree, overlapping the file system latency of many files
+        from analysis.scanner import scan_directory
+
+        results = scan_directory(
+            args.directory,
+            valid_values,
+            workers=args.jobs,
+            cache=cache_path(args),
+            max_inflight=args.max_inflight,
+            shard=args.shard,
+            chunksize=args.chunksize,
+            parallel=args.parallel,
+            usecols=usecols,
+            raw=args.raw,
+            engine=args.engine,
+            sheet_name=sheet_name,
+            sample=args.sample,
+            profile_columns=args.profile_columns,
+            compact=args.compact,
+        )
+        export_directory(results, args)
 
     elif args.directory:
-        # Scan all files in a directory
-        results = analyze_directory(args.directory, valid_values)
-        export_results(results, args.output)
+        # Scan all files in a directory, reusing the results of unchanged files
+        results = analyze_directory(
+            args.directory,
+            valid_values,
+            workers=args.jobs,
+            cache=cache_path(args),
+            incremental=args.incremental,
+            shard=args.shard,
+            chunksize=args.chunksize,
+            parallel=args.parallel,
+            usecols=usecols,
+            raw=args.raw,
+            engine=args.engine,
+            sheet_name=sheet_name,
+            sample=args.sample,
+            profile_columns=args.profile_columns,
+            compact=args.compact,
+        )
+        export_directory(results, args)
+    elif args.watch:
+        # Analyze the files of a directory as they land, until interrupted
+        from analysis.watch import watch_directory
+
+        print(f"Watching {args.watch} (Ctrl+C to stop)")
+        cache = None if args.no_cache else os.path.join(args.output, CACHE_FILENAME)
+        try:
+            watch_directory(
+                args.watch,
+                args.output,
+                valid_values,
+                output_format=args.format,
+                per_file=not args.combined_only,
+                cache=cache,
+                chunksize=args.chunksize,
+                parallel=args.parallel,
+                usecols=usecols,
+                raw=args.raw,
+                engine=args.engine,
+                sheet_name=sheet_name,
+                sample=args.sample,
+                profile_columns=args.profile_columns,
+                compact=args.compact,
+            )
+        except KeyboardInterrupt:
+            print("Watch stopped.")
     else:
-        print("You must specify --file or --directory to indicate what to scan.")
+        print(
+            "You must specify --file or --directory (or --watch) to indicate what to scan."
+        )
         parser.print_help()
 
 
+def cache_path(args: argparse.Namespace) -> Union[str, None]:
+    """Cache database of a directory analysis, one per shard so that shard
+    processes writing to the same --output do not share it."""
+    if args.no_cache:
+        return None
+    if args.shard:
+        from analysis.shards import shard_name
+
+        return os.path.join(args.output, shard_name(args.shard) + CACHE_FILENAME)
+    return os.path.join(args.output, CACHE_FILENAME)
+
+
+def export_directory(results: dict, args: argparse.Namespace) -> None:
+    """Writes the results of a directory, or of its shard for analyze merge."""
+    from analysis.shards import write_shard
+    from analysis.utils import export_results
+
+    if args.shard:
+        write_shard(results, args.output, args.shard)
+        return
+    export_results(
+        results,
+        args.output,
+        output_format=args.format,
+        per_file=not args.combined_only,
+    )
+
+
+def merge_main(argv: List[str]) -> None:
+    """Runs analyze merge, which writes the report of the shards of a
+    directory analyzed with --shard."""
+    parser = argparse.ArgumentParser(
+        prog="analyze merge",
+        description="Combine the results saved by analyze --shard into the "
+        "reports of the whole directory.",
+    )
+    parser.add_argument(
+        "shards",
+        type=str,
+        help="Directory where the shards saved their results (their --output).",
+    )
+    parser.add_argument(
+        "--output",
+        type=str,
+        default="results",
+        help="Directory where the results will be stored",
+    )
+    parser.add_argument(
+        "--format",
+        choices=list(OUTPUT_FORMATS),
+        default="xlsx",
+        help="Format of the result files (csv and parquet are the fastest).",
+    )
+    parser.add_argument(
+        "--combined-only",
+        action="store_true",
+        help="Only write the combined report, not one file per analyzed file.",
+    )
+    args = parser.parse_args(argv)
+
+    from analysis.shards import merge_shards
+    from analysis.utils import export_results
+
+    try:
+        results = merge_shards(args.shards)
+    except ValueError as e:
+        parser.exit(1, f"{e}\n")
+    export_results(
+        results,
+        args.output,
+        output_format=args.format,
+        per_file=not args.combined_only,
+    )
+
+
+def read_selection(
+    args: argparse.Namespace,
+) -> Tuple[List[str], Union[int, List[str], None]]:
+    """Columns and sheets to analyze, from --columns and --sheets."""
+    usecols = args.columns.split(",") if args.columns else None
+    if args.sheets is None:
+        sheet_name = 0
+    elif args.sheets == "all":
+        sheet_name = None
+    else:
+        sheet_name = args.sheets.split(",")
+    return usecols, sheet_name
+
+
+def request_server(args: argparse.Namespace, parser: argparse.ArgumentParser) -> None:
+    """Sends the analysis to an analyze --serve server and prints its results.
+    The server writes the result files, this process never imports pandas."""
+    from analysis.client import format_table, request_analysis
+
+    usecols, sheet_name = read_selection(args)
+    request = {
+        "options": {
+            "chunksize": args.chunksize,
+            "parallel": args.parallel,
+            "usecols": usecols,
+            "raw": args.raw,
+            "engine": args.engine,
+            "sheet_name": sheet_name,
+            "sample": args.sample,
+            "profile_columns": args.profile_columns,
+            "compact": args.compact,
+        },
+        "output": os.path.abspath(args.output),
+        "format": args.format,
+    }
+    if args.file:
+        request.update(file=os.path.abspath(args.file), combined=False)
+    else:
+        request.update(
+            directory=os.path.abspath(args.directory),
+            per_file=not args.combined_only,
+        )
+    if args.rules:
+        request["rules"] = os.path.abspath(args.rules)
+
+    try:
+        results = request_analysis(args.server, request)
+    except RuntimeError as e:
+        parser.exit(1, f"{e}\n")
+
+    print("\nResults:")
+    for name, rows in results.items():
+        if args.directory:
+            print(f"\n{name}")
+        print(format_table(rows))
+
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,58 @@
+import json
+import urllib.error
+import urllib.request
+from typing import Dict, List
+
+# This module only uses the standard library, so a client starts without
+# importing pandas.
+
+
+def request_analysis(url: str, request: Dict, timeout: float = None) -> Dict:
+    """
+    Sends an analysis request to an AnalysisServer.
+
+    Args:
+       url: Address of the server, such as ``http://127.0.0.1:8765``
+       request: Request body, see analysis.server.parse_request
+       timeout: Seconds to wait for the answer, forever by default
+
+    Returns:
+       Dictionary with file names as keys and the rows of their result
+       tables as values
+
+    Raises:
+       RuntimeError: If the server refuses or fails the request
+    """
+    http_request = urllib.request.Request(
+        url.rstrip("/") + "/analyze",
+        data=json.dumps(request).encode(),
+        headers={"Content-Type": "application/json"},
+        method="POST",
+    )
+    try:
+        with urllib.request.urlopen(http_request, timeout=timeout) as response:
+            return json.load(response)["results"]
+    except urllib.error.HTTPError as e:
+        try:
+            message = json.load(e)["error"]
+        except (ValueError, KeyError):
+            message = e.reason
+        raise RuntimeError(f"Server error {e.code}: {message}") from None
+    except urllib.error.URLError as e:
+        raise RuntimeError(f"Cannot reach the server at {url}: {e.reason}") from None
+
+
+def format_table(rows: List[Dict]) -> str:
+    """Formats the rows of a result table as aligned text columns."""
+    if not rows:
+        return "(no columns)"
+    columns = list(rows[0])
+    cells = [columns] + [
+        ["" if row.get(column) is None else str(row.get(column)) for column in columns]
+        for row in rows
+    ]
+    widths = [max(len(line[index]) for line in cells) for index in range(len(columns))]
+    return "\n".join(
+        "  ".join(cell.rjust(width) for cell, width in zip(line, widths))
+        for line in cells
+    )
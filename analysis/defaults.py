@@ -0,0 +1,32 @@
+"""
+Settings shared by the command line and the analysis modules.
+
+This module must not import pandas, NumPy or any other heavy dependency:
+the command line builds its parser from it, so ``analyze --help`` and
+argument errors answer without loading them.
+"""
+
+# Name of the cache database created in the output directory by the CLI
+CACHE_FILENAME = ".analysis_cache.sqlite"
+
+# File extension written for every output format
+OUTPUT_FORMATS = {
+    "xlsx": ".xlsx",
+    "csv": ".csv",
+    "parquet": ".parquet",
+    "json": ".json",
+}
+
+# Engines that can parse CSV files. mmap counts plain CSV files without
+# building DataFrames (see analysis.mmapcsv) and reads them with pandas when
+# DataFrames are needed.
+CSV_ENGINES = ("pandas", "pyarrow", "auto", "mmap")
+
+# Files read, looked up in the cache or analyzed at the same time by default
+DEFAULT_MAX_INFLIGHT = 8
+
+# Address of analyze --serve and requests waiting for a worker before new
+# ones are refused
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+DEFAULT_MAX_QUEUE = 32
@@ -0,0 +1,86 @@
+import os
+import pandas
+from typing import Dict, List, Set
+from analysis.cache import ResultCache, cache_key, prefix_digest
+from analysis.parallel import count_range, find_record_starts, last_record_end
+from analysis.stats import FillStats
+
+# Options of analyze_file supported by analyze_incremental
+INCREMENTAL_OPTIONS = ("chunksize", "engine", "usecols", "raw", "profile_columns")
+
+
+def analyze_incremental(
+    file_path: str,
+    cache: ResultCache,
+    valid_values: Dict[str, Set] = None,
+    chunksize: int = None,
+    engine: str = "pandas",
+    usecols: List[str] = None,
+    raw: bool = False,
+    profile_columns: bool = False,
+) -> pandas.DataFrame:
+    """
+    Analyzes an append-only CSV file, parsing only what was added since the
+    last run.
+
+    The counts of the records already analyzed are stored in the cache with
+    the byte offset they end at and a hash of the file before that offset.
+    When the hash still matches, only the bytes after the offset are parsed
+    and their counts merged with the stored ones. Otherwise the file was
+    rewritten and it is analyzed from the start. A last record without a
+    trailing newline may still be being written, so it is left for the next
+    run.
+
+    Args:
+       file_path: Path to the CSV file
+       cache: ResultCache where the partial counts are stored
+       valid_values: Dictionary with valid values per column
+       chunksize: Number of rows read at a time
+       engine: One of analysis.readers.CSV_ENGINES
+       usecols: Names of the columns to analyze
+       raw: Read every column as text without type inference
+       profile_columns: Also profile every column, see analyze_file
+
+    Returns:
+       DataFrame with fill statistics for each column
+    """
+    settings = cache_key(
+        valid_values, usecols=usecols, raw=raw, profile_columns=profile_columns
+    )
+    size = os.path.getsize(file_path)
+    header_end = find_record_starts(file_path, [0])[0]
+    with open(file_path, "rb") as f:
+        header = f.read(header_end)
+
+    stats = None
+    start = header_end
+    stored = cache.get_partial(file_path, settings)
+    if stored is not None:
+        offset, digest, counts = stored
+        if header_end <= offset <= size and prefix_digest(file_path, offset) == digest:
+            stats = FillStats.from_dict(counts, valid_values)
+            start = offset
+
+    end = last_record_end(file_path, start, size)
+    if stats is None or end > start:
+        tail = count_range(
+            file_path,
+            header,
+            start,
+            end,
+            valid_values,
+            profile_columns,
+            chunksize=chunksize,
+            engine=engine,
+            usecols=usecols,
+            raw=raw or profile_columns,
+        )
+        if stats is None:
+            stats = tail
+        else:
+            stats.merge(tail)
+
+    cache.put_partial(
+        file_path, settings, end, prefix_digest(file_path, end), stats.to_dict()
+    )
+    return stats.to_frame()
@@ -0,0 +1,293 @@
+import csv
+import io
+import mmap
+import numpy
+import pandas
+from typing import Dict, List, Set, Tuple
+from analysis import profiling
+from analysis.readers import NA_VALUES, column_names, read_csv_chunks
+from analysis.stats import FillStats
+
+# Bytes tokenized at a time. Blocks end at a record boundary and grow when a
+# single record is longer.
+DEFAULT_BLOCK_SIZE = 1 << 20
+
+DELIMITER = ord(",")
+NEWLINE = ord("\n")
+CARRIAGE_RETURN = ord("\r")
+QUOTE = ord('"')
+SPACE = ord(" ")
+TAB = ord("\t")
+
+# Missing value tokens, padded to the width of the longest one
+NA_WIDTH = max(len(value) for value in NA_VALUES)
+NA_TOKENS = numpy.array(
+    [value.encode() for value in NA_VALUES if value], f"S{NA_WIDTH}"
+)
+
+# Bytes a missing value token can start with, to compare only those fields
+NA_FIRST_BYTES = numpy.zeros(256, bool)
+NA_FIRST_BYTES[[token[0] for token in NA_TOKENS]] = True
+
+# Bytes that can come before an opening quote and after a closing one. A
+# quote next to a quote is an escaped quote of a quoted field.
+BEFORE_OPENING = numpy.zeros(256, bool)
+BEFORE_OPENING[[DELIMITER, NEWLINE, QUOTE]] = True
+AFTER_CLOSING = numpy.zeros(256, bool)
+AFTER_CLOSING[[DELIMITER, NEWLINE, CARRIAGE_RETURN, QUOTE]] = True
+
+
+class QuoteInFieldError(ValueError):
+    """A quote that is not around a whole field, such as ``5" screen``,
+    which count_filled cannot tokenize."""
+
+
+def _separators(block: numpy.ndarray) -> numpy.ndarray:
+    """Positions of the delimiters and newlines of a block that are not
+    between quotes, for a block that starts outside quotes."""
+    separators = numpy.flatnonzero((block == DELIMITER) | (block == NEWLINE))
+    quotes = numpy.flatnonzero(block == QUOTE)
+    if len(quotes):
+        # Quotes open at the start of a field and close at its end, pandas
+        # keeps any other quote as text
+        opening = quotes[0::2]
+        opening = opening[opening > 0]
+        closing = quotes[1::2]
+        closing = closing[closing + 1 < len(block)]
+        if not (
+            BEFORE_OPENING[block[opening - 1]].all()
+            and AFTER_CLOSING[block[closing + 1]].all()
+        ):
+            raise QuoteInFieldError("Quote inside an unquoted field")
+        # A separator is quoted when an odd number of quotes come before it
+        outside = (numpy.searchsorted(quotes, separators) & 1) == 0
+        separators = separators[outside]
+    return separators
+
+
+def _header(data: numpy.ndarray, block_size: int) -> Tuple[List[str], int]:
+    """Reads the column names, named and deduplicated as pandas does, and
+    returns them with the offset of the first data record."""
+    end = len(data)
+    size = block_size
+    while True:
+        separators = _separators(data[:size])
+        newlines = separators[data[separators] == NEWLINE]
+        if len(newlines) or size >= end:
+            break
+        size *= 2
+    end = int(newlines[0]) + 1 if len(newlines) else end
+
+    text = data[:end].tobytes().decode("utf-8").lstrip("\ufeff")
+    fields = next(csv.reader(io.StringIO(text, newline="")), [])
+    return column_names(fields), end
+
+
+def _count_block(
+    block: numpy.ndarray, columns: int, line: int
+) -> Tuple[int, int, numpy.ndarray]:
+    """
+    Counts the filled fields of the complete records of a block.
+
+    Args:
+       block: Bytes starting at a record boundary
+       columns: Number of columns of the header
+       line: Line number of the first record, for error messages
+
+    Returns:
+       Tuple with the bytes of the complete records, the number of rows and
+       the number of filled fields of every column
+    """
+    separators = _separators(block)
+    is_newline = block[separators] == NEWLINE
+    newlines = numpy.flatnonzero(is_newline)
+    if not len(newlines):
+        return 0, 0, numpy.zeros(columns, numpy.int64)
+    separators = separators[: newlines[-1] + 1]
+    is_newline = is_newline[: newlines[-1] + 1]
+
+    starts = numpy.concatenate(([0], separators[:-1] + 1))
+    ends = separators.copy()
+    # Records ending in \r\n
+    ends -= is_newline & (ends > starts) & (block[ends - 1] == CARRIAGE_RETURN)
+    lengths = ends - starts
+
+    # Row and column of every field
+    first = numpy.concatenate(([True], is_newline[:-1]))
+    row_starts = numpy.flatnonzero(first)
+    rows = numpy.cumsum(first) - 1
+    fields = numpy.diff(numpy.append(row_starts, len(separators)))
+    if fields.max() > columns:
+        row = int(numpy.argmax(fields > columns))
+        raise ValueError(
+            f"Expected {columns} fields in line {line + row}, saw {fields[row]}"
+        )
+    column = numpy.arange(len(separators)) - row_starts[rows]
+
+    # Blank lines and lines of spaces and tabs are skipped, like pandas does
+    blank = fields == 1
+    lone = row_starts[blank]
+    if len(lone):
+        spaces = (block == SPACE) | (block == TAB)
+        other = numpy.concatenate(([0], numpy.cumsum(~spaces)))
+        blank[blank] = other[ends[lone]] == other[starts[lone]]
+
+    # The quotes around a field are not part of its value
+    quoted = lengths >= 2
+    quoted[quoted] &= (block[starts[quoted]] == QUOTE) & (
+        block[ends[quoted] - 1] == QUOTE
+    )
+    starts += quoted
+    lengths -= 2 * quoted
+
+    filled = (lengths > 0) & ~blank[rows]
+    short = numpy.flatnonzero(
+        filled & (lengths <= NA_WIDTH) & NA_FIRST_BYTES[block[starts]]
+    )
+    if len(short):
+        offsets = numpy.arange(NA_WIDTH)
+        positions = starts[short, None] + offsets
+        values = block[numpy.minimum(positions, len(block) - 1)]
+        values[offsets >= lengths[short, None]] = 0
+        tokens = values.view(f"S{NA_WIDTH}").ravel()
+        filled[short[numpy.isin(tokens, NA_TOKENS)]] = False
+
+    counts = numpy.bincount(column[filled], minlength=columns)
+    return int(separators[-1]) + 1, int((~blank).sum()), counts
+
+
+def count_filled(
+    file_path: str, block_size: int = DEFAULT_BLOCK_SIZE
+) -> Tuple[List[str], int, numpy.ndarray]:
+    """
+    Counts the rows and the filled fields of every column of a CSV file by
+    tokenizing its memory-mapped bytes with NumPy, without building
+    DataFrames.
+
+    A field is filled when it is not empty and not one of the missing value
+    tokens pandas reads as NaN, quoted or not, and lines that are empty or
+    hold only spaces and tabs are not rows, so the counts match the ones of
+    the pandas engine. The delimiter is a comma and quotes must enclose
+    whole fields: files with other quotes raise QuoteInFieldError.
+
+    Args:
+       file_path: Path to a plain (uncompressed) CSV file
+       block_size: Bytes tokenized at a time
+
+    Returns:
+       Tuple with the column names, the number of rows and the number of
+       filled fields of every column
+
+    Raises:
+       QuoteInFieldError: If a quote is not at the start or the end of a field
+    """
+    with open(file_path, "rb") as f:
+        if not f.seek(0, io.SEEK_END):
+            raise pandas.errors.EmptyDataError("No columns to parse from file")
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        data = numpy.frombuffer(mapped, numpy.uint8)
+        try:
+            return _count_mapped(data, block_size)
+        finally:
+            del data
+            try:
+                mapped.close()
+            except BufferError:
+                # Arrays kept by the traceback of an error still point to the
+                # mapping, it is closed when they are released
+                pass
+
+
+def _count_mapped(
+    data: numpy.ndarray, block_size: int
+) -> Tuple[List[str], int, numpy.ndarray]:
+    names, position = _header(data, block_size)
+    total_rows = 0
+    counts = numpy.zeros(len(names), numpy.int64)
+    line = 2
+    size = block_size
+    while position < len(data):
+        block = data[position : position + size]
+        if position + size >= len(data) and block[-1] != NEWLINE:
+            # The last record has no newline, give it one
+            block = numpy.append(block, numpy.uint8(NEWLINE))
+        consumed, rows, block_counts = _count_block(block, len(names), line)
+        if not consumed:
+            if position + size >= len(data):
+                raise ValueError("Quoted field not closed at the end of the file")
+            # A record longer than the block
+            size *= 2
+            continue
+        position += consumed
+        total_rows += rows
+        counts += block_counts
+        line += int(numpy.count_nonzero(block[:consumed] == NEWLINE))
+        size = block_size
+    return names, total_rows, counts
+
+
+def analyze_csv_mmap(
+    file_path: str,
+    valid_values: Dict[str, Set] = None,
+    usecols: List[str] = None,
+    block_size: int = DEFAULT_BLOCK_SIZE,
+    **read_options,
+) -> FillStats:
+    """
+    Analyzes a CSV file with count_filled, reading with pandas only the
+    columns that have valid values. Files with quotes inside unquoted
+    fields are read entirely with pandas.
+
+    Args:
+       file_path: Path to a plain CSV file
+       valid_values: Dictionary with valid values per column
+       usecols: Names of the only columns to analyze
+       block_size: Bytes tokenized at a time
+       read_options: Keyword arguments for read_csv_chunks used to read the
+          columns with valid values, such as chunksize
+
+    Returns:
+       FillStats with the counts of the file
+    """
+    valid_values = valid_values if valid_values is not None else {}
+    read_options["engine"] = "pandas"
+    try:
+        with profiling.stage("count", path=file_path):
+            names, total_rows, counts = count_filled(file_path, block_size)
+    except QuoteInFieldError:
+        stats = FillStats(valid_values)
+        for chunk in read_csv_chunks(file_path, usecols=usecols, **read_options):
+            stats.update(chunk)
+        return stats
+
+    selected = list(range(len(names)))
+    if usecols is not None:
+        missing = [name for name in usecols if name not in names]
+        if missing:
+            raise ValueError(
+                f"Usecols do not match columns, columns expected but not found: {missing}"
+            )
+        selected = [index for index, name in enumerate(names) if name in usecols]
+
+    columns = [names[index] for index in selected]
+    filled = [int(counts[index]) for index in selected]
+    data = {
+        "columns": columns,
+        "total_rows": total_rows,
+        "totals": [total_rows] * len(columns),
+        "non_null": filled,
+        "non_empty": filled,
+        "valid_hits": [0] * len(columns),
+    }
+
+    rule_columns = [column for column in columns if column in valid_values]
+    if rule_columns:
+        rules = FillStats(valid_values)
+        for chunk in read_csv_chunks(file_path, usecols=rule_columns, **read_options):
+            rules.update(chunk)
+        data["valid_hits"] = [
+            rules.full_values(column) if column in rule_columns else 0
+            for column in columns
+        ]
+
+    return FillStats.from_dict(data, valid_values)
@@ -0,0 +1,353 @@
+import io
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Dict, List, Set, Tuple
+from analysis.readers import read_csv_chunks
+from analysis.stats import FillStats
+
+
+def find_record_starts(
+    file_path: str, offsets: List[int], block_size: int = 1 << 20
+) -> List[int]:
+    """
+    Moves every offset forward to the start of the next CSV record.
+
+    Quote characters are counted from the beginning of the file, so a newline
+    inside a quoted field is never taken as the end of a record.
+
+    Args:
+       file_path: Path to the CSV file
+       offsets: Byte offsets to align
+       block_size: Number of bytes read at a time
+
+    Returns:
+       Sorted list of distinct record start offsets. Offsets with no record
+       after them are moved to the end of the file.
+    """
+    targets = sorted(offsets)
+    starts = []
+    in_quotes = False
+    position = 0
+
+    with open(file_path, "rb") as f:
+        while targets:
+            block = f.read(block_size)
+            if not block:
+                break
+
+            cursor = 0
+            parity = in_quotes
+            while targets and targets[0] < position + len(block):
+                target = max(targets[0] - position, cursor)
+                parity ^= block.count(b'"', cursor, target) % 2 == 1
+                cursor = target
+
+                newline = block.find(b"\n", cursor)
+                if newline == -1:
+                    # The record continues in the next block
+                    break
+                parity ^= block.count(b'"', cursor, newline) % 2 == 1
+                cursor = newline + 1
+
+                if not parity:
+                    start = position + cursor
+                    starts.append(start)
+                    while targets and targets[0] <= start:
+                        targets.pop(0)
+
+            in_quotes = parity ^ (block.count(b'"', cursor) % 2 == 1)
+            position += len(block)
+
+    if targets:
+        starts.append(os.path.getsize(file_path))
+
+    return sorted(set(starts))
+
+
+def count_quotes(
+    file_path: str, start: int, end: int, block_size: int = 1 << 20
+) -> int:
+    """Counts the quote characters of a byte range of a file."""
+    quotes = 0
+    with open(file_path, "rb") as f:
+        f.seek(start)
+        position = start
+        while position < end:
+            block = f.read(min(block_size, end - position))
+            if not block:
+                break
+            quotes += block.count(b'"')
+            position += len(block)
+    return quotes
+
+
+def _record_start_after(f, offset: int, in_quotes: bool, block_size: int) -> int:
+    """Offset after the first newline from ``offset`` on that is outside
+    quotes, knowing whether ``offset`` is inside quotes. The end of the file
+    when there is none."""
+    f.seek(offset)
+    position = offset
+    while True:
+        block = f.read(block_size)
+        if not block:
+            return position
+        cursor = 0
+        while True:
+            newline = block.find(b"\n", cursor)
+            if newline == -1:
+                break
+            in_quotes ^= block.count(b'"', cursor, newline) % 2 == 1
+            cursor = newline + 1
+            if not in_quotes:
+                return position + cursor
+        in_quotes ^= block.count(b'"', cursor) % 2 == 1
+        position += len(block)
+
+
+def last_record_end(
+    file_path: str, start: int, end: int, block_size: int = 1 << 20
+) -> int:
+    """
+    Finds the end of the last complete CSV record in a byte range.
+
+    Args:
+       file_path: Path to the CSV file
+       start: Start of a record, where the scan begins outside of quotes
+       end: Byte after the last one to scan
+       block_size: Number of bytes read at a time
+
+    Returns:
+       Offset after the newline of the last record that ends before ``end``,
+       or ``start`` when no record ends in the range
+    """
+    last = start
+    in_quotes = False
+    position = start
+
+    with open(file_path, "rb") as f:
+        f.seek(start)
+        while position < end:
+            block = f.read(min(block_size, end - position))
+            if not block:
+                break
+
+            if not in_quotes and b'"' not in block:
+                # Without quotes every newline ends a record
+                newline = block.rfind(b"\n")
+                if newline != -1:
+                    last = position + newline + 1
+                position += len(block)
+                continue
+
+            cursor = 0
+            while True:
+                newline = block.find(b"\n", cursor)
+                if newline == -1:
+                    break
+                in_quotes ^= block.count(b'"', cursor, newline) % 2 == 1
+                cursor = newline + 1
+                if not in_quotes:
+                    last = position + cursor
+
+            in_quotes ^= block.count(b'"', cursor) % 2 == 1
+            position += len(block)
+
+    return last
+
+
+def split_csv_ranges(
+    file_path: str,
+    parts: int,
+    executor: Executor = None,
+    block_size: int = 1 << 20,
+) -> Tuple[int, List[Tuple[int, int]]]:
+    """
+    Splits the data rows of a CSV file into byte ranges made of whole records.
+
+    Whether a split point falls inside a quoted field depends on every quote
+    before it, so the quotes of the equal parts of the file are counted
+    first, in ``executor`` when given. Each split point is then moved to the
+    next record with a short scan from that point.
+
+    Args:
+       file_path: Path to the CSV file
+       parts: Number of ranges wanted. Fewer are returned for small files.
+       executor: Executor the quotes of the parts are counted in. Without
+          it they are counted here, reading the file up to the last split
+          point.
+       block_size: Number of bytes read at a time
+
+    Returns:
+       Tuple with the length of the header record and the list of
+       ``(start, end)`` byte ranges covering the rest of the file.
+    """
+    size = os.path.getsize(file_path)
+    header_end = find_record_starts(file_path, [0])[0]
+
+    data_size = size - header_end
+    offsets = [header_end + data_size * i // parts for i in range(1, parts)]
+    bounds = [header_end] + offsets
+    if executor is not None:
+        quotes = list(
+            executor.map(
+                count_quotes, [file_path] * len(offsets), bounds[:-1], bounds[1:]
+            )
+        )
+    else:
+        quotes = [count_quotes(file_path, *bound) for bound in zip(bounds, offsets)]
+
+    # The header ends outside quotes
+    starts = [header_end]
+    in_quotes = False
+    with open(file_path, "rb") as f:
+        for offset, count in zip(offsets, quotes):
+            in_quotes ^= count % 2 == 1
+            start = _record_start_after(f, offset, in_quotes, block_size)
+            if start < size:
+                starts.append(start)
+    starts = sorted(set(starts))
+
+    ranges = list(zip(starts, starts[1:] + [size]))
+    return header_end, ranges
+
+
+class _RangeReader(io.RawIOBase):
+    """Binary stream made of a header followed by a byte range of a file."""
+
+    def __init__(self, file_path: str, header: bytes, start: int, end: int):
+        self._file = open(file_path, "rb")
+        self._file.seek(start)
+        self._header = header
+        self._remaining = end - start
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        if self._header:
+            size = min(len(buffer), len(self._header))
+            buffer[:size] = self._header[:size]
+            self._header = self._header[size:]
+            return size
+
+        size = min(len(buffer), self._remaining)
+        if size == 0:
+            return 0
+        data = self._file.read(size)
+        buffer[: len(data)] = data
+        self._remaining -= len(data)
+        return len(data)
+
+    def close(self) -> None:
+        self._file.close()
+        super().close()
+
+
+def open_range(
+    file_path: str, header: bytes, start: int, end: int
+) -> io.BufferedReader:
+    """
+    Opens a byte range of a CSV file as a stream that starts with its header.
+
+    Args:
+       file_path: Path to the CSV file
+       header: Raw bytes of the header record
+       start: First byte of the range
+       end: Byte after the last one of the range
+
+    Returns:
+       Buffered binary stream that can be given to ``pandas.read_csv``. Its
+       first raw read returns the whole header, so ``peek`` shows it.
+    """
+    buffer_size = max(io.DEFAULT_BUFFER_SIZE, len(header))
+    return io.BufferedReader(_RangeReader(file_path, header, start, end), buffer_size)
+
+
+def count_range(
+    file_path: str,
+    header: bytes,
+    start: int,
+    end: int,
+    valid_values: Dict[str, Set] = None,
+    profile: bool = False,
+    **read_options,
+) -> FillStats:
+    """
+    Calculates the fill counts of a byte range of a CSV file.
+
+    Args:
+       file_path: Path to the CSV file
+       header: Raw bytes of the header record
+       start: First byte of the range
+       end: Byte after the last one of the range
+       valid_values: Dictionary with valid values per column
+       profile: Also build the profile of every column (see FillStats)
+       read_options: Keyword arguments for analysis.readers.read_csv_chunks
+
+    Returns:
+       FillStats with the counts of the rows in the range
+    """
+    stats = FillStats(valid_values, profile)
+    read_options.setdefault("rule_columns", list(valid_values or {}))
+    with open_range(file_path, header, start, end) as stream:
+        for chunk in read_csv_chunks(stream, **read_options):
+            stats.update(chunk)
+    return stats
+
+
+def analyze_csv_parallel(
+    file_path: str,
+    workers: int,
+    valid_values: Dict[str, Set] = None,
+    profile: bool = False,
+    **read_options,
+) -> FillStats:
+    """
+    Calculates the fill counts of a CSV file using several processes.
+
+    The file is split into byte ranges aligned to record boundaries, every
+    range is counted in its own process and the partial counts are merged.
+    Before that, the processes count the quotes of their part of the file,
+    so the split points can be aligned without reading the file in this
+    process (see split_csv_ranges).
+
+    Args:
+       file_path: Path to the CSV file
+       workers: Number of processes (and byte ranges)
+       valid_values: Dictionary with valid values per column
+       profile: Also build the profile of every column (see FillStats)
+       read_options: Keyword arguments for analysis.readers.read_csv_chunks,
+          such as chunksize
+
+    Returns:
+       FillStats with the counts of the whole file
+    """
+    stats = FillStats(valid_values, profile)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        header_end, ranges = split_csv_ranges(file_path, workers, executor)
+        with open(file_path, "rb") as f:
+            header = f.read(header_end)
+
+        if not ranges:
+            # Only the header: there is nothing to split
+            for chunk in read_csv_chunks(file_path, **read_options):
+                stats.update(chunk)
+            return stats
+
+        futures = [
+            executor.submit(
+                count_range,
+                file_path,
+                header,
+                start,
+                end,
+                valid_values,
+                profile,
+                **read_options,
+            )
+            for start, end in ranges
+        ]
+        for future in futures:
+            stats.merge(future.result())
+
+    return stats
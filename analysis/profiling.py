@@ -0,0 +1,303 @@
+import contextlib
+import cProfile
+import functools
+import inspect
+import json
+import os
+import sys
+import threading
+import time
+from typing import TYPE_CHECKING, Callable, Dict, Iterable, Iterator, List
+
+if TYPE_CHECKING:
+    import pandas
+
+try:
+    import resource
+except ImportError:
+    # Windows, where only the peak memory of this process can be unknown
+    resource = None
+
+# Events recorded since enable was called, or None when profiling is off
+_events: List[Dict] = None
+_origin = 0.0
+_NULL_STAGE = contextlib.nullcontext()
+
+
+def enable() -> None:
+    """Starts recording stage events in this process."""
+    global _events, _origin
+    _events = []
+    _origin = time.perf_counter()
+
+
+def disable() -> List[Dict]:
+    """
+    Stops recording stage events.
+
+    Returns:
+       The events recorded since enable
+    """
+    global _events
+    events, _events = _events or [], None
+    return events
+
+
+def enabled() -> bool:
+    return _events is not None
+
+
+def drain() -> List[Dict]:
+    """Returns and forgets the events recorded so far, e.g. to send the events
+    of a worker process back to the main one."""
+    if _events is None:
+        return []
+    events = list(_events)
+    del _events[: len(events)]
+    return events
+
+
+def extend(events: List[Dict]) -> None:
+    """Adds events recorded in another process."""
+    if _events is not None:
+        _events.extend(events)
+
+
+def _record(name: str, start: float, path: str = None, rows: int = None) -> None:
+    size = None
+    if path is not None and os.path.isfile(path):
+        size = os.path.getsize(path)
+    _events.append(
+        {
+            "stage": name,
+            "file": path,
+            "start": start - _origin,
+            "seconds": time.perf_counter() - start,
+            "rows": rows,
+            "bytes": size,
+            "pid": os.getpid(),
+            "thread": threading.get_ident(),
+        }
+    )
+
+
+class _Stage:
+    def __init__(self, name: str, path: str = None, rows: int = None):
+        self.name = name
+        self.path = path
+        self.rows = rows
+
+    def __enter__(self) -> "_Stage":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        if _events is not None:
+            _record(self.name, self.start, self.path, self.rows)
+
+
+def stage(name: str, path: str = None, rows: int = None):
+    """
+    Times a block of code as a stage.
+
+    Args:
+       name: Name of the stage, such as ``read`` or ``export``
+       path: File the stage works on. Its size is recorded as the bytes of
+          the stage, after the block, so written files are measured too.
+       rows: Number of rows processed by the stage
+
+    Returns:
+       Context manager, which does nothing when profiling is off
+    """
+    if _events is None:
+        return _NULL_STAGE
+    return _Stage(name, path, rows)
+
+
+def timed_chunks(name: str, chunks: Iterable, path: str = None) -> Iterator:
+    """
+    Times the production of every chunk of an iterator, such as a reader.
+
+    Args:
+       name: Name of the stage
+       chunks: Iterator over DataFrames
+       path: File the chunks are read from
+
+    Returns:
+       The same chunks. When profiling is off, the iterator itself.
+    """
+    if _events is None:
+        return chunks
+    return _timed_chunks(name, iter(chunks), path)
+
+
+def _timed_chunks(name: str, chunks: Iterator, path: str) -> Iterator:
+    while True:
+        start = time.perf_counter()
+        try:
+            chunk = next(chunks)
+        except StopIteration:
+            return
+        if _events is not None:
+            _record(name, start, rows=len(chunk))
+        yield chunk
+
+
+def profiled(name: str) -> Callable:
+    """
+    Decorator timing every call of a function whose first argument is the
+    path it works on, given by position or by name.
+    """
+
+    def decorator(function: Callable) -> Callable:
+        parameter = next(iter(inspect.signature(function).parameters))
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if _events is None:
+                return function(*args, **kwargs)
+            path = args[0] if args else kwargs.get(parameter)
+            with _Stage(name, None if path is None else os.fspath(path)):
+                return function(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def peak_rss_mb(children: bool = False) -> float:
+    """
+    Peak resident memory in MiB, NaN where it cannot be read (Windows).
+
+    Args:
+       children: Peak of the largest finished child process instead, such as
+          the workers of a process pool
+    """
+    if not children:
+        # ru_maxrss keeps the peak of the parent process across exec on
+        # Linux, the high water mark of /proc is reset
+        try:
+            with open("/proc/self/status") as f:
+                for line in f:
+                    if line.startswith("VmHWM:"):
+                        return int(line.split()[1]) / 1024
+        except OSError:
+            pass
+    if resource is None:
+        return float("nan")
+    who = resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF
+    peak = resource.getrusage(who).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return peak / (1 << 20) if sys.platform == "darwin" else peak / 1024
+
+
+def summary(events: List[Dict]) -> "pandas.DataFrame":
+    """
+    Adds up the events of every stage.
+
+    Stages nest: ``analyze`` includes the ``read`` and ``count`` stages of
+    the file, and ``directory`` every file of the directory.
+
+    Args:
+       events: Events returned by disable
+
+    Returns:
+       DataFrame with the Stage, Calls, Seconds, Rows, MB and Rows_Per_Second
+       of every stage, slowest first
+    """
+    # The command line imports this module, pandas is loaded only when used
+    import pandas
+
+    columns = ["Stage", "Calls", "Seconds", "Rows", "MB", "Rows_Per_Second"]
+    if not events:
+        return pandas.DataFrame(columns=columns)
+
+    frame = pandas.DataFrame(events)
+    table = frame.groupby("stage", sort=False).agg(
+        Calls=("seconds", "size"),
+        Seconds=("seconds", "sum"),
+        Rows=("rows", "sum"),
+        MB=("bytes", "sum"),
+    )
+    table["Rows"] = table["Rows"].fillna(0).astype("int64")
+    table["MB"] = (table["MB"].fillna(0) / 1e6).round(3)
+    table["Seconds"] = table["Seconds"].round(3)
+    table["Rows_Per_Second"] = (
+        (table["Rows"] / table["Seconds"].clip(lower=1e-9)).round().astype("int64")
+    )
+    table = table.rename_axis("Stage").reset_index()
+    return table.sort_values("Seconds", ascending=False, ignore_index=True)[columns]
+
+
+def print_summary(events: List[Dict]) -> None:
+    """Prints the summary table of the events and the peak memory."""
+    print("\nProfile:")
+    print(summary(events).to_string(index=False))
+    print(f"Peak RSS: {peak_rss_mb():.1f} MiB", end="")
+    if any(event["pid"] != os.getpid() for event in events):
+        children = peak_rss_mb(children=True)
+        print(f" (largest worker process: {children:.1f} MiB)", end="")
+    print()
+
+
+def write_trace(events: List[Dict], path: str) -> None:
+    """
+    Writes the events in the Chrome trace event format, which can be opened
+    with chrome://tracing or https://ui.perfetto.dev.
+
+    Args:
+       events: Events returned by disable
+       path: Destination JSON file
+    """
+    trace = [
+        {
+            "name": event["stage"],
+            "cat": "analysis",
+            "ph": "X",
+            "ts": event["start"] * 1e6,
+            "dur": event["seconds"] * 1e6,
+            "pid": event["pid"],
+            "tid": event["thread"],
+            "args": {
+                name: event[name]
+                for name in ("file", "rows", "bytes")
+                if event[name] is not None
+            },
+        }
+        for event in events
+    ]
+    with open(path, "w") as f:
+        json.dump({"traceEvents": trace, "displayTimeUnit": "ms"}, f)
+
+
+@contextlib.contextmanager
+def session(
+    show_summary: bool = True, trace_path: str = None, dump_path: str = None
+) -> Iterator[None]:
+    """
+    Profiles a block of code, reporting when it ends, even on errors.
+
+    Args:
+       show_summary: Print the summary table and the peak memory
+       trace_path: Write the events as a JSON trace to this file
+       dump_path: Also run the block under cProfile and write its statistics
+          to this file, for pstats or snakeviz
+    """
+    profiler = cProfile.Profile() if dump_path else None
+    enable()
+    if profiler:
+        profiler.enable()
+    try:
+        yield
+    finally:
+        if profiler:
+            profiler.disable()
+        events = disable()
+        if show_summary:
+            print_summary(events)
+        if trace_path:
+            write_trace(events, trace_path)
+            print(f"Trace saved in: {trace_path}")
+        if profiler:
+            profiler.dump_stats(dump_path)
+            print(f"cProfile statistics saved in: {dump_path}")
@@ -0,0 +1,512 @@
+import bz2
+import csv
+import gzip
+import itertools
+import importlib.util
+import io
+import lzma
+import os
+import zipfile
+import pandas
+from typing import Iterator, List, Tuple, Union
+from analysis.defaults import CSV_ENGINES
+
+# Compression of a file by its last extension. zstd requires zstandard.
+COMPRESSIONS = {".gz": "gzip", ".bz2": "bz2", ".xz": "xz", ".zst": "zstd"}
+
+# Bytes buffered in front of an archive member, so its header can be peeked
+MEMBER_BUFFER_SIZE = 1 << 20
+
+# Rows per DataFrame when streaming Excel sheets without a chunksize
+EXCEL_BATCH_SIZE = 10000
+
+# Strings read as missing values, the same list pandas uses by default
+NA_VALUES = [
+    "",
+    "#N/A",
+    "#N/A N/A",
+    "#NA",
+    "-1.#IND",
+    "-1.#QNAN",
+    "-NaN",
+    "-nan",
+    "1.#IND",
+    "1.#QNAN",
+    "<NA>",
+    "N/A",
+    "NA",
+    "NULL",
+    "NaN",
+    "None",
+    "n/a",
+    "nan",
+    "null",
+]
+
+
+def resolve_engine(engine: str) -> str:
+    """
+    Chooses the CSV engine to use.
+
+    Args:
+       engine: One of CSV_ENGINES. ``auto`` picks pyarrow when it is installed
+          and pandas otherwise, ``mmap`` reads DataFrames with pandas.
+
+    Returns:
+       Name of the engine, either ``pandas`` or ``pyarrow``
+    """
+    if engine not in CSV_ENGINES:
+        raise ValueError(f"CSV engine not supported: {engine}")
+    if engine == "auto":
+        return "pyarrow" if importlib.util.find_spec("pyarrow") else "pandas"
+    if engine == "mmap":
+        return "pandas"
+    return engine
+
+
+def split_compression(file_path: str) -> Tuple[str, str]:
+    """
+    Splits the compression extension off a file name.
+
+    Args:
+       file_path: Path to the file, such as ``dump.csv.gz``
+
+    Returns:
+       Tuple with the lowercase extension of the content (``.csv``) and the
+       compression (one of COMPRESSIONS, or None for plain files)
+    """
+    root, extension = os.path.splitext(os.fspath(file_path).lower())
+    if extension in COMPRESSIONS:
+        return os.path.splitext(root)[1], COMPRESSIONS[extension]
+    return extension, None
+
+
+def open_compressed(file_path: str, compression: str = None) -> io.BufferedIOBase:
+    """
+    Opens a file as a stream of its decompressed bytes, decompressing as it is
+    read so the content is never inflated to disk or memory.
+
+    Args:
+       file_path: Path to the file
+       compression: One of the COMPRESSIONS values, or None to use the one
+          of the file extension
+
+    Returns:
+       Binary stream with the decompressed content
+    """
+    if compression is None:
+        compression = split_compression(file_path)[1]
+
+    if compression == "gzip":
+        return gzip.open(file_path, "rb")
+    if compression == "bz2":
+        return bz2.open(file_path, "rb")
+    if compression == "xz":
+        return lzma.open(file_path, "rb")
+    if compression == "zstd":
+        import zstandard
+
+        reader = zstandard.ZstdDecompressor().stream_reader(open(file_path, "rb"))
+        return io.BufferedReader(reader)
+    return open(file_path, "rb")
+
+
+def _first_records(source, count: int = 1) -> List[List[str]]:
+    """Reads the first records of a CSV path or stream."""
+    if isinstance(source, (str, os.PathLike)):
+        with io.TextIOWrapper(
+            open_compressed(source), encoding="utf-8-sig", newline=""
+        ) as f:
+            return list(itertools.islice(csv.reader(f), count))
+    # Buffered streams hand out their first raw read, which is the header
+    # for the streams built by analysis.parallel.open_range
+    text = source.peek().decode("utf-8").lstrip("\ufeff")
+    return list(itertools.islice(csv.reader(io.StringIO(text, newline="")), count))
+
+
+def _header_names(source) -> List[str]:
+    """Reads the column names from the first record of a CSV path or stream,
+    named as pandas names them."""
+    records = _first_records(source)
+    return column_names(records[0]) if records else []
+
+
+def compact_string_dtype() -> str:
+    """Dtype of the text columns in compact mode: Arrow strings when pyarrow
+    is installed, categories otherwise."""
+    return "string[pyarrow]" if importlib.util.find_spec("pyarrow") else "category"
+
+
+def _arrow_strings(arrow_type):
+    """Keeps Arrow string columns in Arrow memory when converting to pandas,
+    as ``string[pyarrow]`` before pandas 1.5 added ``pandas.ArrowDtype``."""
+    import pyarrow
+
+    if pyarrow.types.is_string(arrow_type) or pyarrow.types.is_large_string(arrow_type):
+        if not hasattr(pandas, "ArrowDtype"):
+            return pandas.StringDtype("pyarrow")
+        return pandas.ArrowDtype(arrow_type)
+    return None
+
+
+def _arrow_to_pandas(
+    table, compact: bool = False, rule_columns: List[str] = None
+) -> pandas.DataFrame:
+    """Converts an Arrow table or batch, keeping the text of the columns not in
+    rule_columns in Arrow memory in compact mode."""
+    if not compact:
+        return table.to_pandas()
+    frame = table.to_pandas(types_mapper=_arrow_strings)
+    rules = [name for name in rule_columns or () if name in frame.columns]
+    if rules:
+        # Valid values are matched as in the default conversion
+        frame[rules] = table.select(rules).to_pandas()
+    return frame
+
+
+def _read_csv_pyarrow(
+    source,
+    chunksize: int = None,
+    usecols: List[str] = None,
+    raw: bool = False,
+    compact: bool = False,
+    rule_columns: List[str] = None,
+) -> Iterator[pandas.DataFrame]:
+    if not isinstance(source, (str, os.PathLike)):
+        names = _header_names(source)
+        yield from _read_arrow(
+            source, names, chunksize, usecols, raw, compact, rule_columns
+        )
+        return
+
+    records = _first_records(source, 2)
+    names = column_names(records[0]) if records else []
+    if len(records) == 1:
+        # pyarrow fails on a header without records, pandas reads no rows
+        yield pandas.DataFrame(columns=usecols or names, dtype=object)
+        return
+    if split_compression(source)[1]:
+        # pyarrow does not read every compression, decompress it here
+        with open_compressed(source) as stream:
+            yield from _read_arrow(
+                stream, names, chunksize, usecols, raw, compact, rule_columns
+            )
+        return
+    yield from _read_arrow(
+        source, names, chunksize, usecols, raw, compact, rule_columns
+    )
+
+
+def _read_arrow(
+    source,
+    names: List[str],
+    chunksize: int = None,
+    usecols: List[str] = None,
+    raw: bool = False,
+    compact: bool = False,
+    rule_columns: List[str] = None,
+) -> Iterator[pandas.DataFrame]:
+    """Reads a plain CSV path or stream with pyarrow, naming its columns
+    names instead of the header, which pyarrow keeps blank and repeated."""
+    import pyarrow
+    import pyarrow.csv
+
+    read_options = pyarrow.csv.ReadOptions(column_names=names, skip_rows_after_names=1)
+    # Quoted values can span lines, as pandas reads them
+    parse_options = pyarrow.csv.ParseOptions(newlines_in_values=True)
+    convert_options = pyarrow.csv.ConvertOptions(
+        null_values=NA_VALUES,
+        strings_can_be_null=True,
+        include_columns=usecols,
+    )
+
+    names = usecols or names
+    if not chunksize:
+        text = names if raw else [name for name in rule_columns or () if name in names]
+        convert_options.column_types = {name: pyarrow.string() for name in text}
+        table = pyarrow.csv.read_csv(
+            source,
+            read_options=read_options,
+            parse_options=parse_options,
+            convert_options=convert_options,
+        )
+        yield _arrow_to_pandas(table, compact, rule_columns)
+        return
+
+    # The streaming reader fixes the column types with the first block, so
+    # every column is read as text to accept whatever comes later. Numbers
+    # in valid values still match their text (see ColumnRule.matches).
+    convert_options.column_types = {name: pyarrow.string() for name in names}
+    with pyarrow.csv.open_csv(
+        source,
+        read_options=read_options,
+        parse_options=parse_options,
+        convert_options=convert_options,
+    ) as reader:
+        for batch in reader:
+            yield _arrow_to_pandas(batch, compact, rule_columns)
+
+
+def read_csv_chunks(
+    source,
+    chunksize: int = None,
+    engine: str = "pandas",
+    usecols: List[str] = None,
+    raw: bool = False,
+    compact: bool = False,
+    rule_columns: List[str] = None,
+) -> Iterator[pandas.DataFrame]:
+    """
+    Reads a CSV file as a sequence of DataFrames.
+
+    Args:
+       source: Path to the CSV file or binary stream with its content. Paths
+          ending in a COMPRESSIONS extension are decompressed while read.
+       chunksize: Number of rows read at a time. ``None`` reads the whole file
+          as a single DataFrame. The pyarrow engine streams blocks of bytes
+          instead of a fixed number of rows, reading every column as text.
+       engine: One of CSV_ENGINES
+       usecols: Names of the only columns to read
+       raw: Read every column as text without type inference
+       compact: Keep text in compact form instead of Python strings. The
+          pandas engine reads the columns not in rule_columns as
+          compact_string_dtype, without type inference; the pyarrow engine
+          keeps its text columns in Arrow memory.
+       rule_columns: Columns with valid values. They are read as text, so
+          their values get the same type in every chunk or byte range
+          whatever the rest of the file holds (numbers in valid values
+          match their text, see ColumnRule.matches).
+
+    Returns:
+       Iterator over the DataFrames read
+    """
+    if resolve_engine(engine) == "pyarrow":
+        return _read_csv_pyarrow(source, chunksize, usecols, raw, compact, rule_columns)
+
+    read_options = {"low_memory": False}
+    if usecols is not None:
+        read_options["usecols"] = usecols
+    rules = set(rule_columns or ())
+    if compact:
+        names = usecols or _header_names(source)
+        read_options["dtype"] = {
+            name: str if name in rules else compact_string_dtype() for name in names
+        }
+    elif raw:
+        read_options["dtype"] = str
+    elif rules:
+        read_options["dtype"] = {name: str for name in rules}
+
+    if chunksize:
+        return iter(pandas.read_csv(source, chunksize=chunksize, **read_options))
+    return iter([pandas.read_csv(source, **read_options)])
+
+
+def zip_csv_members(file_path: str) -> List[str]:
+    """
+    Lists the CSV files stored in a ZIP archive.
+
+    Args:
+       file_path: Path to the archive
+
+    Returns:
+       Names of the CSV members, in archive order
+    """
+    with zipfile.ZipFile(file_path) as archive:
+        return [
+            info.filename
+            for info in archive.infolist()
+            if not info.is_dir() and info.filename.lower().endswith(".csv")
+        ]
+
+
+def read_zip_member_chunks(
+    file_path: str, member: str, **read_options
+) -> Iterator[pandas.DataFrame]:
+    """
+    Reads a CSV member of a ZIP archive as a sequence of DataFrames, inflating
+    it while it is parsed.
+
+    Args:
+       file_path: Path to the archive
+       member: Name of the CSV file in the archive
+       read_options: Keyword arguments for read_csv_chunks
+
+    Returns:
+       Iterator over the DataFrames read
+    """
+    with zipfile.ZipFile(file_path) as archive:
+        with io.BufferedReader(archive.open(member), MEMBER_BUFFER_SIZE) as stream:
+            yield from read_csv_chunks(stream, **read_options)
+
+
+def excel_sheet_names(file_path: str) -> List[str]:
+    """
+    Lists the sheets of an Excel workbook.
+
+    Args:
+       file_path: Path to the workbook
+
+    Returns:
+       Names of the sheets, in workbook order
+    """
+    with pandas.ExcelFile(file_path) as workbook:
+        return list(workbook.sheet_names)
+
+
+def _cell_value(value):
+    """Converts integral floats to int, as ``pandas.read_excel`` does; calamine
+    returns every number as a float."""
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+def _iter_sheet_rows(file_path: str, sheet_name: Union[int, str]) -> Iterator:
+    """Yields the cell values of a sheet row by row without loading it all."""
+    if importlib.util.find_spec("python_calamine"):
+        from python_calamine import CalamineWorkbook
+
+        workbook = CalamineWorkbook.from_path(file_path)
+        if isinstance(sheet_name, int):
+            sheet_name = workbook.sheet_names[sheet_name]
+        for row in workbook.get_sheet_by_name(sheet_name).iter_rows():
+            yield [_cell_value(value) for value in row]
+        return
+
+    import openpyxl
+
+    workbook = openpyxl.load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        if isinstance(sheet_name, int):
+            worksheet = workbook.worksheets[sheet_name]
+        else:
+            worksheet = workbook[sheet_name]
+        for row in worksheet.iter_rows(values_only=True):
+            yield [_cell_value(value) for value in row]
+    finally:
+        workbook.close()
+
+
+def _trim(row) -> list:
+    """Drops the empty cells at the end of a row."""
+    row = list(row)
+    while row and (row[-1] is None or row[-1] == ""):
+        row.pop()
+    return row
+
+
+def column_names(header: list) -> List:
+    """Names the columns of a header row the way pandas does: blank names
+    become ``Unnamed: i`` and repeated ones get a ``.1``, ``.2``... suffix."""
+    names = []
+    for index, name in enumerate(header):
+        if name is None or name == "":
+            name = f"Unnamed: {index}"
+        if name in names:
+            count = 1
+            while f"{name}.{count}" in names:
+                count += 1
+            name = f"{name}.{count}"
+        names.append(name)
+    return names
+
+
+def _rows_frame(
+    rows: List[list], names: List, usecols: List[str] = None, raw: bool = False
+) -> pandas.DataFrame:
+    """Builds a DataFrame from a batch of sheet rows."""
+    width = max([len(row) for row in rows] + [len(names)])
+    names.extend(f"Unnamed: {index}" for index in range(len(names), width))
+
+    if rows:
+        padded = [row + [None] * (width - len(row)) for row in rows]
+        # Raw cells keep their own type, so integers are not written as floats
+        frame = pandas.DataFrame(padded, columns=names, dtype=object if raw else None)
+    else:
+        frame = pandas.DataFrame({name: [] for name in names}, dtype=object)
+
+    # Strings such as "NA" or "" are missing values, as in pandas.read_excel
+    frame = frame.where(~frame.isin(NA_VALUES))
+    if not raw:
+        frame = frame.infer_objects()
+
+    if usecols is not None:
+        missing = [name for name in usecols if name not in names]
+        if missing:
+            raise ValueError(
+                f"Usecols do not match columns, columns expected but not found: {missing}"
+            )
+        frame = frame[usecols]
+    if raw:
+        frame = frame.where(frame.isna(), frame.astype(str))
+    return frame
+
+
+def read_excel_chunks(
+    file_path: str,
+    sheet_name: Union[int, str] = 0,
+    chunksize: int = None,
+    usecols: List[str] = None,
+    raw: bool = False,
+) -> Iterator[pandas.DataFrame]:
+    """
+    Reads a sheet of an Excel workbook as a sequence of DataFrames.
+
+    XLSX workbooks are streamed row by row with python-calamine when it is
+    installed, or with openpyxl in read-only mode otherwise, so only one batch
+    of rows is kept in memory. XLS workbooks are read whole by pandas.
+
+    Args:
+       file_path: Path to the workbook
+       sheet_name: Position or name of the sheet
+       chunksize: Number of rows per DataFrame (EXCEL_BATCH_SIZE by default)
+       usecols: Names of the only columns to read
+       raw: Read every column as text without type inference
+
+    Returns:
+       Iterator over the DataFrames read
+    """
+    if file_path.lower().endswith(".xls"):
+        read_options = {}
+        if usecols is not None:
+            read_options["usecols"] = usecols
+        if raw:
+            read_options["dtype"] = str
+        return iter([pandas.read_excel(file_path, sheet_name, **read_options)])
+
+    return _read_sheet_rows(
+        _iter_sheet_rows(file_path, sheet_name),
+        chunksize or EXCEL_BATCH_SIZE,
+        usecols,
+        raw,
+    )
+
+
+def _read_sheet_rows(
+    rows: Iterator, chunksize: int, usecols: List[str] = None, raw: bool = False
+) -> Iterator[pandas.DataFrame]:
+    """Groups the rows of a sheet, header first, into DataFrames."""
+    rows = iter(rows)
+    names = column_names(_trim(next(rows, ())))
+
+    batch = []
+    blank = []
+    empty = True
+    for row in rows:
+        row = _trim(row)
+        if not row:
+            # Blank rows are kept only when data follows them
+            blank.append(row)
+            continue
+        batch.extend(blank)
+        blank = []
+        batch.append(row)
+
+        if len(batch) >= chunksize:
+            yield _rows_frame(batch, names, usecols, raw)
+            batch = []
+            empty = False
+
+    if batch or empty:
+        yield _rows_frame(batch, names, usecols, raw)
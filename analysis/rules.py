@@ -0,0 +1,151 @@
+import hashlib
+import json
+import numbers
+import os
+import re
+import numpy
+import pandas
+from typing import Dict, Iterable, List, Union
+
+
+def numeric_values(values: Iterable) -> List:
+    """Numbers of an allow-list, which also match columns read as text."""
+    return [
+        value
+        for value in values
+        if isinstance(value, numbers.Number) and not isinstance(value, bool)
+    ]
+
+
+class ColumnRule:
+    """
+    Valid values of a column: an allow-list, a regular expression or both.
+
+    The rule is compiled once. The allow-list becomes a ``pandas.Index``,
+    whose hash table is built on the first lookup and reused for every chunk
+    and file, and the pattern is compiled with ``re``. Each chunk is
+    factorized, so every distinct value is looked up or matched only once.
+    Numbers of the allow-list also match text that parses as them, so the
+    rule gives the same counts for a column read as numbers or as text.
+    """
+
+    def __init__(self, values: Iterable = None, pattern: str = None):
+        self.values = (
+            pandas.Index(list(values)).unique() if values is not None else None
+        )
+        self.numbers = (
+            pandas.Index(numeric_values(self.values))
+            if self.values is not None
+            else pandas.Index([])
+        )
+        self.regex = re.compile(pattern) if pattern is not None else None
+
+        digest = hashlib.blake2b(digest_size=16)
+        if self.values is not None:
+            digest.update("\0".join(sorted(map(repr, self.values))).encode())
+        digest.update(b"\1" + repr(pattern).encode())
+        # Short stand-in for the rule in cache keys
+        self.key = digest.hexdigest()
+
+    def matches(self, values: pandas.Series) -> numpy.ndarray:
+        """
+        Tells which values are valid.
+
+        Args:
+           values: Column of a chunk
+
+        Returns:
+           Boolean array, False for missing values
+        """
+        codes, uniques = pandas.factorize(values)
+        # The extra last slot is taken by the -1 code of missing values
+        valid = numpy.zeros(len(uniques) + 1, dtype=bool)
+        if self.values is not None:
+            valid[:-1] |= self.values.get_indexer(uniques) >= 0
+        if len(self.numbers) and len(uniques):
+            parsed = pandas.to_numeric(pandas.Series(uniques), errors="coerce")
+            valid[:-1] |= self.numbers.get_indexer(parsed) >= 0
+        if self.regex is not None:
+            text = pandas.Series(uniques.astype(str), dtype=object)
+            valid[:-1] |= text.str.fullmatch(self.regex).to_numpy(bool)
+        return valid[codes]
+
+    def count(self, values: pandas.Series) -> int:
+        """Number of valid values in a column."""
+        return int(self.matches(values).sum())
+
+    def __repr__(self) -> str:
+        size = None if self.values is None else len(self.values)
+        pattern = None if self.regex is None else self.regex.pattern
+        return f"ColumnRule(values={size}, pattern={pattern!r})"
+
+
+def compile_rules(
+    rules: Dict[str, Union[Iterable, Dict]], base_dir: str = "."
+) -> Dict[str, ColumnRule]:
+    """
+    Compiles the rules of every column.
+
+    Args:
+       rules: Dictionary with column names as keys. Each value is either a
+          list of valid values or a dictionary with any of ``values`` (list
+          of valid values), ``values_file`` (text file with one valid value
+          per line) and ``pattern`` (regular expression that valid values
+          match entirely). A value is valid if it matches any of them.
+       base_dir: Directory that values_file paths are relative to
+
+    Returns:
+       Dictionary with the compiled ColumnRule of every column, usable as
+       valid_values
+    """
+    compiled = {}
+    for column, rule in rules.items():
+        if isinstance(rule, ColumnRule):
+            compiled[column] = rule
+            continue
+        if not isinstance(rule, dict):
+            compiled[column] = ColumnRule(values=rule)
+            continue
+
+        unknown = set(rule) - {"values", "values_file", "pattern"}
+        if unknown:
+            raise ValueError(f"Unknown keys in the rule of {column}: {sorted(unknown)}")
+
+        values = rule.get("values")
+        if "values_file" in rule:
+            with open(
+                os.path.join(base_dir, rule["values_file"]), encoding="utf-8"
+            ) as f:
+                values = list(values or []) + f.read().splitlines()
+        compiled[column] = ColumnRule(values, rule.get("pattern"))
+    return compiled
+
+
+def load_rules(path: str) -> Dict[str, ColumnRule]:
+    """
+    Reads and compiles a rules file.
+
+    Args:
+       path: YAML (``.yaml``, ``.yml``, requires PyYAML) or JSON file with a
+          mapping of column names to rules, see compile_rules
+
+    Returns:
+       Dictionary with the compiled ColumnRule of every column
+    """
+    with open(path, encoding="utf-8") as f:
+        if path.lower().endswith((".yaml", ".yml")):
+            try:
+                import yaml
+            except ImportError:
+                raise ImportError(
+                    "YAML rules files require PyYAML: "
+                    'pip install -e ".[yaml]", or use a JSON rules file'
+                ) from None
+
+            rules = yaml.safe_load(f)
+        else:
+            rules = json.load(f)
+
+    if not isinstance(rules, dict):
+        raise ValueError(f"The rules file must map column names to rules: {path}")
+    return compile_rules(rules, os.path.dirname(os.path.abspath(path)))
@@ -0,0 +1,209 @@
+import math
+import os
+import random
+import numpy
+import pandas
+from typing import Dict, List, Set, Tuple
+from analysis.parallel import count_range, find_record_starts, last_record_end
+from analysis.stats import FillStats
+
+# Bytes read from every sampled block by default
+DEFAULT_BLOCK_SIZE = 1 << 18
+
+# Normal quantile of the 95% confidence intervals
+Z_95 = 1.959964
+
+
+def parse_sample(value: str) -> float:
+    """
+    Reads a sample size given as a percentage (``1%``) or a fraction (``0.01``).
+
+    Args:
+       value: Sample size as written on the command line
+
+    Returns:
+       Fraction of the file to read, greater than 0 and at most 1
+    """
+    text = str(value).strip()
+    fraction = float(text[:-1]) / 100 if text.endswith("%") else float(text)
+    if not 0 < fraction <= 1:
+        raise ValueError(f"Sample size must be between 0% and 100%: {value}")
+    return fraction
+
+
+def wilson_interval(
+    proportion: float, trials: float, z: float = Z_95
+) -> Tuple[float, float]:
+    """
+    Calculates the Wilson score interval of a proportion.
+
+    Args:
+       proportion: Observed proportion
+       trials: Number of observations, possibly an effective number
+       z: Normal quantile of the confidence level
+
+    Returns:
+       Tuple with the lower and upper bounds, between 0 and 1
+    """
+    if trials <= 0:
+        return 0.0, 1.0
+    denominator = 1 + z**2 / trials
+    center = (proportion + z**2 / (2 * trials)) / denominator
+    margin = (
+        z
+        * math.sqrt(proportion * (1 - proportion) / trials + z**2 / (4 * trials**2))
+        / denominator
+    )
+    return max(center - margin, 0.0), min(center + margin, 1.0)
+
+
+def _effective_trials(full: numpy.ndarray, rows: numpy.ndarray) -> float:
+    """
+    Number of independent rows a block sample is worth for a column.
+
+    Rows of one block tend to be alike (dumps are often sorted), so the
+    variance of the estimate is measured between blocks and turned into the
+    number of independent rows that would give the same variance.
+    """
+    total = rows.sum()
+    blocks = len(rows)
+    if blocks < 2 or total == 0:
+        return float(total)
+    proportion = full.sum() / total
+    variance = ((full - proportion * rows) ** 2).sum() / (blocks * (blocks - 1))
+    variance /= rows.mean() ** 2
+    if variance <= 0:
+        return float(total)
+    return float(min(total, proportion * (1 - proportion) / variance))
+
+
+def _block_ranges(
+    file_path: str,
+    header_end: int,
+    size: int,
+    fraction: float,
+    block_size: int,
+    seed: int,
+) -> List[Tuple[int, int]]:
+    """Picks evenly spaced byte ranges, made of whole records, to sample."""
+    data_size = size - header_end
+    blocks = max(1, math.ceil(fraction * data_size / block_size))
+    length = max(int(fraction * data_size / blocks), 1)
+    stride = data_size / blocks
+    shift = random.Random(seed).random()
+
+    ranges = []
+    with open(file_path, "rb") as f:
+        for index in range(blocks):
+            start = header_end + int((index + shift) * stride)
+            if start > header_end:
+                # Skip the rest of the record the offset falls in
+                f.seek(start - 1)
+                f.readline()
+                start = f.tell()
+            end = last_record_end(file_path, start, min(start + length, size))
+            if end > start and (not ranges or start >= ranges[-1][1]):
+                ranges.append((start, end))
+    return ranges
+
+
+def sample_csv(
+    file_path: str,
+    fraction: float,
+    valid_values: Dict[str, Set] = None,
+    block_size: int = DEFAULT_BLOCK_SIZE,
+    seed: int = 0,
+    **read_options,
+) -> pandas.DataFrame:
+    """
+    Estimates the fill statistics of a CSV file from a sample of its rows.
+
+    The sample is made of blocks of at most ``block_size`` bytes spread evenly
+    over the file, with a random start, which are reached by seeking, so only
+    ``fraction`` of the file is read and parsed. Every block starts after the
+    first newline following its offset. A block that starts inside a quoted
+    field with a newline cannot be parsed and is left out.
+
+    Args:
+       file_path: Path to the CSV file
+       fraction: Share of the bytes of the file to read, between 0 and 1
+       valid_values: Dictionary with valid values per column
+       block_size: Largest number of bytes read from every sampled block
+       seed: Seed of the random start, so the same sample is read every time
+       read_options: Keyword arguments for analysis.readers.read_csv_chunks
+
+    Returns:
+       DataFrame with the estimated Total_Rows, Full_Values, Empty_Values
+       and Percentage_Filled of each column, the 95% confidence bounds of
+       the percentage (Percentage_Lower and Percentage_Upper) and the number
+       of Sampled_Rows. Reading the whole file gives exact counts with equal
+       bounds.
+    """
+    size = os.path.getsize(file_path)
+    header_end = find_record_starts(file_path, [0])[0]
+    with open(file_path, "rb") as f:
+        header = f.read(header_end)
+
+    data_size = size - header_end
+    exact = fraction >= 1
+    if exact:
+        ranges = [(header_end, size)]
+    else:
+        ranges = _block_ranges(file_path, header_end, size, fraction, block_size, seed)
+
+    block_stats = []
+    sampled_bytes = 0
+    for start, end in ranges:
+        try:
+            stats = count_range(
+                file_path, header, start, end, valid_values, **read_options
+            )
+        except pandas.errors.ParserError:
+            # The block started inside a quoted field
+            continue
+        block_stats.append(stats)
+        sampled_bytes += end - start
+
+    sample = FillStats(valid_values)
+    for stats in block_stats:
+        sample.merge(stats)
+    if not block_stats:
+        # Nothing could be read: report the columns with no rows
+        sample.merge(count_range(file_path, header, header_end, header_end))
+
+    rows = numpy.array([stats.total_rows for stats in block_stats])
+    sampled_rows = sample.total_rows
+    if exact or not sampled_bytes:
+        total_rows = sampled_rows
+    else:
+        total_rows = round(sampled_rows * data_size / sampled_bytes)
+
+    results = {
+        "Column": [],
+        "Total_Rows": [],
+        "Full_Values": [],
+        "Empty_Values": [],
+        "Percentage_Filled": [],
+        "Percentage_Lower": [],
+        "Percentage_Upper": [],
+        "Sampled_Rows": [],
+    }
+    for column in sample.columns:
+        proportion = sample.full_values(column) / sampled_rows if sampled_rows else 0
+        if exact:
+            lower = upper = proportion
+        else:
+            full = numpy.array([stats.full_values(column) for stats in block_stats])
+            lower, upper = wilson_interval(proportion, _effective_trials(full, rows))
+        full_values = round(proportion * total_rows)
+
+        results["Column"].append(column)
+        results["Total_Rows"].append(total_rows)
+        results["Full_Values"].append(full_values)
+        results["Empty_Values"].append(total_rows - full_values)
+        results["Percentage_Filled"].append(round(proportion * 100, 2))
+        results["Percentage_Lower"].append(round(lower * 100, 2))
+        results["Percentage_Upper"].append(round(upper * 100, 2))
+        results["Sampled_Rows"].append(sampled_rows)
+
+    return pandas.DataFrame(results)
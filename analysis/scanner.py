@@ -0,0 +1,203 @@
+import asyncio
+import functools
+import os
+import pandas
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Dict, List, Set, Tuple
+from analysis import profiling
+from analysis.analysis import (
+    SUPPORTED_EXTENSIONS,
+    _analyze_in_worker,
+    _init_worker,
+    analyze_file,
+)
+from analysis.cache import ResultCache, cache_key, fingerprint
+from analysis.defaults import DEFAULT_MAX_INFLIGHT
+from analysis.shards import in_shard
+
+
+def _list_directory(root: str, relative: str) -> Tuple[List[str], List[str]]:
+    """Lists the supported files and the subdirectories of a directory."""
+    files = []
+    directories = []
+    with os.scandir(os.path.join(root, relative)) as entries:
+        for entry in entries:
+            path = os.path.join(relative, entry.name) if relative else entry.name
+            # Symbolic links to directories are not followed, to avoid cycles
+            if entry.is_dir(follow_symlinks=False):
+                directories.append(path)
+            elif entry.is_file() and entry.name.lower().endswith(SUPPORTED_EXTENSIONS):
+                files.append(path)
+    return sorted(files), sorted(directories)
+
+
+async def _walk(
+    root: str,
+    relative: str,
+    queue: asyncio.Queue,
+    io_executor: ThreadPoolExecutor,
+) -> None:
+    """Puts the files of a directory tree in the queue, listing subdirectories
+    concurrently. Subdirectories that cannot be listed are reported and
+    skipped."""
+    loop = asyncio.get_running_loop()
+    try:
+        files, directories = await loop.run_in_executor(
+            io_executor, _list_directory, root, relative
+        )
+    except OSError as e:
+        if not relative:
+            raise
+        print(f"Error listing {relative}: {str(e)}")
+        return
+    for path in files:
+        # Waits while max_inflight files are queued
+        await queue.put(path)
+    await asyncio.gather(
+        *(_walk(root, directory, queue, io_executor) for directory in directories)
+    )
+
+
+async def analyze_tree(
+    directory_path: str,
+    valid_values: Dict[str, Set] = None,
+    workers: int = None,
+    cache: str = None,
+    max_inflight: int = DEFAULT_MAX_INFLIGHT,
+    shard: Tuple[int, int] = None,
+    **options,
+) -> Dict[str, pandas.DataFrame]:
+    """
+    Analyzes the Excel and CSV files of a directory and its subdirectories.
+
+    Directories are listed with ``os.scandir`` and files are fingerprinted
+    for the cache in a pool of threads, so the latency of slow file systems
+    overlaps across files; only the SQLite lookups take turns. Parsing runs in a pool of ``workers`` processes (or in one thread
+    when ``workers`` is ``None`` or ``1``). At most ``max_inflight`` files
+    are being processed and at most ``max_inflight`` more wait in a queue,
+    so the walk does not run ahead of the analysis.
+
+    Args:
+       directory_path: Path to the root directory
+       valid_values: Dictionary with valid values per column
+       workers: Number of processes used to analyze files
+       cache: Path to a ResultCache database
+       max_inflight: Maximum number of files processed at the same time
+       shard: Shard number and number of shards, to analyze only the files
+          of this shard (see analysis.shards.shard_of)
+       options: Keyword arguments forwarded to analyze_file, such as chunksize
+
+    Returns:
+       Dictionary with the paths of the files relative to directory_path as
+       keys and result DataFrames as values, ordered by path
+    """
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue(maxsize=max_inflight)
+    settings = cache_key(valid_values, **options)
+    results = {}
+
+    if workers is not None and workers > 1:
+        # The valid values are sent to every process once, not with every file
+        cpu_executor = ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_worker,
+            initargs=(valid_values, profiling.enabled()),
+        )
+        analyze = _analyze_in_worker
+    else:
+        # Events of this process are recorded directly, none are returned
+        cpu_executor = ThreadPoolExecutor(max_workers=1)
+
+        def analyze(file_path: str, **file_options) -> Tuple[pandas.DataFrame, List]:
+            return analyze_file(file_path, valid_values, **file_options), []
+
+    io_executor = ThreadPoolExecutor(max_workers=max_inflight)
+    result_cache = ResultCache(cache, check_same_thread=False) if cache else None
+    cache_lock = asyncio.Lock()
+
+    async def cached_call(method, *args):
+        # One SQLite connection is shared, so lookups are serialized. Files
+        # are fingerprinted before, outside the lock.
+        async with cache_lock:
+            return await loop.run_in_executor(io_executor, method, *args)
+
+    async def consume() -> None:
+        while True:
+            path = await queue.get()
+            if path is None:
+                return
+            if not in_shard(path, shard):
+                continue
+            file_path = os.path.join(directory_path, path)
+            try:
+                if result_cache:
+                    file_fingerprint = await loop.run_in_executor(
+                        io_executor, fingerprint, file_path
+                    )
+                    cached = await cached_call(
+                        result_cache.get, file_path, settings, file_fingerprint
+                    )
+                    if cached is not None:
+                        results[path] = cached
+                        print(f"Analysis loaded from cache for: {path}")
+                        continue
+
+                results[path], events = await loop.run_in_executor(
+                    cpu_executor,
+                    functools.partial(analyze, file_path, **options),
+                )
+                profiling.extend(events)
+                print(f"Analysis completed for: {path}")
+
+                if result_cache:
+                    await cached_call(
+                        result_cache.put,
+                        file_path,
+                        settings,
+                        results[path],
+                        file_fingerprint,
+                    )
+            except Exception as e:
+                print(f"Error analyzing {path}: {str(e)}")
+
+    try:
+        consumers = [asyncio.create_task(consume()) for _ in range(max_inflight)]
+        try:
+            await _walk(directory_path, "", queue, io_executor)
+        finally:
+            for _ in consumers:
+                await queue.put(None)
+            await asyncio.gather(*consumers)
+    finally:
+        cpu_executor.shutdown()
+        io_executor.shutdown()
+        if result_cache:
+            result_cache.close()
+
+    return dict(sorted(results.items()))
+
+
+@profiling.profiled("directory")
+def scan_directory(
+    directory_path: str,
+    valid_values: Dict[str, Set] = None,
+    workers: int = None,
+    cache: str = None,
+    max_inflight: int = DEFAULT_MAX_INFLIGHT,
+    shard: Tuple[int, int] = None,
+    **options,
+) -> Dict[str, pandas.DataFrame]:
+    """
+    Runs analyze_tree in a new event loop. See analyze_tree for the arguments.
+    """
+    return asyncio.run(
+        analyze_tree(
+            directory_path,
+            valid_values,
+            workers,
+            cache,
+            max_inflight,
+            shard,
+            **options,
+        )
+    )
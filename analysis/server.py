@@ -0,0 +1,393 @@
+import ipaddress
+import json
+import os
+import signal
+import socket
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Set, Tuple
+from analysis.analysis import analyze_directory, analyze_file
+from analysis.defaults import DEFAULT_MAX_QUEUE
+from analysis.rules import load_rules
+from analysis.utils import export_results
+
+# Keyword arguments of analyze_file a request can set
+REQUEST_OPTIONS = (
+    "chunksize",
+    "parallel",
+    "usecols",
+    "raw",
+    "engine",
+    "sheet_name",
+    "sample",
+    "profile_columns",
+    "compact",
+)
+
+# Fields of a request with paths, which must be inside the server root
+REQUEST_PATHS = ("file", "directory", "output", "rules")
+
+# Valid values of the requests without rules, set once per worker process
+_worker_valid_values = None
+
+# Rules files compiled in a worker process, by path and modification time
+_worker_rules = {}
+
+
+def _init_worker(valid_values: Dict[str, Set]) -> None:
+    """Keeps the default valid values in a worker process."""
+    global _worker_valid_values
+    _worker_valid_values = valid_values
+
+
+def _warm_up() -> int:
+    """Runs in every worker once the pool starts, so the first requests do
+    not wait for the process to be created."""
+    return os.getpid()
+
+
+def _rules(path: str) -> Dict[str, Set]:
+    """Compiles a rules file once per worker process, again if it changes."""
+    key = (os.path.abspath(path), os.stat(path).st_mtime_ns)
+    if key not in _worker_rules:
+        _worker_rules[key] = load_rules(path)
+    return _worker_rules[key]
+
+
+def run_request(request: Dict) -> Dict[str, List[Dict]]:
+    """
+    Runs a validated request in a worker process.
+
+    Args:
+       request: Request checked by parse_request
+
+    Returns:
+       Dictionary with file names as keys and the rows of their result
+       tables as values
+    """
+    valid_values = _worker_valid_values
+    if request.get("rules"):
+        valid_values = _rules(request["rules"])
+    options = request.get("options", {})
+
+    if request.get("file"):
+        path = request["file"]
+        results = {os.path.basename(path): analyze_file(path, valid_values, **options)}
+    else:
+        results = analyze_directory(request["directory"], valid_values, **options)
+
+    if request.get("output"):
+        export_results(
+            results,
+            request["output"],
+            output_format=request.get("format", "xlsx"),
+            per_file=request.get("per_file", True),
+            combined=request.get("combined", True),
+        )
+
+    # to_json writes missing values as null, which json.dumps does not
+    return {
+        name: json.loads(result.to_json(orient="records"))
+        for name, result in results.items()
+    }
+
+
+def is_loopback(host: str) -> bool:
+    """Tells whether every address of a host name is a loopback address."""
+    try:
+        addresses = {info[4][0] for info in socket.getaddrinfo(host, None)}
+    except socket.gaierror:
+        return False
+    return bool(addresses) and all(
+        ipaddress.ip_address(address.split("%")[0]).is_loopback for address in addresses
+    )
+
+
+def is_inside(path: str, root: str) -> bool:
+    """Tells whether a path, once links are resolved, is inside a directory."""
+    path = os.path.realpath(path)
+    root = os.path.realpath(root)
+    return os.path.commonpath([path, root]) == root
+
+
+def parse_request(body: bytes, root: str = None) -> Dict:
+    """
+    Reads and checks the JSON body of an analysis request.
+
+    Args:
+       body: Request body, a JSON object with ``file`` or ``directory``
+          and optionally ``options`` (REQUEST_OPTIONS), ``rules`` (path to
+          a rules file), ``output``, ``format``, ``per_file`` and ``combined``
+       root: Directory that the paths of the request (REQUEST_PATHS) must
+          be inside, or None to accept any path
+
+    Returns:
+       The request as a dictionary
+
+    Raises:
+       ValueError: If the request is not valid
+    """
+    try:
+        request = json.loads(body or b"{}")
+    except json.JSONDecodeError as e:
+        raise ValueError(f"Request is not valid JSON: {e}")
+    if not isinstance(request, dict):
+        raise ValueError("Request must be a JSON object")
+
+    unknown = set(request) - {
+        "file",
+        "directory",
+        "options",
+        "rules",
+        "output",
+        "format",
+        "per_file",
+        "combined",
+    }
+    if unknown:
+        raise ValueError(f"Unknown request fields: {sorted(unknown)}")
+    if bool(request.get("file")) == bool(request.get("directory")):
+        raise ValueError("Request must have either file or directory")
+
+    options = request.get("options", {})
+    if not isinstance(options, dict):
+        raise ValueError("options must be a JSON object")
+    unknown = set(options) - set(REQUEST_OPTIONS)
+    if unknown:
+        raise ValueError(f"Unknown options: {sorted(unknown)}")
+
+    if root is not None:
+        for field in REQUEST_PATHS:
+            path = request.get(field)
+            if path and not (isinstance(path, str) and is_inside(path, root)):
+                raise ValueError(f"{field} is outside the server root {root}")
+    return request
+
+
+class AnalysisServer(ThreadingHTTPServer):
+    """
+    HTTP server that analyzes files for local clients, with JSON requests and
+    responses, so repeated jobs do not pay for starting Python and importing
+    pandas.
+
+    Requests run in a pool of ``workers`` processes started with the server.
+    At most ``workers`` requests run at the same time, up to ``max_queue``
+    more wait for a free worker and the rest are refused with status 503.
+    When a worker dies (killed for memory, or a crash in a parser), the
+    requests it was running fail and the pool is started again.
+
+    There is no authentication: the server only listens on loopback
+    addresses, only takes ``application/json`` requests (which web pages
+    cannot send to other sites without asking first), and requests only
+    read and write files under ``root``.
+
+    Endpoints:
+       POST /analyze: Runs a request (see parse_request) and answers with
+          ``{"results": {name: rows}, "seconds": seconds}``, or
+          ``{"error": message}``
+       GET /status: Number of workers, running and waiting requests and
+          requests served
+    """
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        address: Tuple[str, int],
+        valid_values: Dict[str, Set] = None,
+        workers: int = None,
+        max_queue: int = DEFAULT_MAX_QUEUE,
+        root: str = None,
+    ):
+        if not is_loopback(address[0]):
+            raise ValueError(
+                f"The server can only listen on loopback addresses: {address[0]}"
+            )
+        super().__init__(address, AnalysisRequestHandler)
+        self.root = os.path.realpath(root or os.getcwd())
+        self.workers = workers or os.cpu_count() or 1
+        self.max_queue = max_queue
+        self.valid_values = valid_values
+        self.executor = self._start_executor()
+
+        self.slots = threading.BoundedSemaphore(self.workers)
+        self.lock = threading.Lock()
+        self.restart_lock = threading.Lock()
+        self.pending = 0
+        self.running = 0
+        self.served = 0
+
+    def _start_executor(self) -> ProcessPoolExecutor:
+        """Starts the worker pool and waits until every worker is ready."""
+        executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            initializer=_init_worker,
+            initargs=(self.valid_values,),
+        )
+        for future in [executor.submit(_warm_up) for _ in range(self.workers)]:
+            future.result()
+        return executor
+
+    def _restart_executor(self, broken: ProcessPoolExecutor) -> None:
+        """Replaces a broken worker pool, once for all the requests that
+        found it broken."""
+        with self.restart_lock:
+            if self.executor is broken:
+                broken.shutdown(wait=False)
+                self.executor = self._start_executor()
+
+    def _run(self, request: Dict) -> Dict[str, List[Dict]]:
+        executor = self.executor
+        try:
+            future = executor.submit(run_request, request)
+        except BrokenProcessPool:
+            # A worker died before this request was sent, run it in a new pool
+            self._restart_executor(executor)
+            executor = self.executor
+            future = executor.submit(run_request, request)
+        try:
+            return future.result()
+        except BrokenProcessPool:
+            self._restart_executor(executor)
+            raise
+
+    def analyze(self, request: Dict) -> Dict[str, List[Dict]]:
+        """
+        Runs a request in the worker pool, waiting for a free worker.
+
+        Returns:
+           Results returned by run_request, or None when the queue is full
+
+        Raises:
+           BrokenProcessPool: If a worker died while running the request.
+              The pool is started again for the next requests.
+        """
+        with self.lock:
+            if self.pending >= self.workers + self.max_queue:
+                return None
+            self.pending += 1
+        try:
+            with self.slots:
+                with self.lock:
+                    self.running += 1
+                try:
+                    return self._run(request)
+                finally:
+                    with self.lock:
+                        self.running -= 1
+                        self.served += 1
+        finally:
+            with self.lock:
+                self.pending -= 1
+
+    def status(self) -> Dict[str, int]:
+        with self.lock:
+            return {
+                "workers": self.workers,
+                "running": self.running,
+                "queued": self.pending - self.running,
+                "served": self.served,
+            }
+
+    def server_close(self) -> None:
+        super().server_close()
+        if sys.version_info >= (3, 9):
+            self.executor.shutdown(cancel_futures=True)
+        else:
+            self.executor.shutdown()
+
+
+class AnalysisRequestHandler(BaseHTTPRequestHandler):
+    """Handles the requests of an AnalysisServer."""
+
+    server: AnalysisServer
+
+    def send_json(self, status: int, data: Dict) -> None:
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self) -> None:
+        if self.path != "/status":
+            self.send_json(404, {"error": f"Not found: {self.path}"})
+            return
+        self.send_json(200, self.server.status())
+
+    def do_POST(self) -> None:
+        if self.path != "/analyze":
+            self.send_json(404, {"error": f"Not found: {self.path}"})
+            return
+
+        # Web pages can send forms to any address, but not JSON
+        if self.headers.get_content_type() != "application/json":
+            self.send_json(415, {"error": "Requests must be application/json"})
+            return
+
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            request = parse_request(self.rfile.read(length), self.server.root)
+        except ValueError as e:
+            self.send_json(400, {"error": str(e)})
+            return
+
+        start = time.perf_counter()
+        try:
+            results = self.server.analyze(request)
+        except Exception as e:
+            self.send_json(500, {"error": str(e)})
+            return
+        if results is None:
+            self.send_json(503, {"error": "Server busy, try again later"})
+            return
+        self.send_json(
+            200, {"results": results, "seconds": time.perf_counter() - start}
+        )
+
+    def log_message(self, format: str, *args) -> None:
+        # One line per request, without the default timestamp noise
+        print(f"{self.address_string()} {format % args}")
+
+
+def serve(
+    host: str,
+    port: int,
+    valid_values: Dict[str, Set] = None,
+    workers: int = None,
+    max_queue: int = DEFAULT_MAX_QUEUE,
+    root: str = None,
+) -> None:
+    """
+    Runs an AnalysisServer until interrupted.
+
+    Args:
+       host: Loopback address to listen on
+       port: Port to listen on
+       valid_values: Valid values of the requests that do not give rules
+       workers: Number of worker processes, the number of CPUs when None
+       max_queue: Requests waiting for a worker before new ones are refused
+       root: Directory the requests may read and write under, the current
+          directory by default
+    """
+    with AnalysisServer((host, port), valid_values, workers, max_queue, root) as server:
+        # Stop cleanly when a service manager terminates the server. The
+        # workers are already started, they keep the default handler.
+        signal.signal(
+            signal.SIGTERM,
+            lambda *_: threading.Thread(target=server.shutdown).start(),
+        )
+        print(
+            f"Serving {server.root} on http://{host}:{server.server_address[1]} "
+            f"with {server.workers} workers (Ctrl+C to stop)"
+        )
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        print("Server stopped.")
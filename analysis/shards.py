@@ -0,0 +1,137 @@
+import glob
+import hashlib
+import json
+import os
+import re
+import pandas
+from typing import Dict, Tuple
+
+# Name of the file written by every shard in the shared directory
+SHARD_PATTERN = re.compile(r"shard-(\d+)-of-(\d+)\.json$")
+
+
+def parse_shard(value: str) -> Tuple[int, int]:
+    """
+    Reads a shard given as ``i/N``, the i-th of N shards counting from 1.
+
+    Args:
+       value: Shard as written on the command line
+
+    Returns:
+       Tuple with the shard number and the number of shards
+    """
+    try:
+        index, count = (int(part) for part in str(value).split("/"))
+    except ValueError:
+        raise ValueError(f"Shard must be written as i/N: {value}")
+    if not 1 <= index <= count:
+        raise ValueError(f"Shard number must be between 1 and {count}: {value}")
+    return index, count
+
+
+def shard_name(shard: Tuple[int, int]) -> str:
+    """Name of the files of a shard, such as ``shard-1-of-4``."""
+    return f"shard-{shard[0]}-of-{shard[1]}"
+
+
+def shard_of(path: str, count: int) -> int:
+    """
+    Assigns a file to one of ``count`` shards by a stable hash of its path.
+
+    The hash does not change between runs, processes or hosts (unlike the
+    built-in ``hash``), so every node agrees on the files of its shard.
+
+    Args:
+       path: Path of the file relative to the analyzed directory
+       count: Number of shards
+
+    Returns:
+       Shard number, from 1 to count
+    """
+    # The same file on Windows and POSIX hosts gets the same shard
+    key = path.replace(os.sep, "/").encode()
+    digest = hashlib.blake2b(key, digest_size=8).digest()
+    return int.from_bytes(digest, "big") % count + 1
+
+
+def in_shard(path: str, shard: Tuple[int, int]) -> bool:
+    """Tells whether a file belongs to a shard, always True without one."""
+    return shard is None or shard_of(path, shard[1]) == shard[0]
+
+
+def write_shard(
+    results: Dict[str, pandas.DataFrame], shard_dir: str, shard: Tuple[int, int]
+) -> str:
+    """
+    Writes the per-file results of a shard to a shared directory.
+
+    Every file is analyzed by one shard only, so its result is complete and
+    merge_shards stacks the results of all shards. The file is written to a
+    temporary name and renamed, so merge_shards never reads half a shard.
+
+    Args:
+       results: Dictionary with file names as keys and result DataFrames as values
+       shard_dir: Directory shared by all the shards
+       shard: Shard number and number of shards
+
+    Returns:
+       Path to the written file
+    """
+    os.makedirs(shard_dir, exist_ok=True)
+    path = os.path.join(shard_dir, f"{shard_name(shard)}.json")
+    data = {
+        "shard": shard[0],
+        "shards": shard[1],
+        "results": {
+            name: result.to_dict(orient="list") for name, result in results.items()
+        },
+    }
+    temporary = f"{path}.{os.getpid()}.tmp"
+    with open(temporary, "w") as f:
+        json.dump(data, f, default=str)
+    os.replace(temporary, path)
+    print(f"Shard results saved in: {path}")
+    return path
+
+
+def merge_shards(shard_dir: str) -> Dict[str, pandas.DataFrame]:
+    """
+    Combines the results written by write_shard in a directory.
+
+    Args:
+       shard_dir: Directory shared by all the shards
+
+    Returns:
+       Dictionary with file names as keys and result DataFrames as values,
+       ordered by file name like analyze_directory returns them
+
+    Raises:
+       ValueError: If there are no shard results, they were written for
+          different numbers of shards, or some shards are missing
+    """
+    shards = {}
+    counts = set()
+    for path in sorted(glob.glob(os.path.join(shard_dir, "shard-*-of-*.json"))):
+        match = SHARD_PATTERN.search(os.path.basename(path))
+        if not match:
+            continue
+        with open(path) as f:
+            shards[int(match.group(1))] = json.load(f)
+        counts.add(int(match.group(2)))
+
+    if not shards:
+        raise ValueError(f"No shard results found in {shard_dir}")
+    if len(counts) > 1:
+        raise ValueError(
+            f"Shard results of different numbers of shards: {sorted(counts)}"
+        )
+    (count,) = counts
+    missing = [index for index in range(1, count + 1) if index not in shards]
+    if missing:
+        raise ValueError(f"Missing results of shards {missing} of {count}")
+
+    results = {}
+    for index in sorted(shards):
+        for name, result in shards[index]["results"].items():
+            results[name] = pandas.DataFrame(result)
+    return dict(sorted(results.items()))
@@ -0,0 +1,256 @@
+import base64
+import numpy
+import pandas
+
+# Bits of the hash used to pick a HyperLogLog register: 2**12 registers,
+# about 1.6% relative error on the distinct counts
+DEFAULT_PRECISION = 12
+
+# Values tracked by the frequent values summary and values reported
+DEFAULT_CAPACITY = 64
+DEFAULT_TOP = 5
+
+
+def _bit_length(values: numpy.ndarray) -> numpy.ndarray:
+    """Number of bits needed to write every value of an uint64 array."""
+    values = values.copy()
+    length = numpy.zeros(len(values), dtype=numpy.uint8)
+    for shift in (32, 16, 8, 4, 2, 1):
+        high = values >= numpy.uint64(1 << shift)
+        length[high] += shift
+        values[high] >>= numpy.uint64(shift)
+    length += (values > 0).astype(numpy.uint8)
+    return length
+
+
+class HyperLogLog:
+    """
+    Approximate count of distinct values in a fixed amount of memory.
+
+    Every value is given as a 64-bit hash. The first ``precision`` bits pick
+    a register, which keeps the largest number of leading zeros seen in the
+    other bits. Merging two sketches takes the maximum of every register.
+    """
+
+    def __init__(self, precision: int = DEFAULT_PRECISION):
+        self.precision = precision
+        self.registers = numpy.zeros(1 << precision, dtype=numpy.uint8)
+
+    def add(self, hashes: numpy.ndarray) -> None:
+        """
+        Adds values to the sketch.
+
+        Args:
+           hashes: uint64 hashes of the values
+        """
+        if not len(hashes):
+            return
+        bits = 64 - self.precision
+        index = (hashes >> numpy.uint64(bits)).astype(numpy.intp)
+        rest = hashes & numpy.uint64((1 << bits) - 1)
+        rank = (bits + 1 - _bit_length(rest)).astype(numpy.uint8)
+        numpy.maximum.at(self.registers, index, rank)
+
+    def merge(self, other: "HyperLogLog") -> None:
+        numpy.maximum(self.registers, other.registers, out=self.registers)
+
+    def count(self) -> int:
+        """Estimated number of distinct values added."""
+        size = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / size)
+        estimate = (
+            alpha
+            * size**2
+            / numpy.sum(numpy.ldexp(1.0, -self.registers.astype(numpy.int32)))
+        )
+        zeros = int(numpy.count_nonzero(self.registers == 0))
+        if estimate <= 2.5 * size and zeros:
+            # Few values: count the empty registers instead
+            estimate = size * numpy.log(size / zeros)
+        return int(round(estimate))
+
+    def to_dict(self) -> dict:
+        return {
+            "precision": self.precision,
+            "registers": base64.b64encode(self.registers.tobytes()).decode(),
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "HyperLogLog":
+        sketch = cls(data["precision"])
+        sketch.registers = numpy.frombuffer(
+            base64.b64decode(data["registers"]), dtype=numpy.uint8
+        ).copy()
+        return sketch
+
+
+class MisraGries:
+    """
+    Most frequent values in a fixed amount of memory.
+
+    At most ``capacity`` values are tracked. When there are more, the count
+    of the first value left out is taken from every count and the values
+    that reach zero are dropped, so every value seen more than
+    ``rows / (capacity + 1)`` times is kept. Counts are lower bounds of the
+    real counts, and two summaries merge the same way.
+    """
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY):
+        self.capacity = capacity
+        self.counts = pandas.Series(dtype="int64")
+
+    def _reduce(self, counts: pandas.Series) -> pandas.Series:
+        """Keeps at most capacity values, lowering the counts accordingly."""
+        if len(counts) <= self.capacity:
+            return counts
+        threshold = counts.nlargest(self.capacity + 1).iloc[-1]
+        return counts[counts > threshold] - threshold
+
+    def update(self, counts: pandas.Series) -> None:
+        """
+        Adds counted values to the summary.
+
+        Args:
+           counts: Number of times each value was seen, indexed by value.
+              Values are stored as text.
+        """
+        if not len(counts):
+            return
+        # Summarize the new counts first, so only a few values become text
+        counts = self._reduce(counts)
+        counts.index = counts.index.astype(str)
+        if len(self.counts):
+            counts = pandas.concat([self.counts, counts]).groupby(level=0).sum()
+        self.counts = self._reduce(counts).astype("int64")
+
+    def merge(self, other: "MisraGries") -> None:
+        self.update(other.counts)
+
+    def top(self, number: int = DEFAULT_TOP) -> pandas.Series:
+        """The ``number`` values with the largest counts, largest first and
+        then by value."""
+        counts = self.counts.sort_index()
+        return counts.sort_values(ascending=False, kind="stable").head(number)
+
+    def to_dict(self) -> dict:
+        return {
+            "capacity": self.capacity,
+            "counts": {str(value): int(count) for value, count in self.counts.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "MisraGries":
+        summary = cls(data["capacity"])
+        summary.counts = pandas.Series(data["counts"], dtype="int64")
+        return summary
+
+
+def _value_text(value) -> str:
+    """Text of a single value, writing integral floats as integers."""
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def profile_text(values: pandas.Series) -> pandas.Series:
+    """
+    Values without missing ones as the text profiles keep.
+
+    Integral floats are written as integers, as a column read as text holds
+    them, so a chunk where a column is parsed as numbers gives the same
+    values as one where it stays text.
+    """
+    if pandas.api.types.is_float_dtype(values.dtype):
+        numbers = values.to_numpy(float)
+        integral = (numpy.floor(numbers) == numbers) & (numpy.abs(numbers) < 2**53)
+        text = values.astype(str)
+        text[integral] = values[integral].astype("int64").astype(str)
+        return text
+    if values.dtype == "object":
+        return values.map(_value_text)
+    return values.astype(str)
+
+
+class ColumnProfile:
+    """
+    Distinct count, frequent values and text length range of a column, built
+    one chunk at a time and mergeable across chunks and files.
+
+    Values are compared and measured by their text (see profile_text), so
+    the profile of a column does not depend on the type it got in each
+    chunk.
+    """
+
+    def __init__(
+        self, precision: int = DEFAULT_PRECISION, capacity: int = DEFAULT_CAPACITY
+    ):
+        self.distinct = HyperLogLog(precision)
+        self.frequent = MisraGries(capacity)
+        self.min_length = None
+        self.max_length = None
+
+    def update(self, values: pandas.Series) -> None:
+        """
+        Adds the values of a chunk. Missing values are ignored.
+
+        Args:
+           values: Column of the chunk
+        """
+        values = values.dropna()
+        if not len(values):
+            return
+        values = profile_text(values)
+        self.frequent.update(values.value_counts(sort=False))
+        self.distinct.add(
+            pandas.util.hash_pandas_object(values, index=False).to_numpy()
+        )
+        lengths = values.str.len()
+        self._update_lengths(int(lengths.min()), int(lengths.max()))
+
+    def _update_lengths(self, min_length: int, max_length: int) -> None:
+        if min_length is None:
+            return
+        if self.min_length is None:
+            self.min_length, self.max_length = min_length, max_length
+            return
+        self.min_length = min(self.min_length, min_length)
+        self.max_length = max(self.max_length, max_length)
+
+    def merge(self, other: "ColumnProfile") -> None:
+        self.distinct.merge(other.distinct)
+        self.frequent.merge(other.frequent)
+        self._update_lengths(other.min_length, other.max_length)
+
+    def summary(self, top: int = DEFAULT_TOP) -> dict:
+        """
+        Values of the profile columns of the result.
+
+        Returns:
+           Dictionary with Distinct_Values, Top_Values (``value (count)``
+           pairs joined by commas), Min_Length and Max_Length
+        """
+        return {
+            "Distinct_Values": self.distinct.count(),
+            "Top_Values": ", ".join(
+                f"{value} ({count})" for value, count in self.frequent.top(top).items()
+            ),
+            "Min_Length": self.min_length,
+            "Max_Length": self.max_length,
+        }
+
+    def to_dict(self) -> dict:
+        return {
+            "distinct": self.distinct.to_dict(),
+            "frequent": self.frequent.to_dict(),
+            "min_length": self.min_length,
+            "max_length": self.max_length,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "ColumnProfile":
+        profile = cls()
+        profile.distinct = HyperLogLog.from_dict(data["distinct"])
+        profile.frequent = MisraGries.from_dict(data["frequent"])
+        profile.min_length = data["min_length"]
+        profile.max_length = data["max_length"]
+        return profile
@@ -0,0 +1,299 @@
+import json
+import struct
+import numpy
+import pandas
+from typing import Dict, List, Set
+from analysis.rules import ColumnRule, numeric_values
+from analysis.sketches import ColumnProfile
+
+# Counts kept for every column, in the order of the arrays of to_bytes
+COUNT_FIELDS = ("totals", "non_null", "non_empty", "valid_hits")
+
+# First bytes of the binary form of FillStats, with its version
+BINARY_MAGIC = b"FST1"
+
+
+def is_text_dtype(dtype) -> bool:
+    """
+    Tells whether a column dtype holds strings that may be empty.
+
+    pandas < 3 stores strings as ``object``; pandas >= 3 infers the dedicated
+    ``str`` dtype, which must get the same empty-string handling. Compact
+    reads give Arrow strings or categories of strings. ``pandas.ArrowDtype``
+    only exists in pandas >= 1.5.
+    """
+    if isinstance(dtype, pandas.CategoricalDtype):
+        return is_text_dtype(dtype.categories.dtype)
+    if isinstance(dtype, getattr(pandas, "ArrowDtype", ())):
+        return dtype.kind in "OU"
+    return dtype == "object" or isinstance(dtype, pandas.StringDtype)
+
+
+class FillStats:
+    """
+    Mergeable fill counts of the columns of a table.
+
+    For every column the counts keep how many rows had the column, how many
+    values are not null, how many are not null and not an empty string, and
+    how many belong to the set of valid values configured for that column
+    (if any), as int64 NumPy arrays in the order of ``columns``. With
+    ``profile`` it also keeps a ColumnProfile of every column, with its
+    approximate number of distinct values, its most frequent values and its
+    text lengths.
+
+    Counts of chunks, byte ranges, shards or days of the same data are
+    combined with merge, which is associative and commutative: any grouping
+    and order of merges gives the same counts (columns are listed in the
+    order they were first seen). They are stored as JSON with to_dict or in
+    a compact binary form with to_bytes.
+    """
+
+    __slots__ = (
+        "valid_values",
+        "columns",
+        "total_rows",
+        "totals",
+        "non_null",
+        "non_empty",
+        "valid_hits",
+        "profiles",
+        "_positions",
+    )
+
+    def __init__(self, valid_values: Dict[str, Set] = None, profile: bool = False):
+        self.valid_values = valid_values if valid_values is not None else {}
+        self.columns = []
+        self.total_rows = 0
+        for name in COUNT_FIELDS:
+            setattr(self, name, numpy.zeros(0, numpy.int64))
+        self.profiles = {} if profile else None
+        self._positions = {}
+
+    def _column_positions(self, columns: List) -> numpy.ndarray:
+        """Positions of columns in the count arrays, adding the new ones."""
+        new = [
+            column for column in dict.fromkeys(columns) if column not in self._positions
+        ]
+        if new:
+            for column in new:
+                self._positions[column] = len(self.columns)
+                self.columns.append(column)
+                if self.profiles is not None:
+                    self.profiles[column] = ColumnProfile()
+            for name in COUNT_FIELDS:
+                grown = numpy.zeros(len(self.columns), numpy.int64)
+                grown[: -len(new)] = getattr(self, name)
+                setattr(self, name, grown)
+        return numpy.array([self._positions[column] for column in columns], numpy.intp)
+
+    def update(self, df: pandas.DataFrame) -> None:
+        """
+        Adds the counts of a chunk of rows.
+
+        The counts of every column are computed together with frame-level
+        masks and NumPy reductions instead of column by column.
+
+        Args:
+           df: Chunk of the file being analyzed
+        """
+        columns = list(df.columns)
+        positions = self._column_positions(columns)
+        self.total_rows += len(df)
+        self.totals[positions] += len(df)
+
+        not_null = df.notna().to_numpy(bool)
+        non_null = not_null.sum(axis=0)
+        non_empty = non_null.copy()
+
+        # For strings, check also if empty
+        text = numpy.flatnonzero([is_text_dtype(dtype) for dtype in df.dtypes])
+        if len(text):
+            filled = not_null[:, text] & df.iloc[:, text].ne("").to_numpy(
+                bool, na_value=True
+            )
+            non_empty[text] = filled.sum(axis=0)
+
+        self.non_null[positions] += non_null
+        self.non_empty[positions] += non_empty
+
+        # Count values that are in the set of valid values. Compiled rules
+        # (allow-lists and patterns) use their own matchers.
+        rules = {
+            column: self.valid_values[column]
+            for column in columns
+            if column in self.valid_values
+        }
+        sets = {
+            column: values
+            for column, values in rules.items()
+            if not isinstance(values, ColumnRule)
+        }
+        valid_hits = df[list(sets)].isin(sets).sum() if sets else {}
+        for column, values in rules.items():
+            if column not in sets:
+                hits = values.count(df[column])
+            elif is_text_dtype(df[column].dtype) and numeric_values(values):
+                # Numbers also match their text, as in ColumnRule.matches
+                parsed = pandas.to_numeric(df[column], errors="coerce")
+                valid = df[column].isin(values) | parsed.isin(numeric_values(values))
+                hits = int(valid.sum())
+            else:
+                hits = int(valid_hits[column])
+            self.valid_hits[self._positions[column]] += hits
+
+        if self.profiles is not None:
+            for column in columns:
+                self.profiles[column].update(df[column])
+
+    def merge(self, other: "FillStats") -> "FillStats":
+        """
+        Adds the counts of another FillStats, e.g. one built from another part
+        of the same file.
+
+        Args:
+           other: Counts to merge into these ones
+
+        Returns:
+           This object, so merges can be chained
+        """
+        positions = self._column_positions(other.columns)
+        self.total_rows += other.total_rows
+        for name in COUNT_FIELDS:
+            getattr(self, name)[positions] += getattr(other, name)
+        if self.profiles is not None and other.profiles is not None:
+            for column in other.columns:
+                self.profiles[column].merge(other.profiles[column])
+        return self
+
+    def to_dict(self) -> dict:
+        """
+        Converts the counts to a dictionary that can be stored as JSON.
+
+        Returns:
+           Dictionary with the columns, the total rows and the per-column counts
+        """
+        data = {"columns": list(self.columns), "total_rows": self.total_rows}
+        for name in COUNT_FIELDS:
+            data[name] = getattr(self, name).tolist()
+        if self.profiles is not None:
+            data["profiles"] = [
+                self.profiles[column].to_dict() for column in self.columns
+            ]
+        return data
+
+    @classmethod
+    def from_dict(cls, data: dict, valid_values: Dict[str, Set] = None) -> "FillStats":
+        """
+        Rebuilds the counts from the dictionary returned by to_dict.
+
+        Args:
+           data: Dictionary returned by to_dict
+           valid_values: Dictionary with valid values per column
+
+        Returns:
+           FillStats with the stored counts
+        """
+        stats = cls(valid_values, profile="profiles" in data)
+        stats._column_positions(data["columns"])
+        stats.total_rows = data["total_rows"]
+        for name in COUNT_FIELDS:
+            setattr(stats, name, numpy.array(data[name], numpy.int64).reshape(-1))
+        if stats.profiles is not None:
+            for column, profile in zip(stats.columns, data["profiles"]):
+                stats.profiles[column] = ColumnProfile.from_dict(profile)
+        return stats
+
+    def to_bytes(self) -> bytes:
+        """
+        Converts the counts to a compact binary form: BINARY_MAGIC, the length
+        of a JSON header with the columns, the total rows and the profiles,
+        the header, and the count arrays as little-endian int64.
+
+        Returns:
+           Bytes that from_bytes reads back
+        """
+        header = {"columns": list(self.columns), "total_rows": self.total_rows}
+        if self.profiles is not None:
+            header["profiles"] = [
+                self.profiles[column].to_dict() for column in self.columns
+            ]
+        header = json.dumps(header, default=str, separators=(",", ":")).encode()
+        counts = numpy.stack([getattr(self, name) for name in COUNT_FIELDS])
+        return (
+            BINARY_MAGIC
+            + struct.pack("<I", len(header))
+            + header
+            + counts.astype("<i8").tobytes()
+        )
+
+    @classmethod
+    def from_bytes(
+        cls, data: bytes, valid_values: Dict[str, Set] = None
+    ) -> "FillStats":
+        """
+        Rebuilds the counts from the bytes returned by to_bytes.
+
+        Args:
+           data: Bytes returned by to_bytes
+           valid_values: Dictionary with valid values per column
+
+        Returns:
+           FillStats with the stored counts
+        """
+        if data[: len(BINARY_MAGIC)] != BINARY_MAGIC:
+            raise ValueError("Data is not in the FillStats binary form")
+        start = len(BINARY_MAGIC) + 4
+        (length,) = struct.unpack_from("<I", data, len(BINARY_MAGIC))
+        header = json.loads(data[start : start + length])
+        counts = numpy.frombuffer(data, "<i8", offset=start + length)
+        counts = counts.reshape(len(COUNT_FIELDS), len(header["columns"]))
+        for index, name in enumerate(COUNT_FIELDS):
+            header[name] = counts[index]
+        return cls.from_dict(header, valid_values)
+
+    def full_values(self, column) -> int:
+        """Number of values of ``column`` that count as filled."""
+        position = self._positions[column]
+        if column in self.valid_values:
+            return int(self.valid_hits[position])
+        return int(self.non_empty[position])
+
+    def to_frame(self) -> pandas.DataFrame:
+        """
+        Builds the result DataFrame with fill statistics for each column.
+
+        Rows of the parts that did not have a column, such as Excel rows
+        ending in empty cells, count as empty values of that column.
+
+        Returns:
+           DataFrame with the Column, Total_Rows, Full_Values, Empty_Values
+           and Percentage_Filled columns, followed by the columns of
+           ColumnProfile.summary when profiling
+        """
+        is_rule = numpy.array(
+            [column in self.valid_values for column in self.columns], bool
+        )
+        full = numpy.where(is_rule, self.valid_hits, self.non_empty).tolist()
+        total_rows = self.total_rows
+
+        results = {
+            "Column": list(self.columns),
+            "Total_Rows": [total_rows] * len(self.columns),
+            "Full_Values": full,
+            "Empty_Values": [total_rows - count for count in full],
+            # Calculate filling percentage
+            "Percentage_Filled": [
+                round(count / total_rows * 100, 2) if total_rows > 0 else 0
+                for count in full
+            ],
+        }
+
+        if self.profiles is not None:
+            for column in self.columns:
+                for name, value in self.profiles[column].summary().items():
+                    results.setdefault(name, []).append(value)
+
+        return pandas.DataFrame(results)
+
+    def __repr__(self) -> str:
+        return f"FillStats({len(self.columns)} columns, {self.total_rows} rows)"
@@ -1,33 +1,97 @@
 import os
+import numpy
 import pandas
 from typing import Dict
+from analysis import profiling
+from analysis.defaults import OUTPUT_FORMATS
 
 
-def export_results(results: Dict[str, pandas.DataFrame], output_dir: str) -> None:
+def write_table(df: pandas.DataFrame, path: str, output_format: str = "xlsx") -> None:
     """
-    Exports the results to Excel files.
+    Writes a result table in the given format.
+
+    Args:
+       df: Table to write
+       path: Destination file
+       output_format: One of OUTPUT_FORMATS. parquet requires pyarrow.
+    """
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"Output format not supported: {output_format}")
+
+    with profiling.stage("export", path=path, rows=len(df)):
+        if output_format == "xlsx":
+            df.to_excel(path, index=False)
+        elif output_format == "csv":
+            df.to_csv(path, index=False)
+        elif output_format == "parquet":
+            df.to_parquet(path, index=False)
+        else:
+            df.to_json(path, orient="records", indent=2)
+
+
+def combine_results(results: Dict[str, pandas.DataFrame]) -> pandas.DataFrame:
+    """
+    Stacks the results of every file in a single table with a File column.
+
+    The table is built with one concatenation, so the cost grows linearly with
+    the number of results, and the given DataFrames are not modified.
+
+    Args:
+       results: Dictionary with file names as keys and result DataFrames as values
+
+    Returns:
+       DataFrame with the rows of every result and the name of its file
+    """
+    if not results:
+        return pandas.DataFrame()
+    all_results = pandas.concat(list(results.values()), ignore_index=True)
+    all_results["File"] = numpy.repeat(
+        list(results), [len(result_df) for result_df in results.values()]
+    )
+    return all_results
+
+
+def export_results(
+    results: Dict[str, pandas.DataFrame],
+    output_dir: str,
+    output_format: str = "xlsx",
+    per_file: bool = True,
+    combined: bool = True,
+) -> None:
+    """
+    Exports the results to Excel, CSV, Parquet or JSON files.
 
     Args:
        results: Dictionary with file names as keys and result DataFrames as values
        output_dir: Directory where the results will be saved.
+       output_format: Format of the written files: xlsx, csv, parquet or json.
+          csv and parquet are much faster to write than xlsx.
+       per_file: Write one file with the results of every analyzed file
+       combined: Write the complete_analysis file with all results combined
     """
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"Output format not supported: {output_format}")
+    extension = OUTPUT_FORMATS[output_format]
+
     # Create output directory if it does not exist
     if not os.path.exists(output_dir):
         os.makedirs(output_dir)
 
-    # Create an Excel file for each result
-    for filename, result_df in results.items():
-        base_name = os.path.splitext(filename)[0]
-        output_path = os.path.join(output_dir, f"{base_name}_analisis.xlsx")
-        result_df.to_excel(output_path, index=False)
-        print(f"Resultados guardados en: {output_path}")
-
-    # Create an Excel file with all results combined
-    all_results = pandas.DataFrame()
-    for filename, result_df in results.items():
-        result_df["File"] = filename
-        all_results = pandas.concat([all_results, result_df])
-
-    all_results_path = os.path.join(output_dir, "complete_analysis.xlsx")
-    all_results.to_excel(all_results_path, index=False)
+    # Create a file for each result
+    if per_file:
+        for filename, result_df in results.items():
+            base_name = os.path.splitext(filename)[0]
+            output_path = os.path.join(output_dir, f"{base_name}_analisis{extension}")
+            # Files found in subdirectories keep their relative path
+            os.makedirs(os.path.dirname(output_path), exist_ok=True)
+            write_table(result_df, output_path, output_format)
+            print(f"Resultados guardados en: {output_path}")
+
+    if not combined:
+        return
+
+    # Create a file with all results combined
+    all_results = combine_results(results)
+    all_results_path = os.path.join(output_dir, f"complete_analysis{extension}")
+    write_table(all_results, all_results_path, output_format)
     print(f"Conbined Results saved in: {all_results_path}")
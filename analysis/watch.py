@@ -0,0 +1,220 @@
+import os
+import time
+import pandas
+from typing import Dict, List, Set, Tuple
+from analysis.analysis import SUPPORTED_EXTENSIONS, analyze_file
+from analysis.cache import ResultCache, cache_key
+from analysis.utils import export_results
+
+# Seconds a file must keep the same size and modification time before it is
+# analyzed, so files still being written are not read half way
+DEFAULT_SETTLE = 2.0
+
+# Seconds between two scans of the directory when inotify is not available
+DEFAULT_INTERVAL = 1.0
+
+
+def _open_inotify(directory_path: str):
+    """Watches a directory with inotify, or returns None if not available."""
+    try:
+        from inotify_simple import INotify, flags
+    except ImportError:
+        return None
+
+    inotify = INotify()
+    inotify.add_watch(
+        directory_path,
+        flags.CREATE
+        | flags.MODIFY
+        | flags.CLOSE_WRITE
+        | flags.MOVED_TO
+        | flags.MOVED_FROM
+        | flags.DELETE,
+    )
+    return inotify
+
+
+class DirectoryWatcher:
+    """
+    Finds the files of a directory that are new or changed since they were
+    last returned.
+
+    The directory is scanned with ``os.scandir`` and every file is compared by
+    size and modification time. inotify events, when the inotify_simple
+    package is installed, are only used to wake up as soon as something
+    happens instead of scanning every ``interval`` seconds.
+    """
+
+    def __init__(
+        self,
+        directory_path: str,
+        settle: float = DEFAULT_SETTLE,
+        interval: float = DEFAULT_INTERVAL,
+        use_inotify: bool = True,
+    ):
+        self.directory_path = directory_path
+        self.settle = settle
+        self.interval = interval
+        self.inotify = _open_inotify(directory_path) if use_inotify else None
+        # Stat of every file when it was last returned by changed
+        self.seen: Dict[str, Tuple[int, int]] = {}
+        # Stat of every changed file and when it was first observed
+        self.pending: Dict[str, Tuple[Tuple[int, int], float]] = {}
+
+    def _scan(self) -> Dict[str, Tuple[int, int]]:
+        """Size and modification time of every supported file."""
+        files = {}
+        with os.scandir(self.directory_path) as entries:
+            for entry in entries:
+                if entry.is_file() and entry.name.lower().endswith(
+                    SUPPORTED_EXTENSIONS
+                ):
+                    stat = entry.stat()
+                    files[entry.name] = (stat.st_size, stat.st_mtime_ns)
+        return files
+
+    def changed(self) -> Tuple[List[str], List[str]]:
+        """
+        Scans the directory once.
+
+        Returns:
+           Tuple with the sorted names of the files that changed and have
+           been stable for ``settle`` seconds, and the names of the files
+           that were removed
+        """
+        now = time.monotonic()
+        files = self._scan()
+
+        ready = []
+        for filename, stat in files.items():
+            if self.seen.get(filename) == stat:
+                self.pending.pop(filename, None)
+                continue
+            previous = self.pending.get(filename)
+            if previous is None or previous[0] != stat:
+                # Still being written: wait until it stops changing
+                self.pending[filename] = (stat, now)
+                previous = self.pending[filename]
+            if now - previous[1] >= self.settle:
+                ready.append(filename)
+                self.seen[filename] = stat
+                del self.pending[filename]
+
+        removed = [filename for filename in self.seen if filename not in files]
+        for filename in removed:
+            del self.seen[filename]
+        for filename in [name for name in self.pending if name not in files]:
+            del self.pending[filename]
+
+        return sorted(ready), sorted(removed)
+
+    def wait(self) -> None:
+        """Waits until the directory may have changed."""
+        timeout = None
+        if self.pending:
+            now = time.monotonic()
+            timeout = max(
+                min(since + self.settle - now for _, since in self.pending.values()),
+                0,
+            )
+
+        if self.inotify is not None:
+            # Block until an event arrives or a pending file may have settled
+            self.inotify.read(timeout=None if timeout is None else int(timeout * 1000))
+            return
+        time.sleep(self.interval if timeout is None else min(timeout, self.interval))
+
+    def close(self) -> None:
+        if self.inotify is not None:
+            self.inotify.close()
+
+
+def watch_directory(
+    directory_path: str,
+    output_dir: str,
+    valid_values: Dict[str, Set] = None,
+    output_format: str = "xlsx",
+    per_file: bool = True,
+    cache: str = None,
+    settle: float = DEFAULT_SETTLE,
+    interval: float = DEFAULT_INTERVAL,
+    iterations: int = None,
+    use_inotify: bool = True,
+    **options,
+) -> Dict[str, pandas.DataFrame]:
+    """
+    Analyzes the files of a directory as they are added or modified.
+
+    Files already in the directory are analyzed first. Afterwards only new or
+    changed files are analyzed with analyze_file, once their size and
+    modification time stop changing, and the combined report is rewritten
+    from the results kept in memory.
+
+    Args:
+       directory_path: Path to the watched directory
+       output_dir: Directory where the results will be saved
+       valid_values: Dictionary with valid values per column
+       output_format: Format of the written files, see export_results
+       per_file: Write one file with the results of every analyzed file
+       cache: Path to a ResultCache database, so a restarted watch does not
+          analyze unchanged files again
+       settle: Seconds a file must stay unchanged before it is analyzed
+       interval: Seconds between scans when inotify is not available
+       iterations: Number of scans before returning. ``None`` watches until
+          interrupted.
+       use_inotify: Use inotify (inotify_simple package) when it is installed
+       options: Keyword arguments forwarded to analyze_file, such as chunksize
+
+    Returns:
+       Dictionary with the latest result of every file, ordered by file name
+    """
+    settings = cache_key(valid_values, **options)
+    result_cache = ResultCache(cache) if cache else None
+    watcher = DirectoryWatcher(directory_path, settle, interval, use_inotify)
+    results = {}
+
+    try:
+        iteration = 0
+        while iterations is None or iteration < iterations:
+            if iteration:
+                watcher.wait()
+            iteration += 1
+
+            ready, removed = watcher.changed()
+            for filename in removed:
+                if results.pop(filename, None) is not None:
+                    print(f"File removed: {filename}")
+
+            analyzed = {}
+            for filename in ready:
+                file_path = os.path.join(directory_path, filename)
+                cached = result_cache and result_cache.get(file_path, settings)
+                if cached is not None:
+                    analyzed[filename] = cached
+                    print(f"Analysis loaded from cache for: {filename}")
+                    continue
+                try:
+                    analyzed[filename] = analyze_file(
+                        file_path, valid_values, **options
+                    )
+                    print(f"Analysis completed for: {filename}")
+                except Exception as e:
+                    print(f"Error analyzing {filename}: {str(e)}")
+                    continue
+                if result_cache:
+                    result_cache.put(file_path, settings, analyzed[filename])
+
+            if not analyzed and not removed:
+                continue
+
+            results.update(analyzed)
+            results = dict(sorted(results.items()))
+            if per_file and analyzed:
+                export_results(analyzed, output_dir, output_format, combined=False)
+            export_results(results, output_dir, output_format, per_file=False)
+    finally:
+        watcher.close()
+        if result_cache:
+            result_cache.close()
+
+    return results
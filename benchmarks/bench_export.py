@@ -0,0 +1,65 @@
+"""
+Shows how the combined report of export_results scales with the number of
+result frames, next to the repeated concatenation it replaced.
+
+Run from the repository root with ``python -m benchmarks.bench_export``.
+"""
+
+import time
+import pandas
+from analysis.utils import combine_results
+
+SIZES = [500, 1000, 2000, 4000, 8000]
+COLUMNS_PER_FILE = 20
+
+# The repeated concatenation is quadratic, so it is only timed up to here
+MAX_QUADRATIC_SIZE = 2000
+
+
+def make_results(count: int) -> dict:
+    """Builds ``count`` result frames like the ones analyze_file returns."""
+    result = pandas.DataFrame(
+        {
+            "Column": [f"COL_{i}" for i in range(COLUMNS_PER_FILE)],
+            "Total_Rows": [1000] * COLUMNS_PER_FILE,
+            "Full_Values": [900] * COLUMNS_PER_FILE,
+            "Empty_Values": [100] * COLUMNS_PER_FILE,
+            "Percentage_Filled": [90.0] * COLUMNS_PER_FILE,
+        }
+    )
+    return {f"file_{i}.csv": result.copy() for i in range(count)}
+
+
+def concat_repeatedly(results: dict) -> pandas.DataFrame:
+    """Combines the results the way export_results used to."""
+    all_results = pandas.DataFrame()
+    for filename, result_df in results.items():
+        result_df = result_df.assign(File=filename)
+        all_results = pandas.concat([all_results, result_df])
+    return all_results
+
+
+def timed(function, results: dict) -> float:
+    """Seconds taken by ``function`` to combine ``results``."""
+    start = time.perf_counter()
+    combined = function(results)
+    elapsed = time.perf_counter() - start
+    assert len(combined) == len(results) * COLUMNS_PER_FILE
+    return elapsed
+
+
+def main():
+    print(f"{'frames':>8} {'seconds':>10} {'us/frame':>10} {'repeated':>10}")
+    for count in SIZES:
+        results = make_results(count)
+        elapsed = timed(combine_results, results)
+        repeated = ""
+        if count <= MAX_QUADRATIC_SIZE:
+            repeated = f"{timed(concat_repeatedly, results):.4f}"
+        print(
+            f"{count:>8} {elapsed:>10.4f} {elapsed / count * 1e6:>10.1f} {repeated:>10}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Memory comparison of the default and compact analysis of a wide text dump.
+
+Every mode runs in its own process, so the peak resident memory of one does
+not hide the next one:
+
+    python -m benchmarks.memory --rows 200000 --columns 60
+
+``frame MiB`` is the deep memory of the DataFrame read from the file and
+``peak MiB`` the growth of the peak resident memory during analyze_file,
+which includes the Arrow buffers that tracemalloc does not see.
+"""
+
+import argparse
+import importlib.util
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from analysis.analysis import analyze_file
+from analysis.profiling import peak_rss_mb
+from analysis.readers import read_csv_chunks
+from benchmarks.synthetic import generate_dump
+
+# Column with valid values, read with type inference in compact mode
+RULES = {"FLAG_4": {"S", "N"}}
+
+
+def measure(path: str, engine: str, compact: bool) -> dict:
+    """Analyzes a file once and reports its time and memory."""
+    before = peak_rss_mb()
+    start = time.perf_counter()
+    analyze_file(path, RULES, engine=engine, compact=compact)
+    seconds = time.perf_counter() - start
+    peak_mb = peak_rss_mb() - before
+
+    options = {"compact": True, "typed_columns": list(RULES)} if compact else {}
+    frame = next(read_csv_chunks(path, engine=engine, **options))
+    frame_mb = frame.memory_usage(deep=True).sum() / (1 << 20)
+    return {"seconds": seconds, "frame_mb": frame_mb, "peak_mb": peak_mb}
+
+
+def run_mode(path: str, engine: str, compact: bool) -> dict:
+    """Runs measure in a new process."""
+    output = subprocess.run(
+        [sys.executable, "-m", "benchmarks.memory", "--measure", path, engine]
+        + (["--compact"] if compact else []),
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(output.stdout)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare compact analysis memory.")
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--columns", type=int, default=60)
+    parser.add_argument("--measure", nargs=2, help=argparse.SUPPRESS)
+    parser.add_argument("--compact", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        print(json.dumps(measure(*args.measure, args.compact)))
+        return
+
+    engines = ["pandas"]
+    if importlib.util.find_spec("pyarrow"):
+        engines.append("pyarrow")
+
+    data_dir = tempfile.mkdtemp(prefix="fileanalysis-memory-")
+    try:
+        path = generate_dump(
+            os.path.join(data_dir, "wide.csv"),
+            args.rows,
+            columns=args.columns,
+            numeric_ratio=0.05,
+        )
+        print(f"{args.rows} rows x {args.columns} columns")
+        print(f"{'mode':<18} {'seconds':>8} {'frame MiB':>10} {'peak MiB':>9}")
+        for engine in engines:
+            default = None
+            for compact in (False, True):
+                result = run_mode(path, engine, compact)
+                name = f"{engine}{'-compact' if compact else ''}"
+                line = (
+                    f"{name:<18} {result['seconds']:>8.2f}"
+                    f" {result['frame_mb']:>10.1f} {result['peak_mb']:>9.1f}"
+                )
+                if default:
+                    frame = (result["frame_mb"] / default["frame_mb"] - 1) * 100
+                    peak = (result["peak_mb"] / max(default["peak_mb"], 0.1) - 1) * 100
+                    line += f"  frame {frame:+.0f}%, peak {peak:+.0f}%"
+                default = default or result
+                print(line)
+    finally:
+        shutil.rmtree(data_dir)
+
+
+if __name__ == "__main__":
+    main()
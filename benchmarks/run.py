@@ -0,0 +1,234 @@
+"""
+Benchmark suite for analyze_file, analyze_directory and export_results.
+
+Every case is timed on synthetic dumps (best of ``--repeat`` runs) and run
+once more under tracemalloc to record its peak memory. Results can be saved
+as a named baseline and compared with a later run:
+
+    python -m benchmarks.run --save before
+    python -m benchmarks.run --compare before
+
+Memory of the process pools' workers is not included in the peak.
+"""
+
+import argparse
+import contextlib
+import gzip
+import importlib.util
+import io
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Dict, List
+from analysis.analysis import analyze_directory, analyze_file
+from analysis.utils import combine_results, export_results
+from benchmarks.bench_export import make_results
+from benchmarks.synthetic import generate_directory, generate_dump
+
+BASELINES_DIR = os.path.join(os.path.dirname(__file__), "baselines")
+
+# Rows of the generated files at scale 1
+CSV_ROWS = 200000
+XLSX_ROWS = 20000
+DIRECTORY_FILES = 16
+DIRECTORY_ROWS = 20000
+EXPORT_RESULTS = 200
+COMBINE_RESULTS = 4000
+
+
+class Case:
+    """A named function to benchmark."""
+
+    def __init__(self, name: str, function: Callable, *args, **kwargs):
+        self.name = name
+        self.function = function
+        self.args = args
+        self.kwargs = kwargs
+
+    def run(self):
+        # Keep the progress messages of the analysis out of the report
+        with contextlib.redirect_stdout(io.StringIO()):
+            return self.function(*self.args, **self.kwargs)
+
+
+def build_cases(data_dir: str, output_dir: str, scale: float) -> List[Case]:
+    """Generates the synthetic dumps and lists the benchmark cases."""
+    csv_path = generate_dump(
+        os.path.join(data_dir, "dump.csv"), int(CSV_ROWS * scale), columns=30
+    )
+    xlsx_path = generate_dump(
+        os.path.join(data_dir, "dump.xlsx"), int(XLSX_ROWS * scale), columns=20
+    )
+    directory = generate_directory(
+        os.path.join(data_dir, "directory"),
+        DIRECTORY_FILES,
+        int(DIRECTORY_ROWS * scale),
+    )
+    gzip_path = compress(csv_path, csv_path + ".gz", gzip.open)
+    rules = {"FLAG_12": {"S", "N"}}
+    results = make_results(EXPORT_RESULTS)
+
+    cases = [
+        Case("analyze_file/csv", analyze_file, csv_path, rules),
+        Case(
+            "analyze_file/csv-chunked", analyze_file, csv_path, rules, chunksize=50000
+        ),
+        Case("analyze_file/csv-parallel", analyze_file, csv_path, rules, parallel=4),
+        Case("analyze_file/csv-raw", analyze_file, csv_path, rules, raw=True),
+        Case("analyze_file/csv-mmap", analyze_file, csv_path, rules, engine="mmap"),
+        Case("analyze_file/csv-gzip", analyze_file, gzip_path, rules),
+        Case(
+            "analyze_file/csv-gzip-chunked",
+            analyze_file,
+            gzip_path,
+            rules,
+            chunksize=50000,
+        ),
+        Case("analyze_file/xlsx", analyze_file, xlsx_path, rules),
+        Case("analyze_directory/serial", analyze_directory, directory, rules),
+        Case(
+            "analyze_directory/jobs-4", analyze_directory, directory, rules, workers=4
+        ),
+        Case("export_results/xlsx", export_results, results, output_dir, "xlsx"),
+        Case("export_results/csv", export_results, results, output_dir, "csv"),
+        Case("combine_results/4000", combine_results, make_results(COMBINE_RESULTS)),
+    ]
+    if importlib.util.find_spec("pyarrow"):
+        cases += [
+            Case("analyze_file/csv-pyarrow", analyze_file, csv_path, engine="pyarrow"),
+            Case(
+                "export_results/parquet", export_results, results, output_dir, "parquet"
+            ),
+        ]
+    if importlib.util.find_spec("zstandard"):
+        import zstandard
+
+        def zstd_open(path, mode):
+            return zstandard.ZstdCompressor().stream_writer(open(path, mode))
+
+        zstd_path = compress(csv_path, csv_path + ".zst", zstd_open)
+        cases.append(Case("analyze_file/csv-zstd", analyze_file, zstd_path, rules))
+    return cases
+
+
+def compress(path: str, destination: str, opener: Callable) -> str:
+    """Writes a compressed copy of a file, to compare with reading it plain."""
+    with open(path, "rb") as src, opener(destination, "wb") as dst:
+        shutil.copyfileobj(src, dst)
+    return destination
+
+
+def measure(case: Case, repeat: int) -> Dict[str, float]:
+    """
+    Times a case and records its peak memory.
+
+    Args:
+       case: Case to run
+       repeat: Number of timed runs, the fastest one is kept
+
+    Returns:
+       Dictionary with the seconds and the peak traced memory in MiB
+    """
+    seconds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        case.run()
+        seconds.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        case.run()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {"seconds": min(seconds), "peak_mb": peak / (1 << 20)}
+
+
+def current_commit() -> str:
+    """Short hash of the checked out commit, or 'unknown'."""
+    try:
+        output = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        return output.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def baseline_path(name: str) -> str:
+    return os.path.join(BASELINES_DIR, f"{name}.json")
+
+
+def print_report(results: Dict[str, Dict], baseline: Dict = None) -> None:
+    """Prints the results, next to the baseline ones when given."""
+    header = f"{'case':<30} {'seconds':>9} {'peak MiB':>9}"
+    if baseline:
+        header += f" {'baseline':>9} {'change':>8}"
+    print(header)
+
+    for name, result in results.items():
+        line = f"{name:<30} {result['seconds']:>9.3f} {result['peak_mb']:>9.1f}"
+        previous = (baseline or {}).get("results", {}).get(name)
+        if previous:
+            change = (result["seconds"] / previous["seconds"] - 1) * 100
+            line += f" {previous['seconds']:>9.3f} {change:>+7.1f}%"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the FileAnalysis benchmarks.")
+    parser.add_argument(
+        "--scale", type=float, default=1.0, help="Multiplier of the generated rows."
+    )
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per case.")
+    parser.add_argument("--only", type=str, default="", help="Run matching cases.")
+    parser.add_argument(
+        "--save",
+        nargs="?",
+        const="",
+        default=None,
+        help="Save the results as a baseline (named after the commit by default).",
+    )
+    parser.add_argument("--compare", type=str, help="Baseline to compare with.")
+    args = parser.parse_args()
+
+    baseline = None
+    if args.compare:
+        with open(baseline_path(args.compare)) as f:
+            baseline = json.load(f)
+
+    data_dir = tempfile.mkdtemp(prefix="fileanalysis-bench-")
+    try:
+        cases = build_cases(data_dir, os.path.join(data_dir, "output"), args.scale)
+        results = {}
+        for case in cases:
+            if args.only in case.name:
+                results[case.name] = measure(case, args.repeat)
+    finally:
+        shutil.rmtree(data_dir)
+
+    print_report(results, baseline)
+
+    if args.save is not None:
+        commit = current_commit()
+        os.makedirs(BASELINES_DIR, exist_ok=True)
+        path = baseline_path(args.save or commit)
+        with open(path, "w") as f:
+            json.dump(
+                {"commit": commit, "scale": args.scale, "results": results},
+                f,
+                indent=2,
+            )
+        print(f"\nBaseline saved in: {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Generator of synthetic database dumps for the benchmarks.
+"""
+
+import os
+import numpy
+import pandas
+
+
+def generate_frame(
+    rows: int,
+    columns: int = 20,
+    null_ratio: float = 0.2,
+    empty_ratio: float = 0.05,
+    string_width: int = 12,
+    numeric_ratio: float = 0.3,
+    seed: int = 0,
+) -> pandas.DataFrame:
+    """
+    Builds a DataFrame that looks like a table export.
+
+    Args:
+       rows: Number of rows
+       columns: Number of columns. One in four text columns is a S/N flag
+          column like COMPRABLE.
+       null_ratio: Share of missing values in every column
+       empty_ratio: Share of empty strings in the text columns
+       string_width: Number of characters of the text values
+       numeric_ratio: Share of numeric columns
+       seed: Seed of the random generator
+
+    Returns:
+       DataFrame with the generated data
+    """
+    rng = numpy.random.default_rng(seed)
+    numeric_columns = round(columns * numeric_ratio)
+    data = {}
+
+    for index in range(columns):
+        missing = rng.random(rows) < null_ratio
+        if index < numeric_columns:
+            values = rng.random(rows) * 1000
+            values[missing] = numpy.nan
+            data[f"NUM_{index}"] = values
+            continue
+
+        if index % 4 == 0:
+            name = f"FLAG_{index}"
+            values = rng.choice(numpy.array(["S", "N", " "], dtype=object), rows)
+        else:
+            name = f"TEXT_{index}"
+            # Random capital letters, built as UCS-4 code points
+            codes = rng.integers(65, 91, size=(rows, string_width), dtype=numpy.uint32)
+            values = codes.view(f"<U{string_width}").ravel().astype(object)
+        values[rng.random(rows) < empty_ratio] = ""
+        values[missing] = None
+        data[name] = values
+
+    return pandas.DataFrame(data)
+
+
+def generate_dump(path: str, rows: int, **options) -> str:
+    """
+    Writes a synthetic dump as CSV or XLSX depending on the extension of path.
+
+    Args:
+       path: Destination file, ending in .csv or .xlsx
+       rows: Number of rows
+       options: Keyword arguments for generate_frame
+
+    Returns:
+       The path written
+    """
+    df = generate_frame(rows, **options)
+    if path.lower().endswith(".xlsx"):
+        df.to_excel(path, index=False)
+    else:
+        df.to_csv(path, index=False)
+    return path
+
+
+def generate_directory(
+    directory: str, files: int, rows: int, extension: str = ".csv", **options
+) -> str:
+    """
+    Writes several synthetic dumps to a directory.
+
+    Args:
+       directory: Destination directory, created if needed
+       files: Number of files
+       rows: Number of rows of every file
+       extension: .csv or .xlsx
+       options: Keyword arguments for generate_frame
+
+    Returns:
+       The directory written
+    """
+    os.makedirs(directory, exist_ok=True)
+    for index in range(files):
+        path = os.path.join(directory, f"dump_{index:04d}{extension}")
+        generate_dump(path, rows, seed=index, **options)
+    return directory
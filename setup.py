@@ -1,7 +1,7 @@
 from importlib.metadata import entry_points
 from setuptools import setup, find_packages
 
-setup (
+setup(
     name="FileAnalysis",
     version="0.1.0",
     packages=find_packages(),
@@ -14,6 +14,21 @@ setup (
         "argparse>=1.4.0",
     ],
     extras_require={
+        "pyarrow": [
+            "pyarrow>=10.0.0",
+        ],
+        "calamine": [
+            "python-calamine>=0.2.0",
+        ],
+        "zstd": [
+            "zstandard>=0.15.0",
+        ],
+        "watch": [
+            "inotify_simple>=1.3.0",
+        ],
+        "yaml": [
+            "PyYAML>=5.1",
+        ],
         "dev": [
             "pytest>=7.0.0",
             "pytest-cov>=4.0.0",
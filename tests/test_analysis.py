@@ -1,3 +1,4 @@
+import os
 import pytest
 import pandas
 import tempfile
@@ -81,6 +82,50 @@ class TestAnalyzeFile:
         expected_vendible_valid = sum(df["VENDIBLE"].isin(["S", " ", ""]))
         assert vendible_row["Full_Values"].iloc[0] == expected_vendible_valid
 
+    def test_analyze_csv_chunked(self, sample_csv_path):
+        """Test that streaming a CSV in chunks gives the same result."""
+        valid_values = {"COMPRABLE": {"S", " ", ""}}
+
+        expected = analyze_file(sample_csv_path, valid_values)
+        result = analyze_file(sample_csv_path, valid_values, chunksize=2)
+
+        pandas.testing.assert_frame_equal(result, expected)
+
+    @pytest.mark.parametrize("options", [{"chunksize": 5}, {"parallel": 2}])
+    def test_rule_columns_do_not_depend_on_chunks(self, tmp_path, options):
+        """Test valid values of columns whose values look like numbers in some
+        chunks only."""
+        path = str(tmp_path / "mixed.csv")
+        pandas.DataFrame(
+            {"CODE": [1, 2] * 8 + ["X"] * 10, "FLAG": ["1"] * 16 + ["S"] * 10}
+        ).to_csv(path, index=False)
+        valid_values = {"CODE": {1, 2, "X"}, "FLAG": {"1"}}
+
+        expected = analyze_file(path, valid_values)
+        result = analyze_file(path, valid_values, **options)
+
+        pandas.testing.assert_frame_equal(result, expected)
+        assert expected["Full_Values"].tolist() == [26, 16]
+
+    def test_analyze_usecols(self, sample_csv_path):
+        """Test that only the requested columns are analyzed."""
+        expected = analyze_file(sample_csv_path)
+        result = analyze_file(sample_csv_path, usecols=["PRICE", "IN_STOCK"])
+
+        assert result["Column"].tolist() == ["PRICE", "IN_STOCK"]
+        expected = expected[expected["Column"].isin(["PRICE", "IN_STOCK"])]
+        pandas.testing.assert_frame_equal(result, expected.reset_index(drop=True))
+
+    def test_analyze_raw(self, sample_csv_path, sample_excel_path):
+        """Test that reading columns as text keeps the fill counts."""
+        valid_values = {"COMPRABLE": {"S"}}
+
+        for path in (sample_csv_path, sample_excel_path):
+            expected = analyze_file(path, valid_values)
+            result = analyze_file(path, valid_values, raw=True)
+
+            pandas.testing.assert_frame_equal(result, expected)
+
     def test_unsupported_file_type(self):
         """Test that an unsupported file type raises a ValueError."""
         with tempfile.NamedTemporaryFile(suffix=".txt") as tmp:
@@ -128,6 +173,26 @@ class TestAnalyzeDirectory:
         # All COMPRABLE values in sample2.xlsx fixture should be valid
         assert comprable_row["Full_Values"].iloc[0] == 3
 
+    def test_analyze_directory_parallel(self, sample_directory):
+        """Test that a process pool gives the same results in file name order."""
+        expected = analyze_directory(sample_directory)
+        results = analyze_directory(sample_directory, workers=2)
+
+        assert list(results) == sorted(expected)
+        for filename, result in results.items():
+            pandas.testing.assert_frame_equal(result, expected[filename])
+
+    def test_analyze_directory_parallel_errors(self, sample_directory, capsys):
+        """Test that a failing file is reported and skipped by the process pool."""
+        with open(os.path.join(sample_directory, "broken.xlsx"), "w") as f:
+            f.write("not a workbook")
+
+        results = analyze_directory(sample_directory, workers=2)
+
+        assert "broken.xlsx" not in results
+        assert "sample1.csv" in results
+        assert "Error analyzing broken.xlsx" in capsys.readouterr().out
+
     def test_empty_directory(self):
         """Test analyzing an empty directory."""
         with tempfile.TemporaryDirectory() as temp_dir:
@@ -0,0 +1,95 @@
+import os
+import time
+import pandas
+from analysis.analysis import analyze_directory, analyze_file
+from analysis.cache import ResultCache, cache_key
+
+
+class TestResultCache:
+    """Tests for the persistent result cache."""
+
+    def test_get_after_put(self, sample_csv_path, tmp_path):
+        """Test that a stored result is returned for an unchanged file."""
+        result = analyze_file(sample_csv_path)
+        settings = cache_key()
+
+        with ResultCache(str(tmp_path / "cache.sqlite")) as cache:
+            assert cache.get(sample_csv_path, settings) is None
+            cache.put(sample_csv_path, settings, result)
+            cached = cache.get(sample_csv_path, settings)
+
+        pandas.testing.assert_frame_equal(cached, result)
+
+    def test_changed_file_is_invalidated(self, sample_csv_path, tmp_path):
+        """Test that a modified file is not served from the cache."""
+        settings = cache_key()
+
+        with ResultCache(str(tmp_path / "cache.sqlite")) as cache:
+            cache.put(sample_csv_path, settings, analyze_file(sample_csv_path))
+            with open(sample_csv_path, "a") as f:
+                f.write("6,Product F,1.0,Y,S,S\n")
+
+            assert cache.get(sample_csv_path, settings) is None
+
+    def test_settings_are_part_of_the_key(self, sample_csv_path, tmp_path):
+        """Test that other rules or options do not reuse a result."""
+        with ResultCache(str(tmp_path / "cache.sqlite")) as cache:
+            cache.put(sample_csv_path, cache_key(), analyze_file(sample_csv_path))
+
+            assert cache.get(sample_csv_path, cache_key({"ID": {1}})) is None
+            assert cache.get(sample_csv_path, cache_key(raw=True)) is None
+            assert cache.get(sample_csv_path, cache_key(chunksize=10)) is None
+            assert cache.get(sample_csv_path, cache_key(engine="pyarrow")) is None
+            assert cache.get(sample_csv_path, cache_key(parallel=None)) is not None
+
+    def test_eviction(self, sample_csv_path, sample_excel_path, tmp_path):
+        """Test that entries beyond max_entries or max_age are evicted."""
+        path = str(tmp_path / "cache.sqlite")
+        settings = cache_key()
+
+        with ResultCache(path, max_entries=1) as cache:
+            cache.put(sample_csv_path, settings, analyze_file(sample_csv_path))
+            time.sleep(0.01)
+            cache.put(sample_excel_path, settings, analyze_file(sample_excel_path))
+
+        with ResultCache(path, max_age=0) as cache:
+            assert cache.get(sample_csv_path, settings) is None
+            assert cache.get(sample_excel_path, settings) is not None
+
+        with ResultCache(path) as cache:
+            assert cache.get(sample_excel_path, settings) is None
+
+
+class TestAnalyzeDirectoryCache:
+    """Tests for analyze_directory with a result cache."""
+
+    def test_second_run_uses_cache(self, sample_directory, tmp_path, capsys):
+        """Test that unchanged files are loaded from the cache."""
+        cache = str(tmp_path / "cache.sqlite")
+
+        expected = analyze_directory(sample_directory, cache=cache)
+        capsys.readouterr()
+        results = analyze_directory(sample_directory, cache=cache)
+
+        output = capsys.readouterr().out
+        assert "Analysis loaded from cache for: sample1.csv" in output
+        assert "Analysis completed for" not in output
+        assert list(results) == list(expected)
+        for filename, result in results.items():
+            pandas.testing.assert_frame_equal(result, expected[filename])
+
+    def test_new_file_is_analyzed(self, sample_directory, tmp_path, capsys):
+        """Test that only files missing from the cache are analyzed."""
+        cache = str(tmp_path / "cache.sqlite")
+        analyze_directory(sample_directory, cache=cache)
+        pandas.DataFrame({"A": [1, None]}).to_csv(
+            os.path.join(sample_directory, "sample0.csv"), index=False
+        )
+        capsys.readouterr()
+
+        results = analyze_directory(sample_directory, cache=cache)
+
+        output = capsys.readouterr().out
+        assert "Analysis completed for: sample0.csv" in output
+        assert "Analysis loaded from cache for: sample1.csv" in output
+        assert list(results) == ["sample0.csv", "sample1.csv", "sample2.xlsx"]
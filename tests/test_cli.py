@@ -1,7 +1,27 @@
+import os
+import subprocess
+import sys
 import pandas
+import pytest
 from unittest.mock import patch
 from analysis.cli import main
 
+# Microseconds that importing analysis.cli may take, far below what pandas
+# alone needs
+IMPORT_TIME_BUDGET = 200000
+
+# Modules that must not be loaded to parse the command line
+HEAVY_MODULES = ("pandas", "numpy", "openpyxl", "pyarrow")
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def run_python(*args):
+    """Runs a new Python interpreter in the repository and returns its result."""
+    return subprocess.run(
+        [sys.executable, *args], cwd=ROOT, capture_output=True, text=True, check=True
+    )
+
 
 class TestCLI:
     """Tests for the command line interface."""
@@ -9,7 +29,7 @@ class TestCLI:
     @patch(
         "sys.argv", ["analyze", "--file", "dummy_path.csv", "--output", "dummy_output"]
     )
-    @patch("analysis.cli.analyze_file")
+    @patch("analysis.analysis.analyze_file")
     @patch("pandas.DataFrame.to_excel")
     def test_cli_single_file(self, mock_to_excel, mock_analyze_file, sample_csv_path):
         """Test CLI with a single file argument."""
@@ -40,8 +60,27 @@ class TestCLI:
         # Check that to_excel was called
         assert mock_to_excel.called
 
-    @patch("analysis.cli.analyze_directory")
-    @patch("analysis.cli.export_results")
+    def test_cli_single_file_format(self, sample_csv_path, output_directory):
+        """Test that a single file is exported in the requested format."""
+        with patch(
+            "sys.argv",
+            [
+                "analyze",
+                "--file",
+                sample_csv_path,
+                "--output",
+                output_directory,
+                "--format",
+                "csv",
+            ],
+        ):
+            main()
+
+        base_name = os.path.splitext(os.path.basename(sample_csv_path))[0]
+        assert os.listdir(output_directory) == [f"{base_name}_analisis.csv"]
+
+    @patch("analysis.analysis.analyze_directory")
+    @patch("analysis.utils.export_results")
     def test_cli_directory(
         self, mock_export_results, mock_analyze_directory, sample_directory
     ):
@@ -73,7 +112,61 @@ class TestCLI:
         assert args[0] == sample_directory
 
         # Check that export_results was called with the correct arguments
-        mock_export_results.assert_called_once_with(mock_results, "dummy_output")
+        mock_export_results.assert_called_once_with(
+            mock_results, "dummy_output", output_format="xlsx", per_file=True
+        )
+
+    @patch("analysis.analysis.analyze_directory")
+    @patch("analysis.utils.export_results")
+    def test_cli_chunksize(
+        self, mock_export_results, mock_analyze_directory, sample_directory
+    ):
+        """Test that --chunksize is forwarded to the analysis."""
+        mock_analyze_directory.return_value = {}
+
+        with patch(
+            "sys.argv",
+            [
+                "analyze",
+                "--directory",
+                sample_directory,
+                "--output",
+                "dummy_output",
+                "--chunksize",
+                "1000",
+            ],
+        ):
+            main()
+
+        _, kwargs = mock_analyze_directory.call_args
+        assert kwargs["chunksize"] == 1000
+        assert kwargs["cache"].startswith("dummy_output")
+
+    @patch("analysis.analysis.analyze_directory")
+    @patch("analysis.utils.export_results")
+    def test_cli_no_cache(
+        self, mock_export_results, mock_analyze_directory, sample_directory
+    ):
+        """Test that --no-cache disables the result cache."""
+        mock_analyze_directory.return_value = {}
+
+        with patch(
+            "sys.argv",
+            ["analyze", "--directory", sample_directory, "--no-cache"],
+        ):
+            main()
+
+        _, kwargs = mock_analyze_directory.call_args
+        assert kwargs["cache"] is None
+
+    @pytest.mark.parametrize("file_name", ["book.xlsx", "dump.csv.gz"])
+    def test_cli_incremental_needs_plain_csv(self, file_name, capsys):
+        """Test that --incremental refuses files that are not plain CSV."""
+        with patch("sys.argv", ["analyze", "--file", file_name, "--incremental"]):
+            with pytest.raises(SystemExit):
+                main()
+
+        assert "only reads plain (uncompressed) CSV" in capsys.readouterr().err
 
     @patch("builtins.print")
     @patch("argparse.ArgumentParser.print_help")
@@ -92,3 +185,39 @@ class TestCLI:
 
         # Check that the help was printed
         assert mock_print_help.called
+
+
+class TestStartup:
+    """Tests for the import cost of the command line."""
+
+    def test_import_time(self):
+        """Test with python -X importtime that heavy modules are not imported."""
+        output = run_python("-X", "importtime", "-c", "import analysis.cli")
+
+        # Lines are "import time: self | cumulative | indented module name"
+        imported = {}
+        for line in output.stderr.splitlines():
+            if line.startswith("import time:") and "|" in line:
+                _, cumulative, name = line.split("|")
+                if cumulative.strip().isdigit():
+                    imported[name.strip()] = int(cumulative)
+
+        assert not [name for name in imported if name.split(".")[0] in HEAVY_MODULES]
+        assert imported["analysis.cli"] < IMPORT_TIME_BUDGET
+
+    def test_help_does_not_import_pandas(self):
+        """Test that --help answers without loading the heavy modules."""
+        code = (
+            "import sys\n"
+            "heavy = set(sys.argv[1:])\n"
+            "sys.argv = ['analyze', '--help']\n"
+            "from analysis.cli import main\n"
+            "try:\n"
+            "    main()\n"
+            "except SystemExit:\n"
+            "    pass\n"
+            "print(sorted(set(sys.modules) & heavy))\n"
+        )
+        output = run_python("-c", code, *HEAVY_MODULES)
+        assert "--sample" in output.stdout
+        assert output.stdout.strip().endswith("[]")
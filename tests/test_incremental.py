@@ -0,0 +1,84 @@
+import pandas
+from unittest.mock import patch
+from analysis.analysis import analyze_directory, analyze_file
+from analysis.cache import ResultCache
+from analysis.incremental import analyze_incremental
+from analysis.parallel import count_range, last_record_end
+from analysis.stats import FillStats
+
+ROW = "6,Product F,1.0,Y,S,S\n"
+
+
+class TestIncremental:
+    """Tests for the incremental analysis of append-only CSV files."""
+
+    def test_last_record_end(self, tmp_path):
+        """Test that quoted newlines and an unfinished record are skipped."""
+        path = tmp_path / "data.csv"
+        path.write_bytes(b'A,B\n1,"x\ny"\n2,z')
+
+        assert last_record_end(str(path), 4, path.stat().st_size) == 12
+        assert last_record_end(str(path), 4, 8, block_size=3) == 4
+
+    def test_stats_round_trip(self, sample_csv_path):
+        """Test that counts survive to_dict and from_dict."""
+        stats = FillStats({"COMPRABLE": {"S"}})
+        stats.update(pandas.read_csv(sample_csv_path))
+        restored = FillStats.from_dict(stats.to_dict(), {"COMPRABLE": {"S"}})
+
+        pandas.testing.assert_frame_equal(restored.to_frame(), stats.to_frame())
+
+    def test_only_the_tail_is_parsed(self, sample_csv_path, tmp_path):
+        """Test that a second run parses only the appended rows."""
+        rules = {"COMPRABLE": {"S"}}
+        with ResultCache(str(tmp_path / "cache.sqlite")) as cache:
+            first = analyze_incremental(sample_csv_path, cache, rules)
+            pandas.testing.assert_frame_equal(
+                first, analyze_file(sample_csv_path, rules)
+            )
+
+            with open(sample_csv_path, "a") as f:
+                f.write(ROW * 3)
+            with patch("analysis.incremental.count_range", wraps=count_range) as spy:
+                second = analyze_incremental(sample_csv_path, cache, rules)
+
+        start, end = spy.call_args.args[2:4]
+        assert end - start == len(ROW) * 3
+        pandas.testing.assert_frame_equal(second, analyze_file(sample_csv_path, rules))
+
+    def test_unfinished_record_waits(self, sample_csv_path, tmp_path):
+        """Test that a record without its newline is counted on the next run."""
+        with ResultCache(str(tmp_path / "cache.sqlite")) as cache:
+            analyze_incremental(sample_csv_path, cache)
+            with open(sample_csv_path, "a") as f:
+                f.write(ROW[:8])
+            assert analyze_incremental(sample_csv_path, cache)["Total_Rows"][0] == 5
+
+            with open(sample_csv_path, "a") as f:
+                f.write(ROW[8:])
+            assert analyze_incremental(sample_csv_path, cache)["Total_Rows"][0] == 6
+
+    def test_rewritten_file_is_analyzed_again(self, sample_csv_path, tmp_path):
+        """Test that a changed prefix discards the stored counts."""
+        with ResultCache(str(tmp_path / "cache.sqlite")) as cache:
+            analyze_incremental(sample_csv_path, cache)
+            pandas.DataFrame({"ID": [1, 2], "NAME": ["a", None]}).to_csv(
+                sample_csv_path, index=False
+            )
+            result = analyze_incremental(sample_csv_path, cache)
+
+        pandas.testing.assert_frame_equal(result, analyze_file(sample_csv_path))
+
+    def test_directory(self, sample_directory, tmp_path):
+        """Test that analyze_directory counts appended rows of CSV files."""
+        cache = str(tmp_path / "cache.sqlite")
+        analyze_directory(sample_directory, cache=cache, incremental=True)
+        with open(f"{sample_directory}/sample1.csv", "a") as f:
+            f.write("4,Item D,\n")
+
+        results = analyze_directory(sample_directory, cache=cache, incremental=True)
+
+        assert list(results) == ["sample1.csv", "sample2.xlsx"]
+        pandas.testing.assert_frame_equal(
+            results["sample1.csv"], analyze_file(f"{sample_directory}/sample1.csv")
+        )
@@ -0,0 +1,135 @@
+import pandas
+import pytest
+from analysis.analysis import analyze_file
+from analysis.mmapcsv import QuoteInFieldError, analyze_csv_mmap, count_filled
+from analysis.rules import ColumnRule
+
+# Quoted delimiters and newlines, missing value tokens, blank lines, short
+# rows and a last record without newline
+AWKWARD_CSV = (
+    "ID,NOTES,STATUS,CODE\r\n"
+    '1,"a, b",S,NA\r\n'
+    '2,"line one\r\nline ""two""",,"NULL"\r\n'
+    "\r\n"
+    '3,"",N,#N/A N/A\r\n'
+    '4,nan, ,"x,NA"\r\n'
+    "5,NaNa\r\n"
+    '6,null,S,""""'
+)
+
+
+def write(path, content):
+    path.write_bytes(content.encode("utf-8"))
+    return str(path)
+
+
+class TestCountFilled:
+    """Tests for the memory-mapped CSV field counter."""
+
+    @pytest.mark.parametrize("block_size", [8, 64, 1 << 20])
+    def test_matches_pandas(self, tmp_path, block_size):
+        """Test the counts against pandas, with records split across blocks."""
+        path = write(tmp_path / "awkward.csv", AWKWARD_CSV)
+        expected = pandas.read_csv(path)
+
+        names, rows, counts = count_filled(path, block_size)
+
+        assert names == list(expected.columns)
+        assert rows == len(expected)
+        assert list(counts) == list(expected.notna().sum())
+
+    @pytest.mark.parametrize("header", ["A", "A,B"])
+    def test_lines_of_spaces(self, tmp_path, header):
+        """Test that lines of spaces and tabs are skipped, not quoted ones."""
+        content = f'{header}\n1\n \n\t \r\n" "\n2\n  '
+        path = write(tmp_path / "spaces.csv", content)
+        expected = pandas.read_csv(path)
+
+        _, rows, counts = count_filled(path, 4)
+
+        assert rows == len(expected) == 3
+        assert list(counts) == list(expected.notna().sum())
+
+    def test_header_names(self, tmp_path):
+        """Test that duplicate and empty names are renamed like pandas does."""
+        path = write(tmp_path / "names.csv", '\ufeffA,,A,"B,C"\n1,2,3,4\n')
+
+        names, rows, _ = count_filled(path)
+
+        assert names == list(pandas.read_csv(path).columns)
+        assert rows == 1
+
+    def test_too_many_fields(self, tmp_path):
+        """Test that records with more fields than the header are rejected."""
+        path = write(tmp_path / "bad.csv", "A,B\n1,2\n1,2,3\n")
+        with pytest.raises(ValueError, match="Expected 2 fields in line 3"):
+            count_filled(path)
+
+    def test_unclosed_quote(self, tmp_path):
+        """Test that a quote left open at the end of the file is an error."""
+        path = write(tmp_path / "open.csv", 'A,B\n1,"never closed\n')
+        with pytest.raises(ValueError, match="not closed"):
+            count_filled(path, block_size=4)
+
+    @pytest.mark.parametrize("block_size", [4, 1 << 20])
+    def test_quote_inside_field(self, tmp_path, block_size):
+        """Test that quotes that do not enclose a field are not tokenized."""
+        path = write(tmp_path / "inches.csv", 'A,B,C\n1,5" screen,x\n2,b,c\n')
+        with pytest.raises(QuoteInFieldError):
+            count_filled(path, block_size)
+
+        path = write(tmp_path / "after.csv", 'A,B\n1,"5" screen\n')
+        with pytest.raises(QuoteInFieldError):
+            count_filled(path, block_size)
+
+    def test_empty_file(self, tmp_path):
+        """Test that an empty file is rejected like pandas does."""
+        path = write(tmp_path / "empty.csv", "")
+        with pytest.raises(pandas.errors.EmptyDataError):
+            count_filled(path)
+
+
+class TestAnalyzeFileMmap:
+    """Tests for the mmap engine of analyze_file."""
+
+    def test_matches_pandas_engine(self, tmp_path):
+        """Test the result table against the pandas engine, with valid values."""
+        path = write(tmp_path / "awkward.csv", AWKWARD_CSV)
+        valid_values = {
+            "STATUS": {"S", "N"},
+            "CODE": ColumnRule(pattern=r"x,.*"),
+        }
+
+        expected = analyze_file(path, valid_values)
+        result = analyze_file(path, valid_values, engine="mmap")
+
+        pandas.testing.assert_frame_equal(result, expected)
+
+    def test_quote_inside_field_falls_back(self, tmp_path):
+        """Test that files with quotes inside fields are read with pandas."""
+        path = write(
+            tmp_path / "inches.csv",
+            'A,B,C\n1,5" screen,x\n2,b,c\n3,,z\n4,7" screen,\n',
+        )
+        valid_values = {"C": {"x", "z"}}
+
+        expected = analyze_file(path, valid_values)
+        result = analyze_file(path, valid_values, engine="mmap")
+
+        pandas.testing.assert_frame_equal(result, expected)
+        assert result["Total_Rows"].tolist() == [4, 4, 4]
+
+    def test_usecols(self, sample_csv_path):
+        """Test that only the selected columns are reported, in file order."""
+        usecols = ["IN_STOCK", "ID"]
+        expected = analyze_file(sample_csv_path, usecols=usecols)
+        result = analyze_file(sample_csv_path, usecols=usecols, engine="mmap")
+
+        pandas.testing.assert_frame_equal(result, expected)
+        with pytest.raises(ValueError, match="Usecols do not match"):
+            analyze_csv_mmap(sample_csv_path, usecols=["MISSING"])
+
+    def test_falls_back_to_pandas(self, sample_csv_path):
+        """Test that column profiles are computed by reading with pandas."""
+        result = analyze_file(sample_csv_path, engine="mmap", profile_columns=True)
+        assert "Distinct_Values" in result.columns
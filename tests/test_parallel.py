@@ -0,0 +1,92 @@
+import io
+import pandas
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from analysis.analysis import analyze_file
+from analysis.parallel import find_record_starts, split_csv_ranges
+
+
+def write_quoted_csv(path, rows=50):
+    """Write a CSV whose text fields contain quoted newlines and commas."""
+    df = pandas.DataFrame(
+        {
+            "ID": range(rows),
+            "NOTES": [
+                f'line one\nline "two", {i}' if i % 3 else None for i in range(rows)
+            ],
+            "STATUS": ["S" if i % 2 else "" for i in range(rows)],
+        }
+    )
+    df.to_csv(path, index=False)
+    return df
+
+
+class TestSplitCsvRanges:
+    """Tests for splitting CSV files into byte ranges."""
+
+    def test_ranges_are_whole_records(self, tmp_path):
+        """Test that every range starts at a record and they cover the data."""
+        path = str(tmp_path / "quoted.csv")
+        df = write_quoted_csv(path)
+
+        header_end, ranges = split_csv_ranges(path, 4)
+
+        with open(path, "rb") as f:
+            content = f.read()
+        assert content[:header_end] == b"ID,NOTES,STATUS\n"
+        assert ranges[0][0] == header_end
+        assert ranges[-1][1] == len(content)
+
+        rows = 0
+        for start, end in ranges:
+            part = content[:header_end] + content[start:end]
+            rows += len(pandas.read_csv(io.BytesIO(part)))
+        assert rows == len(df)
+
+    @pytest.mark.parametrize("block_size", [7, 1 << 20])
+    def test_quotes_counted_in_executor(self, tmp_path, block_size):
+        """Test that counting quotes in an executor gives the same ranges."""
+        path = str(tmp_path / "quoted.csv")
+        write_quoted_csv(path)
+
+        expected = split_csv_ranges(path, 7, block_size=block_size)
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            result = split_csv_ranges(path, 7, executor, block_size=block_size)
+
+        assert result == expected
+        assert len(result[1]) == 7
+
+    def test_record_starts_skip_quoted_newlines(self, tmp_path):
+        """Test that newlines inside quoted fields are not record boundaries."""
+        path = str(tmp_path / "quoted.csv")
+        with open(path, "wb") as f:
+            f.write(b'A,B\n1,"x\ny"\n2,z\n')
+
+        assert find_record_starts(path, [5]) == [12]
+        assert find_record_starts(path, [5], block_size=3) == [12]
+
+
+class TestAnalyzeFileParallel:
+    """Tests for analyzing a single CSV file with several processes."""
+
+    def test_parallel_matches_serial(self, tmp_path):
+        """Test that the merged partial counts give the same result."""
+        path = str(tmp_path / "quoted.csv")
+        write_quoted_csv(path, rows=200)
+        valid_values = {"STATUS": {"S"}}
+
+        expected = analyze_file(path, valid_values)
+        result = analyze_file(path, valid_values, parallel=3, chunksize=16)
+
+        pandas.testing.assert_frame_equal(result, expected)
+
+    def test_parallel_header_only(self, tmp_path):
+        """Test a CSV file with a header and no rows."""
+        path = str(tmp_path / "empty.csv")
+        with open(path, "w") as f:
+            f.write("A,B\n")
+
+        result = analyze_file(path, parallel=2)
+
+        assert result["Column"].tolist() == ["A", "B"]
+        assert result["Total_Rows"].tolist() == [0, 0]
@@ -0,0 +1,133 @@
+import json
+import math
+import os
+import pandas
+import pytest
+from unittest.mock import patch
+from analysis import profiling
+from analysis.profiling import peak_rss_mb
+from analysis.analysis import analyze_directory, analyze_file
+from analysis.cli import main
+from analysis.utils import export_results
+
+
+@pytest.fixture
+def recording():
+    """Record stage events during a test."""
+    profiling.enable()
+    yield
+    profiling.disable()
+
+
+class TestProfiling:
+    """Tests for the stage timing instrumentation."""
+
+    def test_disabled_hooks_do_nothing(self, sample_csv_path):
+        """Test that the hooks return their input and record nothing when off."""
+        chunks = iter([pandas.DataFrame({"A": [1]})])
+        assert not profiling.enabled()
+        assert profiling.timed_chunks("read", chunks) is chunks
+        with profiling.stage("count", rows=1):
+            pass
+        analyze_file(sample_csv_path)
+        assert profiling.drain() == []
+
+    def test_analyze_file_stages(self, recording, sample_csv_path):
+        """Test the read, count and analyze stages of a chunked file."""
+        analyze_file(sample_csv_path, chunksize=2)
+        events = profiling.drain()
+
+        stages = {event["stage"] for event in events}
+        assert stages == {"analyze", "read", "count"}
+        count_rows = sum(e["rows"] for e in events if e["stage"] == "count")
+        assert count_rows == 5
+        (analyze,) = [e for e in events if e["stage"] == "analyze"]
+        assert analyze["file"] == sample_csv_path
+        assert analyze["bytes"] == os.path.getsize(sample_csv_path)
+        assert all(event["seconds"] >= 0 for event in events)
+
+    def test_keyword_path(self, recording, sample_csv_path, sample_directory):
+        """Test that decorated functions accept their path by name."""
+        analyze_file(file_path=sample_csv_path)
+        analyze_directory(directory_path=sample_directory)
+        events = profiling.drain()
+
+        files = {event["stage"]: event["file"] for event in events[::-1]}
+        assert files["analyze"] == sample_csv_path
+        assert files["directory"] == sample_directory
+
+    def test_peak_rss_without_resource(self):
+        """Test the peak memory where the resource module does not exist."""
+        with patch.object(profiling, "resource", None):
+            assert math.isnan(peak_rss_mb(children=True))
+
+    def test_worker_events_are_collected(self, recording, sample_directory):
+        """Test that the stages of worker processes reach the main process."""
+        analyze_directory(sample_directory, workers=2)
+        events = profiling.drain()
+
+        analyzed = [e for e in events if e["stage"] == "analyze"]
+        assert len(analyzed) == 2
+        assert all(event["pid"] != os.getpid() for event in analyzed)
+        assert [e["stage"] for e in events].count("directory") == 1
+
+    def test_export_stage(self, recording, output_directory):
+        """Test that written files are timed with their size."""
+        result = pandas.DataFrame({"Column": ["A", "B"], "Full_Values": [1, 2]})
+        export_results({"a.csv": result}, output_directory, "csv", combined=False)
+        (event,) = profiling.drain()
+
+        assert event["stage"] == "export"
+        assert event["rows"] == 2
+        assert event["bytes"] == os.path.getsize(event["file"])
+
+    def test_summary(self, recording, sample_csv_path):
+        """Test the table that adds up the events of every stage."""
+        analyze_file(sample_csv_path, chunksize=2)
+        table = profiling.summary(profiling.disable())
+
+        assert list(table.columns) == [
+            "Stage",
+            "Calls",
+            "Seconds",
+            "Rows",
+            "MB",
+            "Rows_Per_Second",
+        ]
+        counts = table.set_index("Stage")
+        assert counts.loc["count", "Calls"] == 3
+        assert counts.loc["count", "Rows"] == 5
+        assert profiling.summary([]).empty
+
+    def test_cli_profile(self, sample_csv_path, output_directory, capsys):
+        """Test the --profile options of the command line."""
+        trace_path = os.path.join(output_directory, "trace.json")
+        dump_path = os.path.join(output_directory, "analysis.prof")
+        with patch(
+            "sys.argv",
+            [
+                "analyze",
+                "--file",
+                sample_csv_path,
+                "--output",
+                output_directory,
+                "--format",
+                "csv",
+                "--profile",
+                "--profile-trace",
+                trace_path,
+                "--profile-dump",
+                dump_path,
+            ],
+        ):
+            main()
+
+        output = capsys.readouterr().out
+        assert "Profile:" in output
+        assert "Peak RSS:" in output
+        with open(trace_path) as f:
+            trace = json.load(f)["traceEvents"]
+        assert {event["name"] for event in trace} >= {"analyze", "read", "export"}
+        assert all(event["ph"] == "X" for event in trace)
+        assert os.path.getsize(dump_path) > 0
+        assert not profiling.enabled()
@@ -0,0 +1,368 @@
+import bz2
+import gzip
+import importlib.util
+import lzma
+import os
+import shutil
+import zipfile
+import openpyxl
+import pandas
+import pytest
+from analysis.analysis import analyze_directory, analyze_file
+from analysis.readers import (
+    compact_string_dtype,
+    read_csv_chunks,
+    read_excel_chunks,
+    resolve_engine,
+)
+from analysis.stats import FillStats
+
+
+class TestResolveEngine:
+    """Tests for choosing the CSV engine."""
+
+    def test_explicit_engine(self):
+        """Test that an explicit engine is kept."""
+        assert resolve_engine("pandas") == "pandas"
+        assert resolve_engine("pyarrow") == "pyarrow"
+
+    def test_unknown_engine(self):
+        """Test that an unknown engine raises a ValueError."""
+        with pytest.raises(ValueError) as excinfo:
+            resolve_engine("polars")
+
+        assert "CSV engine not supported" in str(excinfo.value)
+
+
+class TestEngineEquivalence:
+    """Tests that every CSV engine gives the same analysis."""
+
+    @pytest.fixture
+    def dump_csv_path(self, tmp_path):
+        """Create a CSV with missing markers, empty strings and quoted fields."""
+        path = str(tmp_path / "dump.csv")
+        with open(path, "w") as f:
+            f.write("ID,NAME,PRICE,IN_STOCK,COMPRABLE\n")
+            f.write('1,"Product, A",10.5,Y,S\n')
+            f.write('2,"",NA,N,N\n')
+            f.write("3,NULL,,,S\n")
+            f.write('4,"multi\nline",n/a,None,X\n')
+            f.write("5,Product E,8.25,Y,\n")
+        return path
+
+    @pytest.mark.parametrize(
+        "options",
+        [
+            {},
+            {"chunksize": 2},
+            {"raw": True},
+            {"usecols": ["NAME", "COMPRABLE"]},
+            {"parallel": 2},
+            {"compact": True},
+        ],
+    )
+    def test_pyarrow_matches_pandas(self, dump_csv_path, options):
+        """Test that pyarrow and pandas engines give identical results."""
+        pytest.importorskip("pyarrow")
+        valid_values = {"COMPRABLE": {"S", "N"}}
+
+        expected = analyze_file(dump_csv_path, valid_values, engine="pandas", **options)
+        result = analyze_file(dump_csv_path, valid_values, engine="pyarrow", **options)
+
+        pandas.testing.assert_frame_equal(result, expected)
+
+    @pytest.mark.parametrize("engine", ["pyarrow", "mmap"])
+    @pytest.mark.parametrize("options", [{}, {"chunksize": 1}, {"parallel": 2}])
+    def test_duplicate_and_blank_headers(self, tmp_path, engine, options):
+        """Test that every engine names repeated and blank columns as pandas."""
+        pytest.importorskip("pyarrow")
+        path = str(tmp_path / "headers.csv")
+        with open(path, "w") as f:
+            f.write("A,A,\n1,2,3\n,x,\n")
+
+        expected = analyze_file(path, engine="pandas", **options)
+        result = analyze_file(path, engine=engine, **options)
+
+        pandas.testing.assert_frame_equal(result, expected)
+        assert result["Column"].tolist() == ["A", "A.1", "Unnamed: 2"]
+        assert result["Full_Values"].tolist() == [1, 2, 1]
+
+    @pytest.mark.parametrize("engine", ["pyarrow", "mmap"])
+    @pytest.mark.parametrize("chunksize", [None, 1])
+    @pytest.mark.parametrize("content", ["A,B", "A,B\n"])
+    def test_header_only(self, tmp_path, engine, chunksize, content):
+        """Test files with a header and no records."""
+        pytest.importorskip("pyarrow")
+        path = str(tmp_path / "header.csv")
+        with open(path, "w") as f:
+            f.write(content)
+
+        expected = analyze_file(path, engine="pandas", chunksize=chunksize)
+        result = analyze_file(path, engine=engine, chunksize=chunksize)
+
+        pandas.testing.assert_frame_equal(result, expected)
+        assert result["Column"].tolist() == ["A", "B"]
+
+    @pytest.mark.parametrize("engine", ["pyarrow", "auto"])
+    @pytest.mark.parametrize("chunksize", [None, 1000])
+    def test_large_multiline_file(self, tmp_path, engine, chunksize):
+        """Test quoted values spanning lines across the blocks pyarrow reads,
+        and numbers in valid values."""
+        pytest.importorskip("pyarrow")
+        path = str(tmp_path / "multiline.csv")
+        pandas.DataFrame(
+            {
+                "ID": range(200000),
+                "NOTES": ["first line\nsecond line", "plain", None, ""] * 50000,
+                "CODE": [10, 20, 30, None] * 50000,
+            }
+        ).to_csv(path, index=False)
+        valid_values = {"CODE": {10, 20}}
+
+        expected = analyze_file(path, valid_values, chunksize=chunksize)
+        result = analyze_file(path, valid_values, engine=engine, chunksize=chunksize)
+
+        pandas.testing.assert_frame_equal(result, expected)
+        assert result["Full_Values"].tolist() == [200000, 100000, 100000]
+
+    def test_read_csv_chunks_pandas(self, dump_csv_path):
+        """Test that chunks cover every row of the file."""
+        chunks = list(read_csv_chunks(dump_csv_path, chunksize=2))
+
+        assert [len(chunk) for chunk in chunks] == [2, 2, 1]
+
+
+class TestCompactMode:
+    """Tests for reading text columns in compact form."""
+
+    @pytest.mark.parametrize("engine", ["pandas", "pyarrow"])
+    @pytest.mark.parametrize("options", [{}, {"chunksize": 2}, {"raw": True}])
+    def test_same_counts(self, sample_csv_path, engine, options):
+        """Test that compact mode does not change the results."""
+        if engine == "pyarrow":
+            pytest.importorskip("pyarrow")
+        valid_values = {"COMPRABLE": {"S"}, "ID": {1, 2}}
+
+        pandas.testing.assert_frame_equal(
+            analyze_file(
+                sample_csv_path, valid_values, engine=engine, compact=True, **options
+            ),
+            analyze_file(sample_csv_path, valid_values, engine=engine, **options),
+        )
+
+    def test_without_arrow_dtype(self, sample_csv_path, monkeypatch):
+        """Test compact pyarrow reads on pandas without pandas.ArrowDtype."""
+        pytest.importorskip("pyarrow")
+        expected = analyze_file(sample_csv_path, engine="pyarrow")
+        monkeypatch.delattr(pandas, "ArrowDtype", raising=False)
+
+        chunk = next(read_csv_chunks(sample_csv_path, engine="pyarrow", compact=True))
+        result = analyze_file(sample_csv_path, engine="pyarrow", compact=True)
+
+        assert chunk["NAME"].dtype == "string[pyarrow]"
+        pandas.testing.assert_frame_equal(result, expected)
+
+    def test_dtypes(self, sample_csv_path):
+        """Test that only the columns without valid values are compact."""
+        chunk = next(
+            read_csv_chunks(sample_csv_path, compact=True, rule_columns=["ID"])
+        )
+
+        assert chunk["ID"].tolist() == ["1", "2", "3", "4", "5"]
+        assert chunk["NAME"].dtype == compact_string_dtype()
+        assert chunk["PRICE"].dtype == compact_string_dtype()
+
+
+class TestCompressedInputs:
+    """Tests for CSV files read through streaming decompression."""
+
+    OPENERS = {".gz": gzip.open, ".bz2": bz2.open, ".xz": lzma.open}
+
+    @pytest.fixture
+    def plain_csv_path(self, tmp_path):
+        """Create a CSV with empty values and a quoted multi-line field."""
+        path = str(tmp_path / "dump.csv")
+        with open(path, "w") as f:
+            f.write("ID,NAME,COMPRABLE\n")
+            f.write('1,"multi\nline",S\n')
+            f.write("2,,N\n")
+            f.write("3,Product C,\n")
+        return path
+
+    @pytest.mark.parametrize("extension", [".gz", ".bz2", ".xz"])
+    @pytest.mark.parametrize(
+        "options",
+        [
+            {},
+            {"chunksize": 2},
+            {"engine": "pyarrow"},
+            {"engine": "pyarrow", "raw": True},
+        ],
+    )
+    def test_compressed_matches_plain(self, plain_csv_path, extension, options):
+        """Test that a compressed CSV gives the result of the plain file."""
+        if options.get("engine") == "pyarrow":
+            pytest.importorskip("pyarrow")
+        compressed = plain_csv_path + extension
+        with open(plain_csv_path, "rb") as src:
+            with self.OPENERS[extension](compressed, "wb") as dst:
+                shutil.copyfileobj(src, dst)
+        valid_values = {"COMPRABLE": {"S", "N"}}
+
+        pandas.testing.assert_frame_equal(
+            analyze_file(compressed, valid_values, **options),
+            analyze_file(plain_csv_path, valid_values, **options),
+        )
+
+    def test_zstd(self, plain_csv_path):
+        """Test that zstd files are read when zstandard is installed."""
+        zstandard = pytest.importorskip("zstandard")
+        with open(plain_csv_path, "rb") as f:
+            data = zstandard.ZstdCompressor().compress(f.read())
+        with open(plain_csv_path + ".zst", "wb") as f:
+            f.write(data)
+
+        pandas.testing.assert_frame_equal(
+            analyze_file(plain_csv_path + ".zst", engine="auto"),
+            analyze_file(plain_csv_path),
+        )
+
+    def test_zip_members(self, plain_csv_path, tmp_path):
+        """Test that every CSV member of an archive is analyzed."""
+        expected = analyze_file(plain_csv_path)
+        single = str(tmp_path / "single.zip")
+        with zipfile.ZipFile(single, "w", zipfile.ZIP_DEFLATED) as archive:
+            archive.write(plain_csv_path, "dump.csv")
+        several = str(tmp_path / "several.zip")
+        with zipfile.ZipFile(several, "w", zipfile.ZIP_DEFLATED) as archive:
+            archive.write(plain_csv_path, "a/first.csv")
+            archive.write(plain_csv_path, "second.csv")
+            archive.writestr("notes.txt", "not a table")
+
+        pandas.testing.assert_frame_equal(analyze_file(single), expected)
+
+        result = analyze_file(several, chunksize=2)
+        assert list(result["Member"].unique()) == ["a/first.csv", "second.csv"]
+        for _, member_result in result.groupby("Member"):
+            pandas.testing.assert_frame_equal(
+                member_result.drop(columns="Member").reset_index(drop=True), expected
+            )
+
+    def test_compressed_excel_is_rejected(self, tmp_path):
+        """Test that only CSV files can be compressed."""
+        with pytest.raises(ValueError) as excinfo:
+            analyze_file(str(tmp_path / "book.xlsx.gz"))
+
+        assert "File type not supported" in str(excinfo.value)
+
+    def test_directory_picks_up_compressed_files(self, sample_directory):
+        """Test that analyze_directory includes compressed files."""
+        csv_path = os.path.join(sample_directory, "sample1.csv")
+        with open(csv_path, "rb") as src, gzip.open(csv_path + ".gz", "wb") as dst:
+            shutil.copyfileobj(src, dst)
+
+        results = analyze_directory(sample_directory)
+
+        pandas.testing.assert_frame_equal(
+            results["sample1.csv.gz"], results["sample1.csv"]
+        )
+
+
+class TestExcelStreaming:
+    """Tests for the streaming Excel reader."""
+
+    @pytest.fixture
+    def workbook_path(self, tmp_path):
+        """Create a workbook with missing markers, blank rows and two sheets."""
+        path = str(tmp_path / "dump.xlsx")
+        workbook = openpyxl.Workbook()
+        sheet = workbook.active
+        sheet.title = "Items"
+        for row in [
+            ("SKU", "NAME", "NAME", None, "COMPRABLE", 2024),
+            ("A001", "First", "NA", None, "S", 1),
+            (None, None),
+            ("A002", "", "Other", None, "N", 2.5, "extra"),
+            ("A003", "Third", None, None, "X", 3),
+            (None,),
+            (None,),
+        ]:
+            sheet.append(row)
+        prices = workbook.create_sheet("Prices")
+        for row in [("SKU", "PRICE"), ("A001", 10.5), ("A002", None)]:
+            prices.append(row)
+        workbook.save(path)
+        return path
+
+    @pytest.fixture(params=["calamine", "openpyxl"])
+    def backend(self, request, monkeypatch):
+        """Run a test with each of the row readers."""
+        if request.param == "calamine":
+            pytest.importorskip("python_calamine")
+        else:
+            find_spec = importlib.util.find_spec
+            monkeypatch.setattr(
+                "analysis.readers.importlib.util.find_spec",
+                lambda name: None if name == "python_calamine" else find_spec(name),
+            )
+        return request.param
+
+    @pytest.mark.parametrize("chunksize", [None, 1])
+    def test_streaming_matches_read_excel(self, workbook_path, backend, chunksize):
+        """Test that streaming a sheet gives the same counts as read_excel."""
+        valid_values = {"COMPRABLE": {"S", "N"}}
+        stats = FillStats(valid_values)
+        stats.update(pandas.read_excel(workbook_path))
+
+        result = analyze_file(workbook_path, valid_values, chunksize=chunksize)
+
+        pandas.testing.assert_frame_equal(result, stats.to_frame())
+
+    @pytest.mark.parametrize("raw", [False, True])
+    def test_integral_numbers(self, workbook_path, backend, raw):
+        """Test that numeric headers and cells are read as read_excel does."""
+        valid_values = {2024: {"1", "3"}} if raw else {2024: {1, 3}}
+        expected = FillStats(valid_values)
+        expected.update(pandas.read_excel(workbook_path, dtype=str if raw else None))
+
+        result = analyze_file(workbook_path, valid_values, raw=raw)
+
+        pandas.testing.assert_frame_equal(result, expected.to_frame())
+        assert result.set_index("Column").loc[2024, "Full_Values"] == 2
+
+    def test_read_excel_chunks_by_name(self, workbook_path, backend):
+        """Test reading a sheet by name in batches of rows."""
+        chunks = list(read_excel_chunks(workbook_path, "Prices", chunksize=1))
+
+        assert [len(chunk) for chunk in chunks] == [1, 1]
+        assert list(chunks[0].columns) == ["SKU", "PRICE"]
+
+    def test_analyze_all_sheets(self, workbook_path):
+        """Test that every sheet is reported separately."""
+        result = analyze_file(workbook_path, sheet_name=None)
+
+        assert result.columns[0] == "Sheet"
+        assert result["Sheet"].unique().tolist() == ["Items", "Prices"]
+        prices = result[result["Sheet"] == "Prices"]
+        assert prices["Column"].tolist() == ["SKU", "PRICE"]
+        assert prices["Full_Values"].tolist() == [2, 1]
+
+    def test_empty_sheets(self, workbook_path, tmp_path):
+        """Test that sheets without cells give no columns."""
+        empty_path = str(tmp_path / "empty.xlsx")
+        openpyxl.Workbook().save(empty_path)
+        assert analyze_file(empty_path).empty
+
+        workbook = openpyxl.load_workbook(workbook_path)
+        workbook.create_sheet("Blank")
+        workbook.save(workbook_path)
+        result = analyze_file(workbook_path, sheet_name=None)
+
+        assert result["Sheet"].unique().tolist() == ["Items", "Prices"]
+        assert result["Full_Values"].dtype == "int64"
+
+    def test_analyze_selected_sheets(self, workbook_path):
+        """Test analyzing a named subset of the sheets."""
+        result = analyze_file(workbook_path, sheet_name=["Prices"])
+
+        assert result["Sheet"].unique().tolist() == ["Prices"]
@@ -0,0 +1,120 @@
+import json
+import pickle
+import pandas
+import pytest
+from unittest.mock import patch
+from analysis.analysis import analyze_directory, analyze_file
+from analysis.cache import cache_key
+from analysis.rules import ColumnRule, compile_rules, load_rules
+
+
+class TestColumnRule:
+    """Tests for compiled allow-lists and patterns."""
+
+    def test_values(self):
+        """Test that an allow-list matches like Series.isin."""
+        values = pandas.Series(["S", "N", "X", None, "S", ""])
+        rule = ColumnRule(values=["S", "N", "N"])
+
+        assert rule.matches(values).tolist() == values.isin({"S", "N"}).tolist()
+        assert rule.count(values) == 3
+
+    def test_pattern(self):
+        """Test that a pattern must match the whole value."""
+        values = pandas.Series(["SKU-001", "SKU-01", "xSKU-001", None, 7])
+        rule = ColumnRule(pattern=r"SKU-\d{3}")
+
+        assert rule.matches(values).tolist() == [True, False, False, False, False]
+
+    def test_values_or_pattern(self):
+        """Test that a value is valid if it is listed or matches the pattern."""
+        rule = ColumnRule(values=["N/A"], pattern=r"\d+")
+
+        assert rule.count(pandas.Series(["12", "N/A", "x", "3"])) == 3
+
+    def test_numbers(self):
+        """Test that numeric allow-lists match numeric columns."""
+        rule = ColumnRule(values=[1, 2])
+
+        assert rule.count(pandas.Series([1, 2, 3, None])) == 2
+
+    def test_numbers_match_text(self):
+        """Test that numeric allow-lists match columns read as text."""
+        rule = ColumnRule(values=[1, 2.5, "X"])
+
+        text = pandas.Series(["1", "2.50", "X", "3", "x", None], dtype=object)
+        assert rule.count(text) == 3
+
+    def test_cache_key_and_pickle(self):
+        """Test that compiled rules have a short, stable cache key and can be
+        sent to worker processes."""
+        rule = ColumnRule(values=[str(value) for value in range(100000)])
+        copy = pickle.loads(pickle.dumps(rule))
+
+        assert copy.key == rule.key
+        assert len(cache_key({"SKU": rule})) < 200
+        assert cache_key({"SKU": rule}) != cache_key({"SKU": ColumnRule(["1"])})
+
+
+class TestRulesFile:
+    """Tests for loading rules files."""
+
+    @pytest.fixture
+    def rules_path(self, tmp_path):
+        """Create a YAML rules file with a file of valid values."""
+        (tmp_path / "names.txt").write_text("Product A\nProduct C\n")
+        path = tmp_path / "rules.yaml"
+        path.write_text(
+            "COMPRABLE: [S]\n"
+            "NAME:\n"
+            "  values_file: names.txt\n"
+            "  pattern: 'Product [DE]'\n"
+            "IN_STOCK:\n"
+            "  pattern: '[YN]'\n"
+        )
+        return str(path)
+
+    def test_load_yaml(self, rules_path, sample_csv_path):
+        """Test that the rules of a YAML file are applied."""
+        pytest.importorskip("yaml")
+        result = analyze_file(sample_csv_path, load_rules(rules_path))
+        full_values = dict(zip(result["Column"], result["Full_Values"]))
+
+        assert full_values["COMPRABLE"] == 5
+        assert full_values["NAME"] == 4
+        assert full_values["IN_STOCK"] == 3
+
+    def test_load_yaml_without_pyyaml(self, rules_path):
+        """Test the error given for YAML files when PyYAML is missing."""
+        with patch.dict("sys.modules", {"yaml": None}):
+            with pytest.raises(ImportError, match=r"\.\[yaml\]"):
+                load_rules(rules_path)
+
+    def test_load_json(self, tmp_path):
+        """Test that JSON rules files are read."""
+        path = tmp_path / "rules.json"
+        path.write_text(json.dumps({"A": ["x"], "B": {"pattern": "y+"}}))
+
+        rules = load_rules(str(path))
+
+        assert rules["A"].values.tolist() == ["x"]
+        assert rules["B"].regex.pattern == "y+"
+
+    def test_unknown_keys(self):
+        """Test that misspelled rule keys are reported."""
+        with pytest.raises(ValueError) as excinfo:
+            compile_rules({"A": {"pattren": "x"}})
+
+        assert "Unknown keys" in str(excinfo.value)
+
+    def test_directory_with_workers(self, sample_directory):
+        """Test that worker processes get the compiled rules."""
+        rules = compile_rules({"STATUS": {"pattern": "Active"}, "COMPRABLE": ["S"]})
+
+        serial = analyze_directory(sample_directory, rules)
+        parallel = analyze_directory(sample_directory, rules, workers=2)
+
+        for filename, result in serial.items():
+            pandas.testing.assert_frame_equal(parallel[filename], result)
+        status = serial["sample1.csv"].set_index("Column").loc["STATUS"]
+        assert status["Full_Values"] == 1
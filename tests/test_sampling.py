@@ -0,0 +1,79 @@
+import numpy
+import pandas
+import pytest
+from analysis.analysis import analyze_file
+from analysis.sampling import parse_sample, sample_csv, wilson_interval
+
+
+@pytest.fixture
+def large_csv_path(tmp_path):
+    """Create a CSV with 40000 rows and known fill rates."""
+    rng = numpy.random.default_rng(1)
+    rows = 40000
+    df = pandas.DataFrame(
+        {
+            "ID": numpy.arange(rows),
+            "HALF": numpy.where(rng.random(rows) < 0.5, "x", None),
+            "MOSTLY": numpy.where(rng.random(rows) < 0.9, "y", ""),
+            "FLAG": rng.choice(["S", "N", "X"], rows),
+        }
+    )
+    path = str(tmp_path / "large.csv")
+    df.to_csv(path, index=False)
+    return path
+
+
+class TestSampling:
+    """Tests for the sampled estimates of the fill statistics."""
+
+    def test_parse_sample(self):
+        """Test percentages and fractions."""
+        assert parse_sample("1%") == 0.01
+        assert parse_sample("0.25") == 0.25
+        with pytest.raises(ValueError):
+            parse_sample("150%")
+
+    def test_wilson_interval(self):
+        """Test the Wilson interval against known values."""
+        lower, upper = wilson_interval(0.5, 100)
+        assert lower == pytest.approx(0.4038, abs=1e-4)
+        assert upper == pytest.approx(0.5962, abs=1e-4)
+        assert wilson_interval(0.0, 0) == (0.0, 1.0)
+
+    def test_estimates_contain_exact_values(self, large_csv_path):
+        """Test that the bounds contain the exact percentages."""
+        valid_values = {"FLAG": {"S", "N"}}
+        exact = analyze_file(large_csv_path, valid_values).set_index("Column")
+        estimate = analyze_file(
+            large_csv_path, valid_values, sample=0.1, raw=True
+        ).set_index("Column")
+
+        assert estimate["Sampled_Rows"].iloc[0] < 40000 * 0.2
+        for column in exact.index:
+            assert (
+                estimate.loc[column, "Percentage_Lower"]
+                <= exact.loc[column, "Percentage_Filled"]
+                <= estimate.loc[column, "Percentage_Upper"]
+            )
+        assert estimate["Total_Rows"].iloc[0] == pytest.approx(40000, rel=0.05)
+
+    def test_sample_is_read_by_blocks(self, large_csv_path):
+        """Test that only the sampled share of the file is parsed."""
+        estimate = sample_csv(large_csv_path, 0.05, block_size=4096)
+
+        assert 1000 < estimate["Sampled_Rows"].iloc[0] < 4000
+
+    def test_whole_file_is_exact(self, large_csv_path):
+        """Test that a 100% sample gives the exact counts."""
+        exact = analyze_file(large_csv_path)
+        estimate = analyze_file(large_csv_path, sample=1.0)
+
+        pandas.testing.assert_frame_equal(estimate[exact.columns], exact)
+        assert (estimate["Percentage_Lower"] == estimate["Percentage_Filled"]).all()
+
+    def test_excel_is_analyzed_in_full(self, sample_excel_path):
+        """Test that files other than CSV ignore the sample size."""
+        pandas.testing.assert_frame_equal(
+            analyze_file(sample_excel_path, sample=0.01),
+            analyze_file(sample_excel_path),
+        )
@@ -0,0 +1,85 @@
+import os
+import shutil
+from unittest.mock import patch
+import pandas
+from analysis.analysis import analyze_file
+from analysis.scanner import scan_directory
+from analysis.utils import export_results
+
+
+class TestScanner:
+    """Tests for the recursive asynchronous directory scanner."""
+
+    def test_recursive_scan(self, sample_directory):
+        """Test that files of subdirectories are analyzed with relative keys."""
+        nested = os.path.join(sample_directory, "2024", "01")
+        os.makedirs(nested)
+        shutil.copy(os.path.join(sample_directory, "sample1.csv"), nested)
+
+        results = scan_directory(sample_directory, max_inflight=2)
+
+        nested_key = os.path.join("2024", "01", "sample1.csv")
+        assert list(results) == [nested_key, "sample1.csv", "sample2.xlsx"]
+        pandas.testing.assert_frame_equal(
+            results[nested_key], analyze_file(os.path.join(nested, "sample1.csv"))
+        )
+
+    def test_workers_and_cache(self, sample_directory, output_directory, capsys):
+        """Test the process pool and that a second scan uses the cache."""
+        cache = os.path.join(output_directory, "cache.sqlite")
+        first = scan_directory(sample_directory, workers=2, cache=cache)
+        second = scan_directory(sample_directory, cache=cache)
+
+        assert capsys.readouterr().out.count("loaded from cache") == 2
+        for filename, result in first.items():
+            pandas.testing.assert_frame_equal(second[filename], result)
+
+    def test_errors_are_reported(self, sample_directory, capsys):
+        """Test that a file that cannot be parsed does not stop the scan."""
+        with open(os.path.join(sample_directory, "broken.xlsx"), "w") as f:
+            f.write("not a workbook")
+
+        results = scan_directory(sample_directory)
+
+        assert "Error analyzing broken.xlsx" in capsys.readouterr().out
+        assert list(results) == ["sample1.csv", "sample2.xlsx"]
+
+    def test_unreadable_directory_is_reported(self, sample_directory, capsys):
+        """Test that a subdirectory that cannot be listed does not stop the scan."""
+        os.makedirs(os.path.join(sample_directory, "locked"))
+        scandir = os.scandir
+
+        def failing_scandir(path):
+            if os.path.basename(path) == "locked":
+                raise PermissionError(13, "Permission denied", path)
+            return scandir(path)
+
+        with patch("analysis.scanner.os.scandir", failing_scandir):
+            results = scan_directory(sample_directory)
+
+        assert "Error listing locked: " in capsys.readouterr().out
+        assert list(results) == ["sample1.csv", "sample2.xlsx"]
+
+    def test_cache_lookup_does_not_read_files(self, sample_directory, output_directory):
+        """Test that files are fingerprinted once, outside the cache."""
+        cache = os.path.join(output_directory, "cache.sqlite")
+        scan_directory(sample_directory, cache=cache)
+
+        with patch("analysis.cache.fingerprint") as cache_fingerprint:
+            results = scan_directory(sample_directory, cache=cache)
+
+        cache_fingerprint.assert_not_called()
+        assert list(results) == ["sample1.csv", "sample2.xlsx"]
+
+    def test_export_nested_results(self, sample_directory, output_directory):
+        """Test that results of subdirectories are written in subdirectories."""
+        key = os.path.join("nested", "sample1.csv")
+        export_results(
+            {key: analyze_file(os.path.join(sample_directory, "sample1.csv"))},
+            output_directory,
+            "csv",
+        )
+
+        assert os.path.exists(
+            os.path.join(output_directory, "nested", "sample1_analisis.csv")
+        )
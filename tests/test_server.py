@@ -0,0 +1,236 @@
+import json
+import os
+import signal
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+import pandas
+import pytest
+from unittest.mock import patch
+from analysis.analysis import analyze_file
+from analysis.cli import main
+from analysis.client import format_table, request_analysis
+from analysis.server import AnalysisServer, is_loopback, parse_request
+
+
+@pytest.fixture(scope="module")
+def server():
+    """Run an analysis server with one worker on a free local port."""
+    server = AnalysisServer(
+        ("127.0.0.1", 0),
+        {"COMPRABLE": {"S"}},
+        workers=1,
+        root=tempfile.gettempdir(),
+    )
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def server_url(server):
+    return f"http://127.0.0.1:{server.server_address[1]}"
+
+
+class TestAnalysisServer:
+    """Tests for the analysis server and its client."""
+
+    def test_file_request(self, server, sample_csv_path):
+        """Test that a file is analyzed with the default valid values."""
+        results = request_analysis(
+            server_url(server), {"file": sample_csv_path, "options": {"chunksize": 2}}
+        )
+
+        expected = analyze_file(sample_csv_path, {"COMPRABLE": {"S"}})
+        name = os.path.basename(sample_csv_path)
+        assert list(results) == [name]
+        assert pandas.DataFrame(results[name]).equals(expected)
+
+    def test_directory_request_exports(
+        self, server, sample_directory, output_directory
+    ):
+        """Test that the server writes the result files of a directory."""
+        results = request_analysis(
+            server_url(server),
+            {
+                "directory": sample_directory,
+                "output": output_directory,
+                "format": "csv",
+                "per_file": False,
+            },
+        )
+
+        assert sorted(results) == ["sample1.csv", "sample2.xlsx"]
+        assert os.listdir(output_directory) == ["complete_analysis.csv"]
+
+    def test_rules_request(self, server, sample_csv_path, tmp_path):
+        """Test that a request can bring its own rules file."""
+        rules_path = tmp_path / "rules.json"
+        rules_path.write_text(json.dumps({"IN_STOCK": ["Y"]}))
+
+        results = request_analysis(
+            server_url(server), {"file": sample_csv_path, "rules": str(rules_path)}
+        )
+
+        rows = {
+            row["Column"]: row for row in results[os.path.basename(sample_csv_path)]
+        }
+        assert rows["IN_STOCK"]["Full_Values"] == 2
+        assert rows["COMPRABLE"]["Full_Values"] == 5
+
+    def test_errors(self, server, sample_csv_path):
+        """Test that invalid requests and failed analyses are reported."""
+        with pytest.raises(RuntimeError, match="400: Unknown options"):
+            request_analysis(
+                server_url(server), {"file": sample_csv_path, "options": {"x": 1}}
+            )
+        with pytest.raises(RuntimeError, match="500"):
+            missing = os.path.join(tempfile.gettempdir(), "missing.csv")
+            request_analysis(server_url(server), {"file": missing})
+
+    def test_paths_outside_root(self, server, sample_csv_path):
+        """Test that requests cannot read or write outside the server root."""
+        with pytest.raises(RuntimeError, match="400: output is outside"):
+            request_analysis(
+                server_url(server), {"file": sample_csv_path, "output": "/etc"}
+            )
+        with pytest.raises(RuntimeError, match="400: rules is outside"):
+            request_analysis(
+                server_url(server), {"file": sample_csv_path, "rules": "/etc/passwd"}
+            )
+
+    def test_json_only(self, server, sample_csv_path):
+        """Test that form posts, which any web page can send, are refused."""
+        request = urllib.request.Request(
+            server_url(server) + "/analyze",
+            data=json.dumps({"file": sample_csv_path}).encode(),
+            headers={"Content-Type": "application/x-www-form-urlencoded"},
+            method="POST",
+        )
+        with pytest.raises(urllib.error.HTTPError) as error:
+            urllib.request.urlopen(request)
+        assert error.value.code == 415
+
+    def test_dead_worker(self, sample_csv_path, tmp_path):
+        """Test that a worker dying fails its request only."""
+        server = AnalysisServer(("127.0.0.1", 0), workers=1, root=str(tmp_path))
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        try:
+            # The worker blocks opening the pipe until it is killed
+            pipe = str(tmp_path / "pipe.csv")
+            os.mkfifo(pipe)
+            errors = []
+
+            def send():
+                try:
+                    request_analysis(server_url(server), {"file": pipe})
+                except RuntimeError as e:
+                    errors.append(str(e))
+
+            request = threading.Thread(target=send)
+            request.start()
+            while not server.status()["running"]:
+                time.sleep(0.01)
+            for pid in list(server.executor._processes):
+                os.kill(pid, signal.SIGKILL)
+            request.join()
+
+            assert len(errors) == 1 and "Server error 500" in errors[0]
+            csv_path = str(tmp_path / "sample.csv")
+            with open(sample_csv_path) as source, open(csv_path, "w") as f:
+                f.write(source.read())
+            results = request_analysis(server_url(server), {"file": csv_path})
+            assert list(results) == ["sample.csv"]
+        finally:
+            server.shutdown()
+            server.server_close()
+
+    def test_full_queue(self, server, sample_csv_path):
+        """Test that requests beyond the workers and the queue are refused."""
+        with server.lock:
+            server.pending += server.workers + server.max_queue
+        try:
+            with pytest.raises(RuntimeError, match="503"):
+                request_analysis(server_url(server), {"file": sample_csv_path})
+        finally:
+            with server.lock:
+                server.pending -= server.workers + server.max_queue
+
+    def test_status(self, server):
+        """Test the status endpoint."""
+        with urllib.request.urlopen(server_url(server) + "/status") as response:
+            status = json.load(response)
+        assert status["workers"] == 1
+        assert status["running"] == 0
+        assert status["queued"] == 0
+
+    def test_cli_client(self, server, sample_csv_path, output_directory, capsys):
+        """Test that analyze --server prints the results and the server exports."""
+        with patch(
+            "sys.argv",
+            [
+                "analyze",
+                "--server",
+                server_url(server),
+                "--file",
+                sample_csv_path,
+                "--output",
+                output_directory,
+                "--format",
+                "csv",
+            ],
+        ):
+            main()
+
+        assert "Percentage_Filled" in capsys.readouterr().out
+        base_name = os.path.splitext(os.path.basename(sample_csv_path))[0]
+        assert os.listdir(output_directory) == [f"{base_name}_analisis.csv"]
+
+
+class TestProtocol:
+    """Tests for the request checks and the client output."""
+
+    def test_parse_request(self):
+        """Test that requests need exactly one of file and directory."""
+        assert parse_request(b'{"file": "a.csv"}') == {"file": "a.csv"}
+        for body in (b"[]", b"{", b"{}", b'{"file": "a", "directory": "b"}'):
+            with pytest.raises(ValueError):
+                parse_request(body)
+        with pytest.raises(ValueError, match="Unknown request fields"):
+            parse_request(b'{"file": "a.csv", "cache": true}')
+
+    def test_parse_request_root(self, tmp_path):
+        """Test that the paths of a request must be inside the root."""
+        inside = str(tmp_path / "data" / "a.csv")
+        request = parse_request(json.dumps({"file": inside}).encode(), str(tmp_path))
+        assert request["file"] == inside
+
+        sibling = str(tmp_path) + "-other/a.csv"
+        for field in ("file", "directory", "output", "rules"):
+            body = json.dumps({"file": inside, field: sibling}).encode()
+            if field == "directory":
+                body = json.dumps({field: sibling}).encode()
+            with pytest.raises(ValueError, match=f"{field} is outside"):
+                parse_request(body, str(tmp_path))
+
+    def test_loopback_only(self):
+        """Test that the server refuses to listen on other addresses."""
+        assert is_loopback("127.0.0.1")
+        assert is_loopback("localhost")
+        assert not is_loopback("0.0.0.0")
+        with pytest.raises(ValueError, match="loopback"):
+            AnalysisServer(("0.0.0.0", 0), workers=1)
+        with patch("sys.argv", ["analyze", "--serve", "--host", "0.0.0.0"]):
+            with pytest.raises(SystemExit):
+                main()
+
+    def test_format_table(self):
+        """Test the aligned text table printed by the client."""
+        table = format_table(
+            [{"Column": "ID", "Full": 5}, {"Column": "N", "Full": None}]
+        )
+        assert table.splitlines() == ["Column  Full", "    ID     5", "     N      "]
@@ -0,0 +1,144 @@
+import os
+import subprocess
+import sys
+import pandas
+import pytest
+from unittest.mock import patch
+from analysis.analysis import analyze_directory
+from analysis.cli import main
+from analysis.scanner import scan_directory
+from analysis.shards import merge_shards, parse_shard, shard_of, write_shard
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def dump_directory(tmp_path):
+    """A directory with enough CSV files to fill several shards."""
+    directory = tmp_path / "dumps"
+    (directory / "nested").mkdir(parents=True)
+    for index in range(12):
+        folder = directory / "nested" if index % 3 == 0 else directory
+        pandas.DataFrame(
+            {"ID": range(index + 2), "COMPRABLE": ["S", ""] + ["N"] * index}
+        ).to_csv(folder / f"dump{index:02}.csv", index=False)
+    return str(directory)
+
+
+class TestShards:
+    """Tests for the assignment, saving and merging of shards."""
+
+    def test_parse_shard(self):
+        """Test the i/N form of --shard."""
+        assert parse_shard("2/4") == (2, 4)
+        for value in ("0/4", "5/4", "2", "a/b"):
+            with pytest.raises(ValueError):
+                parse_shard(value)
+
+    def test_shard_of_is_stable(self):
+        """Test that files get the same shard every time and spread out."""
+        names = [f"dump{index:02}.csv" for index in range(100)]
+        shards = [shard_of(name, 4) for name in names]
+
+        assert shards == [shard_of(name, 4) for name in names]
+        assert set(shards) == {1, 2, 3, 4}
+        assert shard_of("dump00.csv", 4) == 1
+
+    def test_shards_partition_directory(self, dump_directory):
+        """Test that every file is analyzed by exactly one shard."""
+        whole = analyze_directory(dump_directory)
+        parts = [analyze_directory(dump_directory, shard=(i, 3)) for i in (1, 2, 3)]
+
+        names = [name for part in parts for name in part]
+        assert sorted(names) == list(whole)
+        assert all(parts)
+
+    def test_merge_equals_whole_directory(self, dump_directory, tmp_path):
+        """Test that merging saved shards gives the unsharded results."""
+        whole = scan_directory(dump_directory)
+        for index in (1, 2, 3):
+            write_shard(
+                scan_directory(dump_directory, shard=(index, 3)),
+                str(tmp_path / "shared"),
+                (index, 3),
+            )
+
+        merged = merge_shards(str(tmp_path / "shared"))
+
+        assert list(merged) == list(whole)
+        for name, result in whole.items():
+            pandas.testing.assert_frame_equal(merged[name], result)
+
+    def test_merge_errors(self, tmp_path):
+        """Test that missing and mismatched shards are reported."""
+        shared = str(tmp_path)
+        with pytest.raises(ValueError, match="No shard results"):
+            merge_shards(shared)
+        write_shard({}, shared, (1, 2))
+        with pytest.raises(ValueError, match=r"Missing results of shards \[2\]"):
+            merge_shards(shared)
+        write_shard({}, shared, (1, 3))
+        with pytest.raises(ValueError, match="different numbers of shards"):
+            merge_shards(shared)
+
+
+class TestShardProcesses:
+    """Tests for analyze --shard and analyze merge run as separate processes."""
+
+    def test_local_shard_processes(self, dump_directory, tmp_path):
+        """Test N shard processes sharing an output directory, then merge."""
+        shared = str(tmp_path / "shared")
+        command = [sys.executable, "-m", "analysis.cli"]
+        processes = [
+            subprocess.Popen(
+                command
+                + ["--directory", dump_directory, "--shard", f"{index}/3"]
+                + ["--output", shared, "--format", "csv"],
+                cwd=ROOT,
+                stdout=subprocess.DEVNULL,
+            )
+            for index in (1, 2, 3)
+        ]
+        assert [process.wait() for process in processes] == [0, 0, 0]
+
+        merged = str(tmp_path / "merged")
+        whole = str(tmp_path / "whole")
+        subprocess.run(
+            command + ["merge", shared, "--output", merged, "--format", "csv"],
+            cwd=ROOT,
+            check=True,
+            capture_output=True,
+        )
+        subprocess.run(
+            command
+            + ["--directory", dump_directory, "--output", whole, "--format", "csv"],
+            cwd=ROOT,
+            check=True,
+            capture_output=True,
+        )
+
+        assert sorted(os.listdir(merged)) == sorted(
+            name for name in os.listdir(whole) if not name.startswith(".")
+        )
+        pandas.testing.assert_frame_equal(
+            pandas.read_csv(os.path.join(merged, "complete_analysis.csv")),
+            pandas.read_csv(os.path.join(whole, "complete_analysis.csv")),
+        )
+
+    def test_merge_reports_missing_shards(self, tmp_path, capsys):
+        """Test that analyze merge exits with an error on incomplete shards."""
+        write_shard({}, str(tmp_path), (2, 2))
+        with patch("sys.argv", ["analyze", "merge", str(tmp_path)]):
+            with pytest.raises(SystemExit) as exit_info:
+                main()
+
+        assert exit_info.value.code == 1
+        assert "Missing results of shards [1] of 2" in capsys.readouterr().err
+
+    def test_shard_needs_directory(self, sample_csv_path):
+        """Test that --shard is refused without --directory."""
+        with patch(
+            "sys.argv", ["analyze", "--file", sample_csv_path, "--shard", "1/2"]
+        ):
+            with pytest.raises(SystemExit):
+                main()
@@ -0,0 +1,128 @@
+import numpy
+import pandas
+import pytest
+from analysis.analysis import analyze_file
+from analysis.sketches import ColumnProfile, HyperLogLog, MisraGries
+from analysis.stats import FillStats
+
+
+def hashes(values) -> numpy.ndarray:
+    return pandas.util.hash_pandas_object(
+        pandas.Series(values).astype(str), index=False
+    ).to_numpy()
+
+
+class TestHyperLogLog:
+    """Tests for the approximate distinct counts."""
+
+    @pytest.mark.parametrize("distinct", [10, 1000, 200000])
+    def test_count(self, distinct):
+        """Test that the estimate is close to the real count."""
+        sketch = HyperLogLog()
+        sketch.add(hashes(numpy.arange(distinct)))
+        sketch.add(hashes(numpy.arange(distinct)))
+
+        assert sketch.count() == pytest.approx(distinct, rel=0.05)
+
+    def test_merge_is_union(self):
+        """Test that merged sketches count the union of their values."""
+        first, second, union = HyperLogLog(), HyperLogLog(), HyperLogLog()
+        first.add(hashes(range(0, 6000)))
+        second.add(hashes(range(4000, 10000)))
+        union.add(hashes(range(0, 10000)))
+        first.merge(second)
+
+        assert first.count() == union.count()
+
+
+class TestMisraGries:
+    """Tests for the frequent values summary."""
+
+    def test_heavy_hitters_are_kept(self):
+        """Test that values above rows / (capacity + 1) are always found."""
+        values = pandas.Series(
+            ["A"] * 500 + ["B"] * 300 + [str(i) for i in range(2000)]
+        )
+        summary = MisraGries(capacity=8)
+        shuffled = values.sample(frac=1, random_state=0)
+        for start in range(0, len(shuffled), 280):
+            summary.update(shuffled.iloc[start : start + 280].value_counts())
+
+        top = summary.top(2)
+        assert list(top.index) == ["A", "B"]
+        assert (top <= pandas.Series({"A": 500, "B": 300})).all()
+
+    def test_merge(self):
+        """Test that summaries of two parts merge into one of the whole."""
+        first, second = MisraGries(4), MisraGries(4)
+        first.update(pandas.Series({"A": 10, "B": 1}))
+        second.update(pandas.Series({"A": 5, "C": 7}))
+        first.merge(second)
+
+        assert first.top(2).to_dict() == {"A": 15, "C": 7}
+
+
+class TestColumnProfiles:
+    """Tests for the profile columns of the analysis."""
+
+    def test_analyze_file(self, sample_csv_path):
+        """Test the profile columns of a small file."""
+        result = analyze_file(sample_csv_path, profile_columns=True).set_index("Column")
+
+        assert result.loc["ID", "Distinct_Values"] == 5
+        assert result.loc["COMPRABLE", "Distinct_Values"] == 1
+        assert result.loc["COMPRABLE", "Top_Values"] == "S (5)"
+        assert result.loc["NAME", "Min_Length"] == 9
+        assert result.loc["NAME", "Max_Length"] == 9
+        assert result.loc["IN_STOCK", "Distinct_Values"] == 2
+
+    @pytest.mark.parametrize("options", [{"chunksize": 2}, {"parallel": 2}])
+    def test_chunks_and_ranges_merge(self, sample_csv_path, options):
+        """Test that chunked and parallel runs give the whole-file profile."""
+        expected = analyze_file(sample_csv_path, profile_columns=True)
+        result = analyze_file(sample_csv_path, profile_columns=True, **options)
+
+        pandas.testing.assert_frame_equal(result, expected)
+
+    @pytest.mark.parametrize(
+        "options", [{"chunksize": 500}, {"parallel": 3}, {"engine": "pyarrow"}]
+    )
+    def test_column_of_numbers_and_text(self, tmp_path, options):
+        """Test a column parsed as numbers in some chunks and text in others."""
+        if options.get("engine") == "pyarrow":
+            pytest.importorskip("pyarrow")
+        path = str(tmp_path / "mixed.csv")
+        values = ["1", ""] * 1500 + ["2.5", "abc"] + ["1"] * 1998
+        pandas.DataFrame({"ID": range(5000), "NUM": values}).to_csv(path, index=False)
+
+        expected = analyze_file(path, profile_columns=True).set_index("Column")
+        result = analyze_file(path, profile_columns=True, **options)
+
+        assert expected.loc["NUM", "Top_Values"] == "1 (3498), 2.5 (1), abc (1)"
+        assert expected.loc["NUM", "Distinct_Values"] == 3
+        pandas.testing.assert_frame_equal(result.set_index("Column"), expected)
+
+    def test_profile_text(self):
+        """Test that integral floats profile as the integers read as text."""
+        profile = ColumnProfile()
+        profile.update(pandas.Series([1.0, 2.5, None]))
+        profile.update(pandas.Series(["1", "abc"]))
+        profile.update(pandas.Series([1, "abc", 3.0], dtype=object))
+
+        assert profile.frequent.top(5).to_dict() == {
+            "1": 3,
+            "abc": 2,
+            "2.5": 1,
+            "3": 1,
+        }
+        assert profile.distinct.count() == 4
+        assert (profile.min_length, profile.max_length) == (1, 3)
+
+    def test_round_trip(self, sample_csv_path):
+        """Test that profiles survive to_dict and from_dict."""
+        stats = FillStats(profile=True)
+        stats.update(pandas.read_csv(sample_csv_path))
+        restored = FillStats.from_dict(stats.to_dict())
+
+        assert isinstance(restored.profiles["ID"], ColumnProfile)
+        pandas.testing.assert_frame_equal(restored.to_frame(), stats.to_frame())
@@ -0,0 +1,129 @@
+import pickle
+import pandas
+import pytest
+from analysis.stats import FillStats
+
+
+def reference_counts(df, valid_values):
+    """Count filled values column by column, as analyze_file used to."""
+    counts = {}
+    for column in df.columns:
+        if column in valid_values:
+            counts[column] = df[column].isin(valid_values[column]).sum()
+        elif df[column].dtype == "object":
+            counts[column] = (df[column].notna() & (df[column] != "")).sum()
+        else:
+            counts[column] = df[column].notna().sum()
+    return counts
+
+
+def parts():
+    """Chunks of a table, the last one with a column the others lack."""
+    return [
+        pandas.DataFrame({"A": ["x", "", None], "B": [1, None, 3]}),
+        pandas.DataFrame({"A": ["S"], "B": [None]}),
+        pandas.DataFrame({"A": ["N", "y"], "B": [5, 6], "C": ["", "z"]}),
+    ]
+
+
+def stats_of(df, valid_values=None, profile=False):
+    stats = FillStats(valid_values, profile=profile)
+    stats.update(df)
+    return stats
+
+
+class TestFillStats:
+    """Tests for the mergeable fill statistics."""
+
+    def test_update_matches_reference(self):
+        """Test the vectorized counts against the per-column semantics."""
+        df = pandas.DataFrame(
+            {
+                "INT": [1, 2, 3, 4],
+                "FLOAT": [1.5, None, 2.0, None],
+                "TEXT": pandas.Series(["a", "", None, " "], dtype=object),
+                "STR": pandas.Series(["a", "", None, "b"], dtype="string"),
+                "FLAG": ["S", "N", "X", ""],
+                "CODE": [1, 2, 3, None],
+                "DATE": pandas.to_datetime(["2024-01-01", None, None, "2024-01-02"]),
+            }
+        )
+        valid_values = {"FLAG": {"S", "N", ""}, "CODE": {1, 3}}
+
+        stats = FillStats(valid_values)
+        stats.update(df)
+
+        expected = reference_counts(df, valid_values)
+        expected["STR"] = 2
+        assert stats.total_rows == 4
+        for column in df.columns:
+            assert stats.full_values(column) == expected[column], column
+
+    def test_merge(self):
+        """Test that merging two parts equals counting all rows."""
+        df = pandas.DataFrame({"A": ["x", "", None, "y"], "B": [1, None, 3, 4]})
+
+        whole = FillStats()
+        whole.update(df)
+        first, second = FillStats(), FillStats()
+        first.update(df.iloc[:3])
+        second.update(df.iloc[3:])
+        first.merge(second)
+
+        pandas.testing.assert_frame_equal(first.to_frame(), whole.to_frame())
+
+    def test_slots(self):
+        """Test that the counts are kept in slots and int64 arrays."""
+        stats = stats_of(parts()[0])
+        assert not hasattr(stats, "__dict__")
+        assert stats.non_null.dtype == "int64"
+
+    def test_merge_is_associative(self):
+        """Test that any grouping and order of merges gives the same counts."""
+        valid_values = {"A": {"S", "N"}}
+        first, second, third = parts()
+
+        left = stats_of(first, valid_values).merge(stats_of(second, valid_values))
+        left.merge(stats_of(third, valid_values))
+        right = stats_of(second, valid_values).merge(
+            stats_of(third, valid_values).merge(stats_of(first, valid_values))
+        )
+
+        assert left.to_dict() == {
+            "columns": ["A", "B", "C"],
+            "total_rows": 6,
+            "totals": [6, 6, 2],
+            "non_null": [5, 4, 2],
+            "non_empty": [4, 4, 1],
+            "valid_hits": [2, 0, 0],
+        }
+        pandas.testing.assert_frame_equal(right.to_frame(), left.to_frame())
+
+    def test_to_frame_counts_missing_columns_as_empty(self):
+        """Test that rows of parts without a column are empty values."""
+        stats = FillStats()
+        for part in parts():
+            stats.merge(stats_of(part))
+
+        result = stats.to_frame().set_index("Column")
+
+        assert result.loc["C", "Total_Rows"] == 6
+        assert result.loc["C", "Empty_Values"] == 5
+
+    @pytest.mark.parametrize("profile", [False, True])
+    def test_round_trips(self, profile):
+        """Test the JSON, binary and pickled forms."""
+        stats = stats_of(parts()[2], {"A": {"N"}}, profile=profile)
+
+        for copy in (
+            FillStats.from_dict(stats.to_dict(), {"A": {"N"}}),
+            FillStats.from_bytes(stats.to_bytes(), {"A": {"N"}}),
+            pickle.loads(pickle.dumps(stats)),
+        ):
+            assert copy.to_dict() == stats.to_dict()
+            pandas.testing.assert_frame_equal(copy.to_frame(), stats.to_frame())
+
+    def test_from_bytes_rejects_other_data(self):
+        """Test that bytes not written by to_bytes are rejected."""
+        with pytest.raises(ValueError, match="binary form"):
+            FillStats.from_bytes(b'{"columns": []}')
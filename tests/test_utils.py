@@ -1,6 +1,7 @@
 import os
 import pandas
-from analysis.utils import export_results
+import pytest
+from analysis.utils import combine_results, export_results
 
 
 class TestExportResults:
@@ -112,3 +113,62 @@ class TestExportResults:
 
         for file_path in expected_files:
             assert os.path.exists(file_path)
+
+    def test_combine_results(self):
+        """Test that the combined table keeps the order and the inputs."""
+        result1 = pandas.DataFrame({"Column": ["A", "B"], "Full_Values": [1, 2]})
+        result2 = pandas.DataFrame({"Column": ["C"], "Full_Values": [3]})
+
+        combined = combine_results({"file1.csv": result1, "file2.csv": result2})
+
+        assert combined["Column"].tolist() == ["A", "B", "C"]
+        assert combined["File"].tolist() == ["file1.csv", "file1.csv", "file2.csv"]
+        assert combined.index.tolist() == [0, 1, 2]
+        assert "File" not in result1.columns
+        assert "File" not in result2.columns
+
+    @pytest.mark.parametrize("output_format", ["csv", "json", "parquet"])
+    def test_export_results_formats(self, output_directory, output_format):
+        """Test exporting the results in the fast output formats."""
+        if output_format == "parquet":
+            pytest.importorskip("pyarrow")
+        result = pandas.DataFrame(
+            {
+                "Column": ["A", "B"],
+                "Total_Rows": [2, 2],
+                "Full_Values": [2, 1],
+                "Empty_Values": [0, 1],
+                "Percentage_Filled": [100.0, 50.0],
+            }
+        )
+
+        export_results({"test.csv": result}, output_directory, output_format)
+
+        readers = {
+            "csv": pandas.read_csv,
+            "json": pandas.read_json,
+            "parquet": pandas.read_parquet,
+        }
+        written = readers[output_format](
+            os.path.join(output_directory, f"test_analisis.{output_format}")
+        )
+        assert written["Full_Values"].tolist() == [2, 1]
+        combined = readers[output_format](
+            os.path.join(output_directory, f"complete_analysis.{output_format}")
+        )
+        assert combined["File"].tolist() == ["test.csv", "test.csv"]
+
+    def test_export_results_combined_only(self, output_directory):
+        """Test skipping the per-file results."""
+        result = pandas.DataFrame({"Column": ["A"], "Full_Values": [1]})
+
+        export_results({"test.csv": result}, output_directory, "csv", per_file=False)
+
+        assert os.listdir(output_directory) == ["complete_analysis.csv"]
+
+    def test_export_results_unknown_format(self, output_directory):
+        """Test that an unknown format raises a ValueError."""
+        with pytest.raises(ValueError) as excinfo:
+            export_results({}, output_directory, "xml")
+
+        assert "Output format not supported" in str(excinfo.value)
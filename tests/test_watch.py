@@ -0,0 +1,59 @@
+import os
+import time
+import pandas
+from unittest.mock import patch
+from analysis.analysis import analyze_file
+from analysis.watch import DirectoryWatcher, watch_directory
+
+
+class TestWatch:
+    """Tests for the watch mode, using polling."""
+
+    def test_changed_files(self, sample_directory):
+        """Test that only new or modified files are returned."""
+        watcher = DirectoryWatcher(sample_directory, settle=0, use_inotify=False)
+
+        assert watcher.changed() == (["sample1.csv", "sample2.xlsx"], [])
+        assert watcher.changed() == ([], [])
+
+        with open(os.path.join(sample_directory, "sample1.csv"), "a") as f:
+            f.write("4,Item D,\n")
+        os.remove(os.path.join(sample_directory, "sample2.xlsx"))
+        assert watcher.changed() == (["sample1.csv"], ["sample2.xlsx"])
+
+    def test_files_being_written_wait(self, sample_directory):
+        """Test that a file is returned only once it stops changing."""
+        watcher = DirectoryWatcher(sample_directory, settle=0.2, use_inotify=False)
+
+        assert watcher.changed() == ([], [])
+        time.sleep(0.2)
+        assert watcher.changed() == (["sample1.csv", "sample2.xlsx"], [])
+
+    def test_watch_directory(self, sample_directory, output_directory):
+        """Test that changed files are analyzed again and the report updated."""
+        csv_path = os.path.join(sample_directory, "sample1.csv")
+
+        def append_row(seconds):
+            with open(csv_path, "a") as f:
+                f.write("4,Item D,\n")
+
+        with patch("analysis.watch.analyze_file", wraps=analyze_file) as spy:
+            with patch("time.sleep", side_effect=append_row):
+                results = watch_directory(
+                    sample_directory,
+                    output_directory,
+                    output_format="csv",
+                    settle=0,
+                    iterations=2,
+                    use_inotify=False,
+                )
+
+        analyzed = [os.path.basename(call.args[0]) for call in spy.call_args_list]
+        assert analyzed == ["sample1.csv", "sample2.xlsx", "sample1.csv"]
+        assert results["sample1.csv"]["Total_Rows"][0] == 4
+
+        combined = pandas.read_csv(
+            os.path.join(output_directory, "complete_analysis.csv")
+        )
+        assert set(combined["File"]) == {"sample1.csv", "sample2.xlsx"}
+        assert combined.loc[combined["File"] == "sample1.csv", "Total_Rows"].eq(4).all()